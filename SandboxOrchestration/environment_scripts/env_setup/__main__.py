@@ -1,12 +1,8 @@
-from sandbox_scripts.environment.setup.setup_script import EnvironmentSetup
-from sandbox_scripts.environment.setup.setup_resources import EnvironmentSetupResources
-from sandbox_scripts.environment.setup.setup_VM import EnvironmentSetupVM
+from sandbox_scripts.environment.setup.setup_pipeline import EnvironmentSetupPipeline
 
 
 def main():
-    EnvironmentSetup().execute()
-    EnvironmentSetupVM().execute()
-    EnvironmentSetupResources().execute()
+    EnvironmentSetupPipeline().execute()
 
 if __name__ == "__main__":
     main()
@@ -4,8 +4,10 @@ from sandbox_scripts.environment.teardown.teardown_VM import EnvironmentTeardown
 
 
 def main():
-    EnvironmentTeardown().execute()
-    EnvironmentTeardownVM().execute()
+    # The teardown scripts share the resource details they fetch
+    resource_details_cache = {}
+    EnvironmentTeardown(resource_details_cache=resource_details_cache).execute()
+    EnvironmentTeardownVM(resource_details_cache=resource_details_cache).execute()
     EnvironmentTeardownResources().execute()
 
 if __name__ == "__main__":
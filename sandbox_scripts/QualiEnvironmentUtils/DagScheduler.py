@@ -0,0 +1,130 @@
+# coding=utf-8
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+from QualiUtils import QualiError
+import Queue
+import time
+
+DEFAULT_MAX_PARALLEL_STEPS = 4
+
+
+class DagScheduler(object):
+    def __init__(self, logger, max_parallel_steps=DEFAULT_MAX_PARALLEL_STEPS):
+        """
+        Run steps that depend on each other. A step starts as soon as all the steps it depends on finished
+        successfully, so independent steps run in parallel. The steps of a failed step are skipped
+        :param logging.Logger logger:
+        :param int max_parallel_steps:  The max number of steps that run at the same time
+        """
+        self._logger = logger
+        self.max_parallel_steps = max_parallel_steps
+        self._steps = OrderedDict()
+        self.step_results = dict()
+        self.step_errors = OrderedDict()
+        self.skipped_steps = []
+        self.step_run_times = dict()
+
+    # ----------------------------------
+    # ----------------------------------
+    def add_step(self, name, func, depends_on=()):
+        """
+        Add a step
+        :param str name:  The name of the step
+        :param func:  Function with no params that runs the step. Its return value is kept in step_results
+        :param list[str] depends_on:  The names of the steps that must finish before this step starts
+        """
+        if name in self._steps:
+            raise QualiError('DagScheduler', "Step '" + name + "' was added twice")
+        self._steps[name] = (func, list(depends_on))
+
+    # ----------------------------------
+    # ----------------------------------
+    def _validate(self):
+        for name, (func, depends_on) in self._steps.iteritems():
+            for dependency in depends_on:
+                if dependency not in self._steps:
+                    raise QualiError('DagScheduler', "Step '" + name + "' depends on unknown step '" +
+                                     dependency + "'")
+        # Remove the steps with no (remaining) dependencies one by one. Whatever is left is part of a cycle
+        remaining = dict((name, set(depends_on)) for name, (func, depends_on) in self._steps.iteritems())
+        while remaining:
+            ready = [name for name, depends_on in remaining.iteritems() if not depends_on]
+            if not ready:
+                raise QualiError('DagScheduler', "Circular dependency between the steps: " +
+                                 ", ".join(sorted(remaining.keys())))
+            for name in ready:
+                del remaining[name]
+            for depends_on in remaining.values():
+                depends_on.difference_update(ready)
+
+    # ----------------------------------
+    # ----------------------------------
+    def run(self):
+        """
+        Run all the steps and wait for them to finish
+        :return: True if all the steps finished successfully
+        :rtype: bool
+        """
+        self._validate()
+        if len(self._steps) == 0:
+            return True
+
+        pending = OrderedDict(self._steps)
+        running = set()
+        done = set()
+        finished_steps = Queue.Queue()
+        pool = ThreadPool(min(len(self._steps), self.max_parallel_steps))
+        try:
+            while pending or running:
+                self._skip_blocked_steps(pending)
+                for name, (func, depends_on) in pending.items():
+                    if all(dependency in done for dependency in depends_on):
+                        del pending[name]
+                        running.add(name)
+                        pool.apply_async(self._run_step, (name, func, finished_steps))
+                if not running:
+                    break
+                name = finished_steps.get()
+                running.discard(name)
+                if name not in self.step_errors:
+                    done.add(name)
+        finally:
+            pool.close()
+            pool.join()
+
+        return len(self.step_errors) == 0
+
+    # ----------------------------------
+    # ----------------------------------
+    def _skip_blocked_steps(self, pending):
+        """
+        Skip the pending steps that depend on a failed or skipped step
+        :param OrderedDict pending:
+        """
+        skipped = True
+        while skipped:
+            skipped = False
+            for name, (func, depends_on) in pending.items():
+                blocking = [dependency for dependency in depends_on
+                            if dependency in self.step_errors or dependency in self.skipped_steps]
+                if blocking:
+                    del pending[name]
+                    self.skipped_steps.append(name)
+                    self._logger.warning("Skipping step '{0}' because step '{1}' did not finish successfully"
+                                         .format(name, blocking[0]))
+                    skipped = True
+
+    # ----------------------------------
+    # ----------------------------------
+    def _run_step(self, name, func, finished_steps):
+        start_time = time.time()
+        try:
+            self._logger.info("Step '{0}' started".format(name))
+            self.step_results[name] = func()
+        except Exception as exc:
+            self.step_errors[name] = exc
+            self._logger.error("Step '{0}' failed. Error: {1}".format(name, str(exc)))
+        finally:
+            self.step_run_times[name] = time.time() - start_time
+            self._logger.info("Step '{0}' finished in {1:.1f} seconds".format(name, self.step_run_times[name]))
+            finished_steps.put(name)
@@ -14,3 +14,24 @@ class rsc_run_result_struct:
         self.run_result = True
         self.resource_name = resource_name
         self.message = ""
+
+class transfer_result_struct:
+    def __init__(self, path):
+        self.success = True
+        self.path = path
+        self.data = None
+        self.size = 0
+        self.run_time = 0
+        self.message = ""
+
+class transfer_stats_struct:
+    def __init__(self, results, run_time):
+        """
+        :param list[transfer_result_struct] results:
+        :param float run_time:  The time in seconds it took to run all the transfers
+        """
+        self.files = len(results)
+        self.failed = len([res for res in results if not res.success])
+        self.bytes = sum(res.size for res in results)
+        self.run_time = run_time
+        self.bytes_per_second = self.bytes / run_time if run_time > 0 else 0
@@ -1,7 +1,11 @@
 from RepositoryClient import *
 from sandbox_scripts.QualiEnvironmentUtils.Sandbox import *
+from io import BytesIO
+from threading import Lock
 import base64
+import tarfile
 import pip
+import requests
 
 try:
     imported_gitlab = True
@@ -13,8 +17,17 @@ except:
     except:
         imported_gitlab = False
 
+GITLAB_BRANCH = 'master'
+GITLAB_SEARCH_PAGE_SIZE = 100
+
 
 class GitLabClient(RepositoryClient):
+    # The id of each project, the key is (url, project name). Shared by all the clients in the process
+    _project_ids = dict()
+    # The http session of each server, the key is (url, token). Shared by all the clients in the process
+    _sessions = dict()
+    _shared_lock = Lock()
+
     # ----------------------------------
     # ----------------------------------
     def __init__(self, sandbox,repository_resource ):
@@ -25,35 +38,86 @@ class GitLabClient(RepositoryClient):
         self.token = repository_resource.get_attribute("GitLab Token")
         self.project_name = repository_resource.get_attribute("GitLab Project Name")
         self.repository_path = repository_resource.get_attribute("Repository Path")
+        self._gl = None
+        # The files of the repository that were downloaded in an archive, see download_dir
+        self._archive_files = None
+        self._archive_lock = Lock()
 
     # ----------------------------------
     # ----------------------------------
-    def download(self, source, destination):
+    @property
+    def gl(self):
+        """
+        The gitlab client, created once per repository client
+        :rtype: gitlab.Gitlab
+        """
+        if self._gl is None:
+            self._gl = gitlab.Gitlab(self.url, self.token)
+        return self._gl
+
+    # ----------------------------------
+    # ----------------------------------
+    @property
+    def session(self):
+        """
+        The http session of the server. The session keeps the connections open (keep-alive),
+        so all the files are downloaded over the same connections
+        :rtype: requests.Session
+        """
+        key = (self.url, self.token)
+        with GitLabClient._shared_lock:
+            if key not in GitLabClient._sessions:
+                session = requests.Session()
+                session.headers.update(self.gl.headers)
+                session.verify = self.gl.verify_ssl
+                GitLabClient._sessions[key] = session
+            return GitLabClient._sessions[key]
 
-        gl = gitlab.Gitlab(self.url, self.token)
-        projid = 0
-        projects = ''
+    # ----------------------------------
+    # ----------------------------------
+    def get_project_id(self):
+        """
+        Get the id of the project. The id is looked up once and kept for all the clients of the same project
+        :rtype: int
+        """
+        key = (self.url, self.project_name)
+        with GitLabClient._shared_lock:
+            projid = GitLabClient._project_ids.get(key)
+        if projid is None:
+            projid = self._find_project_id()
+            with GitLabClient._shared_lock:
+                GitLabClient._project_ids[key] = projid
+        return projid
+
+    # ----------------------------------
+    # ----------------------------------
+    def _find_project_id(self):
+        gl = self.gl
         try:
-            for project in gl.getall(gl.getprojects):
-                #print project['name']
+            # a 'namespace/project' name is looked up directly
+            if '/' in self.project_name:
+                project = gl.getproject(self.project_name)
+                if project:
+                    return project['id']
+            # otherwise let the server search for the name, instead of going over all the projects
+            for project in gl.getall(gl.searchproject, self.project_name, per_page=GITLAB_SEARCH_PAGE_SIZE):
+                if project['name'] == self.project_name or project.get('path_with_namespace') == self.project_name:
+                    return project['id']
+            projects = ''
+            for project in gl.getall(gl.getprojects, per_page=GITLAB_SEARCH_PAGE_SIZE):
                 if project['name'] == self.project_name:
-                    projid = project['id']
-                    break
-                else:
-                    projects += str(project['id']) + '-' + project['name'] + '\n'
+                    return project['id']
+                projects += str(project['id']) + '-' + project['name'] + '\n'
         except Exception as ex:
             raise QualiError("GitLabClient", "ERROR: Could not access repository at %s" % self.url + " : " + str(ex.message))
 
-        if projid == 0:
-            raise QualiError("GitLabClient","ERROR: Failed to locate project by name among \n" + projects)
+        raise QualiError("GitLabClient","ERROR: Failed to locate project by name among \n" + projects)
 
-        try:
-            source = self.repository_path + source
-            filebase64 = gl.getfile(projid, source, 'master')
-            filetext = base64.b64decode(filebase64['content']).decode()
-        except Exception as ex:
-            raise QualiError("GitLabClient", "ERROR: Failed to retrieve file, which may be expected for " +
-                             source + " : " + str(ex.message))
+    # ----------------------------------
+    # ----------------------------------
+    def download(self, source, destination):
+
+        filetext = self.download_bytes(source)
 
         try:
             with open(destination,'w') as dest:
@@ -61,3 +125,103 @@ class GitLabClient(RepositoryClient):
             return 0, "Successfully retrieved file from repository and saved to destination"
         except Exception as ex:
             raise QualiError("GitLabClient","ERROR: Retrieved file from repository - failed to save to destination : " + str(ex.message))
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_bytes(self, source):
+        """
+        Get the content of a file in the repository
+        :param str source:  The path to the file, relative to the repository path
+        :rtype: str
+        """
+        source = self.repository_path + source
+        with self._archive_lock:
+            archive_files = self._archive_files
+        if archive_files is not None:
+            if source.lstrip('/') in archive_files:
+                return archive_files[source.lstrip('/')]
+            raise QualiError("GitLabClient", "ERROR: Failed to retrieve file, which may be expected for " +
+                             source + " : file not found in the repository")
+        projid = self.get_project_id()
+        try:
+            response = self.session.get("{0}/{1}/repository/files".format(self.gl.projects_url, projid),
+                                        params={'file_path': source, 'ref': GITLAB_BRANCH})
+            response.raise_for_status()
+            return base64.b64decode(response.json()['content'])
+        except Exception as ex:
+            raise QualiError("GitLabClient", "ERROR: Failed to retrieve file, which may be expected for " +
+                             source + " : " + str(ex))
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_dir(self, source_dir):
+        """
+        Download all the files of the repository in a single archive, and keep them in memory,
+        so the following calls to download_bytes don't go to the server
+        :param str source_dir:  The path to the directory, relative to the repository path
+        :return: The files in the directory and its sub directories, the key is the path relative to source_dir
+        :rtype: dict[str, str]
+        """
+        with self._archive_lock:
+            if self._archive_files is None:
+                self._archive_files = self._download_archive()
+            archive_files = self._archive_files
+        dir_path = (self.repository_path + source_dir).strip('/') + '/'
+        return dict((path[len(dir_path):], data) for path, data in archive_files.iteritems()
+                    if path.startswith(dir_path))
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_key(self):
+        return self.url + '/' + self.project_name + '/' + self.repository_path
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_revision(self):
+        """
+        Get the sha of the last commit on the branch
+        :rtype: str
+        """
+        projid = self.get_project_id()
+        try:
+            response = self.session.get("{0}/{1}/repository/branches/{2}".format(self.gl.projects_url, projid,
+                                                                                 GITLAB_BRANCH))
+            response.raise_for_status()
+            return response.json()['commit']['id']
+        except Exception as ex:
+            raise QualiError("GitLabClient", "ERROR: Failed to get the last commit of the repository at %s" %
+                             self.url + " : " + str(ex))
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_snapshot(self, revision):
+        """
+        Download all the files under the repository path at the given commit, in a single archive
+        :param str revision:  The sha of the commit
+        :return: The files, the key is the path relative to the repository path (as in download_bytes)
+        :rtype: dict[str, str]
+        """
+        dir_path = self.repository_path.strip('/') + '/' if self.repository_path.strip('/') else ''
+        return dict(('/' + path[len(dir_path):], data) for path, data in self._download_archive(revision).iteritems()
+                    if path.startswith(dir_path))
+
+    # ----------------------------------
+    # ----------------------------------
+    def _download_archive(self, revision=GITLAB_BRANCH):
+        projid = self.get_project_id()
+        try:
+            response = self.session.get("{0}/{1}/repository/archive".format(self.gl.projects_url, projid),
+                                        params={'sha': revision})
+            response.raise_for_status()
+            archive_files = dict()
+            with tarfile.open(fileobj=BytesIO(response.content), mode='r:gz') as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    # the files are under a <project>-<branch>-<sha> dir
+                    path = member.name.split('/', 1)[1] if '/' in member.name else member.name
+                    archive_files[path] = archive.extractfile(member).read()
+            return archive_files
+        except Exception as ex:
+            raise QualiError("GitLabClient", "ERROR: Failed to download the archive of the repository at %s" %
+                             self.url + " : " + str(ex))
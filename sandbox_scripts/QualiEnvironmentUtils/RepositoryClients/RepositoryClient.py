@@ -13,3 +13,41 @@ class RepositoryClient(object):
     def download(self, source, destination):
        raise NotImplementedError('subclasses must override download()!')
 
+    @abstractmethod
+    def download_bytes(self, source):
+        raise NotImplementedError('subclasses must override download_bytes()!')
+
+    def download_dir(self, source_dir):
+        """
+        Download all the files in a directory in one go, if the repository supports it
+        :param str source_dir:  The path to the directory
+        :return: The files in the directory, the key is the path relative to source_dir,
+                 or None if the repository can't download directories
+        :rtype: dict[str, str]
+        """
+        return None
+
+    def get_key(self):
+        """
+        Get a string that identifies the repository (and the path in it), for the RepositoryMirror
+        :rtype: str
+        """
+        return self.repository_resource.name
+
+    def get_revision(self):
+        """
+        Get the current revision (e.g. the sha of the last commit) of the repository
+        :return: The revision, or None if the repository can't tell. Without a revision the repository
+                 is not mirrored, see RepositoryMirror
+        :rtype: str
+        """
+        return None
+
+    def download_snapshot(self, revision):
+        """
+        Download all the files of the repository at the given revision
+        :param str revision:  The revision from get_revision
+        :return: The files, the key is the path relative to the repository path (as in download_bytes)
+        :rtype: dict[str, str]
+        """
+        raise NotImplementedError('subclasses that have a revision must override download_snapshot()!')
@@ -0,0 +1,183 @@
+# coding=utf-8
+import base64
+import hashlib
+import json
+import os
+import tempfile
+from threading import Lock
+
+DEFAULT_REPOSITORY_MIRROR_DIR = os.path.join(tempfile.gettempdir(), 'cloudshell_repository_mirror')
+DEFAULT_REPOSITORY_MIRROR_MAX_SNAPSHOTS = 3
+REPOSITORY_SYNC_FILE_NAME = 'repository_sync.json'
+TMP_FILE_PREFIX = '.tmp'
+
+
+class RepositoryMirror(object):
+    _shared_mirrors = dict()
+    _shared_mirrors_lock = Lock()
+
+    def __init__(self, mirror_dir=DEFAULT_REPOSITORY_MIRROR_DIR, max_snapshots=DEFAULT_REPOSITORY_MIRROR_MAX_SNAPSHOTS):
+        """
+        A local copy of the files of the config repositories, kept per revision (commit sha).
+        A revision never changes, so its files are downloaded from the repository once and then read
+        from the mirror, also by the scripts that run later on the execution server
+        :param str mirror_dir:  The directory of the mirror
+        :param int max_snapshots:  The number of revisions kept on the disk for each repository.
+                                   The oldest are removed first
+        """
+        self.mirror_dir = mirror_dir
+        self.max_snapshots = max_snapshots
+        self._lock = Lock()
+        # the files of the snapshots loaded by this process, the key is (repository key, revision)
+        self._snapshots = dict()
+        # the storages that were synced by this process, the key is (sync file path, revision)
+        self._synced = set()
+
+    # ----------------------------------
+    # ----------------------------------
+    @classmethod
+    def shared(cls, mirror_dir=DEFAULT_REPOSITORY_MIRROR_DIR):
+        """
+        Get the mirror of the given dir that is shared by all the storage managers in this process
+        :param str mirror_dir:  The directory of the mirror
+        :rtype: RepositoryMirror
+        """
+        with cls._shared_mirrors_lock:
+            if mirror_dir not in cls._shared_mirrors:
+                cls._shared_mirrors[mirror_dir] = cls(mirror_dir)
+            return cls._shared_mirrors[mirror_dir]
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_snapshot(self, repository_key, revision, loader):
+        """
+        Get the files of a repository at a revision from the mirror, or load them and add them to the mirror
+        :param str repository_key:  Identifies the repository (and the path in it)
+        :param str revision:  The revision of the repository
+        :param loader:  Function with no params that downloads the files of the revision
+        :return: The files, the key is the path in the repository
+        :rtype: dict[str, str]
+        """
+        with self._lock:
+            files = self._snapshots.get((repository_key, revision))
+            if files is None:
+                snapshot_path = self._snapshot_path(repository_key, revision)
+                files = self._read_snapshot(snapshot_path)
+                if files is None:
+                    files = loader()
+                    self._write_snapshot(snapshot_path, files)
+                self._snapshots[(repository_key, revision)] = files
+            return files
+
+    # ----------------------------------
+    # ----------------------------------
+    def sync_to_storage(self, storage_mgr, revision, files):
+        """
+        Upload the files of a revision to the storage, once per revision. Only the files that changed since
+        the revision that was last synced are uploaded. The synced revision and the checksums of its files
+        are kept in a file on the storage. Templates (.tm) are not uploaded, as before
+        :param StorageManager storage_mgr:  The storage to sync
+        :param str revision:  The revision of the files
+        :param dict[str, str] files:  The files, the key is the path relative to the configs root
+        :return: The number of files that were uploaded
+        :rtype: int
+        """
+        configs_root = storage_mgr.get_configs_root()
+        sync_file_path = configs_root + '/' + REPOSITORY_SYNC_FILE_NAME
+        with self._lock:
+            if (sync_file_path, revision) in self._synced:
+                return 0
+        synced = self._read_sync_file(storage_mgr, sync_file_path)
+        if synced.get('revision') == revision:
+            with self._lock:
+                self._synced.add((sync_file_path, revision))
+            return 0
+
+        checksums = dict((path, hashlib.sha1(data).hexdigest()) for path, data in files.iteritems()
+                         if not path.endswith('.tm'))
+        synced_checksums = synced.get('files', dict())
+        changed_paths = sorted(path for path, checksum in checksums.iteritems()
+                               if synced_checksums.get(path) != checksum)
+        results = storage_mgr.upload_many([(configs_root + path, files[path]) for path in changed_paths])
+        failed = [res for res in results if not res.success]
+        if failed:
+            # the sync file is not updated, so the next run uploads the files again
+            storage_mgr.sandbox.report_info("Failed to copy {0} files from the repository to the storage. "
+                                            "First error: {1}".format(len(failed), failed[0].message),
+                                            write_to_output_window=False)
+            return len(results) - len(failed)
+        storage_mgr.upload_bytes(sync_file_path, json.dumps({'revision': revision, 'files': checksums}))
+        with self._lock:
+            self._synced.add((sync_file_path, revision))
+        return len(results)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _read_sync_file(self, storage_mgr, sync_file_path):
+        # read directly from the storage, another script may have just synced it
+        try:
+            return json.loads(storage_mgr.storage_client.download_bytes(sync_file_path))
+        except Exception:
+            return dict()
+
+    # ----------------------------------
+    # ----------------------------------
+    def _repository_dir(self, repository_key):
+        # the key may hold the repository credentials, so it is not written to the disk
+        return os.path.join(self.mirror_dir, hashlib.sha1(repository_key.encode('utf-8')).hexdigest())
+
+    # ----------------------------------
+    # ----------------------------------
+    def _snapshot_path(self, repository_key, revision):
+        return os.path.join(self._repository_dir(repository_key), revision + '.json')
+
+    # ----------------------------------
+    # ----------------------------------
+    def _read_snapshot(self, snapshot_path):
+        try:
+            with open(snapshot_path, 'r') as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            # keep the recently used snapshots from being removed
+            os.utime(snapshot_path, None)
+        except (IOError, OSError, ValueError):
+            return None
+        return dict((path, base64.b64decode(data)) for path, data in snapshot.iteritems())
+
+    # ----------------------------------
+    # ----------------------------------
+    def _write_snapshot(self, snapshot_path, files):
+        repository_dir = os.path.dirname(snapshot_path)
+        try:
+            os.makedirs(repository_dir)
+        except OSError:
+            # already exists (possibly created by another script)
+            pass
+        snapshot = dict((path, base64.b64encode(data)) for path, data in files.iteritems())
+        # write to a temp file and rename it, so other scripts never read a partial snapshot
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_FILE_PREFIX, dir=repository_dir)
+        with os.fdopen(fd, 'w') as tmp_file:
+            json.dump(snapshot, tmp_file)
+        try:
+            os.rename(tmp_path, snapshot_path)
+        except OSError:
+            # on windows rename fails if the file exists, i.e. another script already wrote the snapshot
+            os.remove(tmp_path)
+        self._remove_old_snapshots(repository_dir)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _remove_old_snapshots(self, repository_dir):
+        snapshots = []
+        for file_name in os.listdir(repository_dir):
+            if file_name.startswith(TMP_FILE_PREFIX):
+                continue
+            try:
+                snapshots.append((os.stat(os.path.join(repository_dir, file_name)).st_mtime, file_name))
+            except OSError:
+                continue
+        # least recently used first
+        for mtime, file_name in sorted(snapshots)[:-self.max_snapshots]:
+            try:
+                os.remove(os.path.join(repository_dir, file_name))
+            except OSError:
+                pass
@@ -5,20 +5,30 @@ from cloudshell.helpers.scripts import cloudshell_scripts_helpers as helpers
 from cloudshell.api.cloudshell_api import *
 from cloudshell.api.common_cloudshell_api import *
 from QualiUtils import *
+from RetryPolicy import RetryPolicy
 import datetime, time
 import json
 from time import sleep
 
+ONLINE_LIVE_STATUS = 'Online'
+
+
 class ResourceBase(object):
+    # How long health_check waits between its attempts, shared by all the resources
+    health_check_retry_policy = RetryPolicy()
+
     def __init__(self, resource_name, resource_alias=''):
+        # The commands are loaded from the server on first use (see the commands/connected_commands properties)
+        self._commands = None
+        self._connected_commands = None
+        self._attributes = []
+        self._attributes_index = None
+        self._decrypted_passwords = dict()
         if resource_name != "":
             self.api_session = helpers.get_api_session()
             self.details = self.api_session.GetResourceDetails(resource_name)
             self.name = self.details.Name
             self.address = self.details.Address
-            self.commands = self.api_session.GetResourceCommands(resource_name).Commands
-
-            self.connected_commands = self.api_session.GetResourceConnectedCommands(resource_name).Commands
 
             self.attributes = self.details.ResourceAttributes
             # If there is an attribute 'named' 'model' use its value, otherwise take the family's model
@@ -29,6 +39,36 @@ class ResourceBase(object):
 
             self.alias = resource_alias
 
+    # -----------------------------------------
+    # -----------------------------------------
+    @property
+    def commands(self):
+        """
+        The resource's commands, loaded from the server on first use
+        """
+        if self._commands is None:
+            self._commands = self.api_session.GetResourceCommands(self.name).Commands
+        return self._commands
+
+    @commands.setter
+    def commands(self, value):
+        self._commands = value
+
+    # -----------------------------------------
+    # -----------------------------------------
+    @property
+    def connected_commands(self):
+        """
+        The resource's connected commands, loaded from the server on first use
+        """
+        if self._connected_commands is None:
+            self._connected_commands = self.api_session.GetResourceConnectedCommands(self.name).Commands
+        return self._connected_commands
+
+    @connected_commands.setter
+    def connected_commands(self, value):
+        self._connected_commands = value
+
     # -----------------------------------------
     # -----------------------------------------
     def has_command(self, command_name):
@@ -40,40 +80,77 @@ class ResourceBase(object):
                 return True
         return False
 
+    # -----------------------------------------
+    # -----------------------------------------
+    @property
+    def attributes(self):
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, value):
+        self._attributes = value
+        self._attributes_index = None
+        self._decrypted_passwords = dict()
+
+    # -----------------------------------------
+    # -----------------------------------------
+    def _find_attribute(self, attribute_name):
+        """
+        Find an attribute by its name or by the ending of its name (e.g. 'Model' for 'Generic Router.Model').
+        The lookup is case insensitive. Returns None if the attribute was not found
+        :param str attribute_name:  The name or the ending of the name of the attribute
+        """
+        if self._attributes_index is None:
+            index = dict()
+            for attribute in self._attributes:
+                attribute_name_lower = attribute.Name.lower()
+                # index the full name and every ending of the name that follows a '.'.
+                # the first attribute in the list wins, same as a linear scan
+                index.setdefault(attribute_name_lower, attribute)
+                dot_index = attribute_name_lower.find('.')
+                while dot_index != -1:
+                    index.setdefault(attribute_name_lower[dot_index + 1:], attribute)
+                    dot_index = attribute_name_lower.find('.', dot_index + 1)
+            self._attributes_index = index
+        return self._attributes_index.get(attribute_name.lower())
+
     # -----------------------------------------
     # -----------------------------------------
     def attribute_exist(self, attribute_name):
-        attribute_name = attribute_name.lower()
-        for attribute in self.attributes:
-            if attribute.Name.lower() == attribute_name or attribute.Name.lower().endswith('.' + attribute_name):
-                return True
-        return False
+        return self._find_attribute(attribute_name) is not None
 
     # -----------------------------------------
     # -----------------------------------------
     def get_attribute(self, attribute_name):
-        attribute_name_lower = attribute_name.lower()
-        for attribute in self.attributes:
-            if attribute.Name.lower() == attribute_name_lower or attribute.Name.lower().endswith('.' + attribute_name_lower):
-                if attribute.Type == 'Password':
-                    decrypted = self.api_session.DecryptPassword(attribute.Value)
-                    return decrypted.Value
-                else:
-                    return attribute.Value
-        raise QualiError(self.name, "Attribute: '" + attribute_name + "' not found")
+        attribute = self._find_attribute(attribute_name)
+        if attribute is None:
+            raise QualiError(self.name, "Attribute: '" + attribute_name + "' not found")
+        if attribute.Type == 'Password':
+            # Decrypt each password once per resource
+            if attribute.Name not in self._decrypted_passwords:
+                decrypted = self.api_session.DecryptPassword(attribute.Value)
+                self._decrypted_passwords[attribute.Name] = decrypted.Value
+            return self._decrypted_passwords[attribute.Name]
+        else:
+            return attribute.Value
 
     # -----------------------------------------
     # -----------------------------------------
     def set_attribute_value(self, attribute_name, attribute_value):
         # if caller passes ending string of name, need to handle not knowing prefix
         try:
-            attribute_name = attribute_name.lower()
-            for attribute in self.attributes:
-                if attribute.Name.lower() == attribute_name or attribute.Name.lower().endswith('.' + attribute_name):
-                    self.api_session.SetAttributeValue(resourceFullPath=self.name,
-                                                       attributeName=attribute.Name,
-                                                       attributeValue=attribute_value)
-                    return
+            attribute = self._find_attribute(attribute_name)
+            if attribute is not None:
+                self.api_session.SetAttributeValue(resourceFullPath=self.name,
+                                                   attributeName=attribute.Name,
+                                                   attributeValue=attribute_value)
+                # Keep the local copy in sync with the server. A password is sent in clear text,
+                # so keep it as the decrypted value instead of the (encrypted) attribute value
+                if attribute.Type == 'Password':
+                    self._decrypted_passwords[attribute.Name] = attribute_value
+                else:
+                    self._decrypted_passwords.pop(attribute.Name, None)
+                    attribute.Value = attribute_value
         except CloudShellAPIError as error:
             raise QualiError(self.name, "Failed to set attribute named or ending-with '" + attribute_name + "'. " + error.message)
 
@@ -96,29 +173,45 @@ class ResourceBase(object):
 
     # ----------------------------------
     # ----------------------------------
-    def health_check(self,reservation_id, health_check_attempts=1):
+    def health_check(self,reservation_id, health_check_attempts=1, retry_policy=None, poll_live_status=False):
         """
         Run the healthCheck command on the device
         :param str reservation_id:  Reservation id.
+        :param int health_check_attempts:  Optional. The max number of times to run the command until it passes
+        :param RetryPolicy retry_policy:  Optional. How long to wait between the attempts.
+                                          health_check_retry_policy by default
+        :param bool poll_live_status:  Optional. Retry as soon as the live status of the device is Online,
+                                       instead of waiting the whole delay
         """
+        if retry_policy is None:
+            retry_policy = self.health_check_retry_policy
+        ready = self._is_live_status_online if poll_live_status else None
         if self.has_command('health_check'):
+            start_time = time.time()
             for attempts in range(0, int(health_check_attempts)):
                 try:
                     # Return a detailed description in case of a failure
                     out = self.execute_command(reservation_id, 'health_check', printOutput=True) #.Output()
-                    if out.Output.find(' passed') == -1 and attempts == (int(health_check_attempts) -1):
+                    if out.Output.find(' passed') != -1:
+                        return ""
+                    if attempts == (int(health_check_attempts) -1) or \
+                            not retry_policy.wait(attempts, start_time, ready):
                         err = "Health check did not pass for device " + self.name + ". " + out.Output
                         return err
-                    if out.Output.find(' passed') == -1:
-                        time.sleep(30)
-                    else:
-                        return ""
                 except QualiError as qe:
                     err = "Health check did not pass for device " + self.name + ". " + str(qe)
                     return err
         else:
             return ""
 
+    # -----------------------------------------
+    # -----------------------------------------
+    def _is_live_status_online(self):
+        try:
+            return self.get_live_status().liveStatusName == ONLINE_LIVE_STATUS
+        except QualiError:
+            return False
+
     # -----------------------------------------
     # -----------------------------------------
     def load_network_config(self, reservation_id, config_path, config_type, restore_method='Override'):
@@ -415,7 +508,7 @@ class ResourceBase(object):
     # -----------------------------------------
     def get_live_status(self):
         try:
-            self.api_session.GetResourceLiveStatus(self.name)
+            return self.api_session.GetResourceLiveStatus(self.name)
         except CloudShellAPIError as error:
             raise QualiError(self.name, error.message)
 
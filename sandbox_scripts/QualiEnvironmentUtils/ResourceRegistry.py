@@ -0,0 +1,85 @@
+# coding=utf-8
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+
+DEFAULT_HYDRATION_POOL_SIZE = 16
+
+
+class ResourceRegistry(object):
+    def __init__(self, resource_factory, pool_size=DEFAULT_HYDRATION_POOL_SIZE):
+        """
+        Hold a single ResourceBase object per resource name for the whole reservation
+        :param resource_factory:  Function that gets a resource name and alias and returns a ResourceBase
+        :param int pool_size:  The max number of resources that will be loaded from the server in parallel
+        """
+        self._resource_factory = resource_factory
+        self.pool_size = pool_size
+        self._resources = dict()
+        self._lock = Lock()
+
+    # ----------------------------------
+    # ----------------------------------
+    def get(self, resource_name, resource_alias=''):
+        """
+        Get the resource object of the given resource, load it from the server if needed
+        :param str resource_name:  The name of the resource
+        :param str resource_alias:  The alias of the resource in the blueprint
+        :rtype: ResourceBase
+        """
+        return self.get_many([(resource_name, resource_alias)])[0]
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_many(self, names_and_aliases):
+        """
+        Get the resource objects of the given resources. Resources that were not loaded yet
+        are loaded from the server in parallel
+        :param list[(str, str)] names_and_aliases:  list of (resource name, resource alias)
+        :rtype: list[ResourceBase]
+        """
+        with self._lock:
+            missing = []
+            for resource_name, resource_alias in names_and_aliases:
+                if resource_name in self._resources:
+                    resource = self._resources[resource_name]
+                    # a resource may be first requested without its alias (e.g. as a vm)
+                    if resource_alias and not resource.alias:
+                        resource.alias = resource_alias
+                elif resource_name not in [name for name, alias in missing]:
+                    missing.append((resource_name, resource_alias))
+
+            if len(missing) == 1:
+                self._resources[missing[0][0]] = self._resource_factory(missing[0][0], missing[0][1])
+            elif len(missing) > 1:
+                self._hydrate(missing)
+
+            return [self._resources[resource_name] for resource_name, resource_alias in names_and_aliases]
+
+    # ----------------------------------
+    # ----------------------------------
+    def _hydrate(self, names_and_aliases):
+        pool = ThreadPool(min(len(names_and_aliases), self.pool_size))
+        async_results = [(resource_name, pool.apply_async(self._resource_factory, (resource_name, resource_alias)))
+                         for resource_name, resource_alias in names_and_aliases]
+        pool.close()
+        pool.join()
+        # get() re-raises the error of a resource that failed to load
+        for resource_name, async_result in async_results:
+            self._resources[resource_name] = async_result.get()
+
+    # ----------------------------------
+    # ----------------------------------
+    def remove(self, resource_name):
+        with self._lock:
+            self._resources.pop(resource_name, None)
+
+    # ----------------------------------
+    # ----------------------------------
+    def clear(self):
+        with self._lock:
+            self._resources = dict()
+
+    # ----------------------------------
+    # ----------------------------------
+    def __len__(self):
+        return len(self._resources)
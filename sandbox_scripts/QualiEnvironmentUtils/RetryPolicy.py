@@ -0,0 +1,71 @@
+# coding=utf-8
+import random
+import time
+
+DEFAULT_INITIAL_DELAY = 2
+DEFAULT_MAX_DELAY = 30
+DEFAULT_BACKOFF_FACTOR = 2
+DEFAULT_JITTER = 0.5
+DEFAULT_POLL_INTERVAL = 2
+
+
+class RetryPolicy(object):
+    def __init__(self, initial_delay=DEFAULT_INITIAL_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 backoff_factor=DEFAULT_BACKOFF_FACTOR, jitter=DEFAULT_JITTER, deadline=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        How long to wait between the attempts of an operation: the delay starts small and grows exponentially
+        up to max_delay. A random part of each delay is cut (jitter), so the retries of many devices that
+        failed together don't hit the server together
+        :param float initial_delay:  The delay in seconds after the first attempt
+        :param float max_delay:  The max delay in seconds between two attempts
+        :param float backoff_factor:  The delay is multiplied by it after each attempt
+        :param float jitter:  0 to 1. The part of each delay that is random, 0 for no jitter
+        :param float deadline:  Optional. The max time in seconds from the first attempt, after which there are
+                                no more attempts. None for no deadline
+        :param float poll_interval:  How often in seconds to check if the operation may be retried early, see wait
+        """
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.deadline = deadline
+        self.poll_interval = poll_interval
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_delay(self, attempt):
+        """
+        :param int attempt:  The number of the attempt that failed, from 0
+        :return: The time in seconds to wait before the next attempt
+        :rtype: float
+        """
+        delay = min(self.max_delay, self.initial_delay * (self.backoff_factor ** attempt))
+        return delay - delay * self.jitter * random.random()
+
+    # ----------------------------------
+    # ----------------------------------
+    def wait(self, attempt, start_time, ready=None):
+        """
+        Wait before the next attempt
+        :param int attempt:  The number of the attempt that failed, from 0
+        :param float start_time:  The time.time() of the first attempt
+        :param ready:  Optional. Function with no params that returns True when the operation may be retried,
+                       it is checked every poll_interval seconds to end the wait early
+        :return: False if there should be no more attempts, because of the deadline
+        :rtype: bool
+        """
+        delay = self.get_delay(attempt)
+        if self.deadline is not None:
+            remaining = self.deadline - (time.time() - start_time)
+            if remaining <= 0:
+                return False
+            delay = min(delay, remaining)
+        if ready is None:
+            time.sleep(delay)
+            return True
+        end_time = time.time() + delay
+        while True:
+            time.sleep(max(0, min(self.poll_interval, end_time - time.time())))
+            if time.time() >= end_time or ready():
+                return True
@@ -1,5 +1,6 @@
 # coding=utf-8
 from Resource import *
+from ResourceRegistry import ResourceRegistry
 from cloudshell.core.logger.qs_logger import *
 from cloudshell.helpers.scripts import cloudshell_scripts_helpers as helpers
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
@@ -7,6 +8,7 @@ from os.path import *
 from time import gmtime, strftime
 import smtplib
 from email.mime.text import MIMEText
+from threading import RLock
 
 SEVERITY_INFO = 20
 SEVERITY_ERROR = 40
@@ -18,6 +20,14 @@ class SandboxBase(object):
         Load the configuration from config files on the Blueprint's devices
         :param str reservation_id:  reservation id
         """
+        # Snapshot of the reservation's details, shared by all the root resources getters.
+        # Filled on first use and dropped by invalidate_cache()
+        self._details_snapshot = None
+        self._root_resources_cache = dict()
+        self._cache_lock = RLock()
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        # A single ResourceBase object per resource, shared by all the getters
+        self.resource_registry = ResourceRegistry(self._create_resource)
         try:
             self._logger = logger
             """:type : logging.Logger"""
@@ -166,9 +176,13 @@ class SandboxBase(object):
             Get the root resources
             :rtype: list[ResourceBase]
         """
-        root_resources = []
+        return self._get_cached_root_resources('all', self._build_root_resources)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _build_root_resources(self, details):
+        root_resources_names = []
         root_resources_names_dict = {}
-        details = self.get_details()
         resources = details.ReservationDescription.Resources
         topo_resources = details.ReservationDescription.TopologiesReservedResources
         # Loop over all devices in the sandbox and add to a dictionary all root devices:
@@ -183,10 +197,9 @@ class SandboxBase(object):
                 if topo_resource.Name == root_resource_name:
                     root_resource_alias = topo_resource.Alias
                     break
-            root_resources.append(ResourceBase(root_resource_name, root_resource_alias))
-
-        return root_resources
+            root_resources_names.append((root_resource_name, root_resource_alias))
 
+        return self.resource_registry.get_many(root_resources_names)
 
     # ----------------------------------
     # ----------------------------------
@@ -195,9 +208,13 @@ class SandboxBase(object):
             Get the root resources of vm type
             :rtype: list[ResourceBase]
         """
-        root_resources = []
+        return self._get_cached_root_resources('vm', self._build_root_vm_resources)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _build_root_vm_resources(self, details):
+        root_resources_names = []
         root_resources_names_dict = {}
-        details = self.get_details()
         resources = details.ReservationDescription.Resources
         # Loop over all devices in the sandbox and add to a dictionary all root devices of VM type:
         for resource in resources:
@@ -205,9 +222,9 @@ class SandboxBase(object):
             if resource.VmDetails and hasattr(resource.VmDetails, 'UID') and resource.VmDetails.UID:
                 split_name = resource.Name.split('/')
                 root_resources_names_dict[split_name[0]] = 1
-                root_resources.append(ResourceBase(resource.Name, ''))
+                root_resources_names.append((resource.Name, ''))
 
-        return root_resources
+        return self.resource_registry.get_many(root_resources_names)
 
     # ----------------------------------
     # ----------------------------------
@@ -216,9 +233,13 @@ class SandboxBase(object):
             Get the root resources of networking type
             :rtype: list[ResourceBase]
         """
-        root_resources = []
+        return self._get_cached_root_resources('networking', self._build_root_networking_resources)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _build_root_networking_resources(self, details):
+        root_resources_names = []
         root_resources_names_dict = {}
-        details = self.get_details()
         resources = details.ReservationDescription.Resources
         topo_resources = details.ReservationDescription.TopologiesReservedResources
         # Loop over all devices in the sandbox and add to a dictionary all root devices of type networking devices:
@@ -234,9 +255,9 @@ class SandboxBase(object):
                 if topo_resource.Name == root_resource_name:
                     root_resource_alias = topo_resource.Alias
                     break
-            root_resources.append(ResourceBase(root_resource_name, root_resource_alias))
+            root_resources_names.append((root_resource_name, root_resource_alias))
 
-        return root_resources
+        return self.resource_registry.get_many(root_resources_names)
 
     # ----------------------------------
     # ----------------------------------
@@ -245,8 +266,16 @@ class SandboxBase(object):
             Clear the live status from all the devices
         """
         #TODO change to honor ignor_models
-        root_resources = self.get_root_resources()
-        for resource in root_resources:
+        self.clear_resources_live_status(self.get_root_resources())
+
+    # ----------------------------------
+    # ----------------------------------
+    def clear_resources_live_status(self, resources):
+        """
+            Clear the live status of the given devices
+            :param list[ResourceBase] resources:
+        """
+        for resource in resources:
             self.api_session.SetResourceLiveStatus(resource.name, liveStatusName="Info",
                                                    additionalInfo='status cleared ' + strftime("%H:%M:%S", gmtime()))
 
@@ -263,6 +292,77 @@ class SandboxBase(object):
             err = "Failed to get the Sandbox's details. Unexpected error: " + str(sys.exc_info()[0])
             self.report_error(error_message=err)
 
+    # ----------------------------------
+    # ----------------------------------
+    def get_cached_details(self):
+        """
+            Get the Sandbox's details from the reservation snapshot. The snapshot is retrieved from the server
+            on first use and kept until invalidate_cache() is called.
+        """
+        with self._cache_lock:
+            if self._details_snapshot is None:
+                self.cache_stats['misses'] += 1
+                self._details_snapshot = self.get_details()
+            else:
+                self.cache_stats['hits'] += 1
+            return self._details_snapshot
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_cached_root_resources(self, kind, build_func):
+        """
+            Get a list of root resources from the cache, build it from the reservation snapshot if needed
+            :param str kind:  The key of the list in the cache (all/networking/vm)
+            :param build_func:  Function that creates the list out of the reservation's details
+            :rtype: list[ResourceBase]
+        """
+        with self._cache_lock:
+            if kind in self._root_resources_cache:
+                self.cache_stats['hits'] += 1
+            else:
+                self._root_resources_cache[kind] = build_func(self.get_cached_details())
+            # return a copy so callers can't modify the cached list
+            return list(self._root_resources_cache[kind])
+
+    # ----------------------------------
+    # ----------------------------------
+    def invalidate_cache(self, clear_resources=False):
+        """
+            Drop the reservation snapshot and the root resources built from it.
+            Should be called after the reservation was changed (e.g. apps were deployed or resources were removed)
+            :param bool clear_resources:  Also drop the loaded resource objects, so their details will be reloaded
+        """
+        with self._cache_lock:
+            self._details_snapshot = None
+            self._root_resources_cache = dict()
+            if clear_resources:
+                self.resource_registry.clear()
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_resource(self, resource_name, resource_alias=''):
+        """
+            Get the shared resource object of a resource in the sandbox
+            :param str resource_name:  The name of the resource
+            :param str resource_alias:  The alias of the resource in the blueprint
+            :rtype: ResourceBase
+        """
+        return self.resource_registry.get(resource_name, resource_alias)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _create_resource(self, resource_name, resource_alias):
+        return ResourceBase(resource_name, resource_alias)
+
+    # ----------------------------------
+    # ----------------------------------
+    def report_cache_stats(self):
+        """
+            Write the reservation cache's hit/miss counters to the log
+        """
+        self.report_info(message="Reservation cache: {0} hits, {1} misses".format(self.cache_stats['hits'],
+                                                                                 self.cache_stats['misses']))
+
     # ----------------------------------
     # ----------------------------------
     def activate_all_routes_and_connectors(self, write_to_output=True):
@@ -454,7 +554,7 @@ class SandboxBase(object):
         Get the Apps resources
         :rtype: list[ReservationAppResource]
         """
-        details = self.get_details()
+        details = self.get_cached_details()
         apps_resources = details.ReservationDescription.Apps
 
         return apps_resources
@@ -0,0 +1,236 @@
+# coding=utf-8
+import hashlib
+import json
+import os
+import tempfile
+import time
+from threading import Lock
+
+DEFAULT_STORAGE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'cloudshell_storage_cache')
+DEFAULT_STORAGE_CACHE_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_STORAGE_CACHE_TTL = 300
+TMP_FILE_PREFIX = '.tmp'
+
+
+class StorageCache(object):
+    _shared_caches = dict()
+    _shared_caches_lock = Lock()
+
+    def __init__(self, cache_dir=DEFAULT_STORAGE_CACHE_DIR, max_size=DEFAULT_STORAGE_CACHE_MAX_SIZE,
+                 ttl=DEFAULT_STORAGE_CACHE_TTL):
+        """
+        A local on-disk cache of files downloaded from the storage server.
+        The content is kept once per checksum (blobs/<sha1>), and each url points to the checksum of its content
+        (entries/<sha1 of url>.json), so identical files are kept once. The cache dir is shared by all the scripts
+        that run on the execution server
+        :param str cache_dir:  The directory of the cache
+        :param int max_size:  The max total size in bytes of the cached content. The least recently used
+                              content is removed first. 0 to disable the cache
+        :param int ttl:  Seconds an entry is valid for, when the storage can't tell if the file changed
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._url_locks = dict()
+        self._blobs_dir = os.path.join(cache_dir, 'blobs')
+        self._entries_dir = os.path.join(cache_dir, 'entries')
+        if self.enabled:
+            for dir_name in [self._blobs_dir, self._entries_dir]:
+                try:
+                    os.makedirs(dir_name)
+                except OSError:
+                    # already exists (possibly created by another script)
+                    pass
+
+    # ----------------------------------
+    # ----------------------------------
+    @classmethod
+    def shared(cls, cache_dir=DEFAULT_STORAGE_CACHE_DIR):
+        """
+        Get the cache of the given dir that is shared by all the storage managers in this process
+        :param str cache_dir:  The directory of the cache
+        :rtype: StorageCache
+        """
+        with cls._shared_caches_lock:
+            if cache_dir not in cls._shared_caches:
+                cls._shared_caches[cache_dir] = cls(cache_dir)
+            return cls._shared_caches[cache_dir]
+
+    # ----------------------------------
+    # ----------------------------------
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    # ----------------------------------
+    # ----------------------------------
+    def fetch(self, url, loader, validator_func=None):
+        """
+        Get the content of a url from the cache, or load it and add it to the cache.
+        Threads that ask for the same url at the same time load it once
+        :param str url:  The url of the file on the storage
+        :param loader:  Function with no params that downloads the file and returns its content
+        :param validator_func:  Function with no params that returns the current validator of the file
+                                (e.g. its size and modification time) or None if it can't tell
+        :rtype: str
+        """
+        if not self.enabled:
+            return loader()
+        with self._get_url_lock(url):
+            validator = validator_func() if validator_func is not None else None
+            data = self._get(url, self._read_entry(url), validator)
+            if data is not None:
+                self._count(hit=True)
+                return data
+            self._count(hit=False)
+            data = loader()
+            self.put(url, data, validator)
+            return data
+
+    # ----------------------------------
+    # ----------------------------------
+    def get(self, url, validator=None):
+        """
+        Get the cached content of a url
+        :param str url:  The url of the file on the storage
+        :param str validator:  The current validator of the file. If None, the ttl is used
+        :return: The content, or None if the url is not cached or the content changed
+        :rtype: str
+        """
+        if not self.enabled:
+            return None
+        return self._get(url, self._read_entry(url), validator)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get(self, url, entry, validator):
+        if entry is None:
+            return None
+        if validator is not None:
+            if entry.get('validator') != validator:
+                return None
+        elif time.time() - entry['fetched_at'] > self.ttl:
+            return None
+        blob_path = os.path.join(self._blobs_dir, entry['checksum'])
+        try:
+            with open(blob_path, 'rb') as blob:
+                data = blob.read()
+            # keep the recently used content from being evicted
+            os.utime(blob_path, None)
+        except (IOError, OSError):
+            # the content was evicted
+            self.invalidate(url)
+            return None
+        return data
+
+    # ----------------------------------
+    # ----------------------------------
+    def put(self, url, data, validator=None):
+        """
+        Add the content of a url to the cache
+        :param str url:  The url of the file on the storage
+        :param str data:  The content of the file
+        :param str validator:  The validator of the file, if the storage has one
+        """
+        if not self.enabled or len(data) > self.max_size:
+            return
+        checksum = hashlib.sha1(data).hexdigest()
+        blob_path = os.path.join(self._blobs_dir, checksum)
+        if os.path.isfile(blob_path):
+            os.utime(blob_path, None)
+        else:
+            self._write_file(blob_path, data)
+        entry = {'checksum': checksum, 'validator': validator, 'fetched_at': time.time()}
+        self._write_file(self._entry_path(url), json.dumps(entry))
+        self._evict()
+
+    # ----------------------------------
+    # ----------------------------------
+    def invalidate(self, url):
+        """
+        Remove a url from the cache, e.g. after a new file was uploaded to it
+        :param str url:  The url of the file on the storage
+        """
+        if not self.enabled:
+            return
+        try:
+            os.remove(self._entry_path(url))
+        except OSError:
+            pass
+
+    # ----------------------------------
+    # ----------------------------------
+    def _evict(self):
+        blobs = []
+        total_size = 0
+        for blob_name in os.listdir(self._blobs_dir):
+            if blob_name.startswith(TMP_FILE_PREFIX):
+                continue
+            blob_path = os.path.join(self._blobs_dir, blob_name)
+            try:
+                stat = os.stat(blob_path)
+            except OSError:
+                continue
+            blobs.append((stat.st_mtime, stat.st_size, blob_path))
+            total_size += stat.st_size
+        # least recently used first
+        for mtime, size, blob_path in sorted(blobs):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(blob_path)
+                total_size -= size
+            except OSError:
+                pass
+
+    # ----------------------------------
+    # ----------------------------------
+    def _read_entry(self, url):
+        try:
+            with open(self._entry_path(url), 'r') as entry_file:
+                return json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return None
+
+    # ----------------------------------
+    # ----------------------------------
+    def _entry_path(self, url):
+        # the url may hold the storage credentials, so it is not written to the disk
+        return os.path.join(self._entries_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    # ----------------------------------
+    # ----------------------------------
+    def _write_file(self, path, data):
+        # write to a temp file and rename it, so other scripts never read a partial file
+        fd, tmp_path = tempfile.mkstemp(prefix=TMP_FILE_PREFIX, dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # on windows rename fails if the file exists
+            try:
+                os.remove(path)
+                os.rename(tmp_path, path)
+            except OSError:
+                os.remove(tmp_path)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_url_lock(self, url):
+        with self._lock:
+            if url not in self._url_locks:
+                self._url_locks[url] = Lock()
+            return self._url_locks[url]
+
+    # ----------------------------------
+    # ----------------------------------
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
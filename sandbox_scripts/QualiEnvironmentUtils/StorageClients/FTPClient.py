@@ -1,10 +1,13 @@
 # coding=utf-8
 import ftplib
-import tempfile
+from contextlib import contextmanager
 
 from StorageClient import *
+from FTPConnectionPool import FTPConnectionPool
 from sandbox_scripts.QualiEnvironmentUtils.Sandbox import *
 
+# What the servers answer when a directory is empty or doesn't exist
+EMPTY_DIR_REPLY_PHRASES = ('no files', 'not found', 'no such file', 'does not exist', 'cannot find')
 
 class FTPClient(StorageClient):
     # ----------------------------------
@@ -14,10 +17,11 @@ class FTPClient(StorageClient):
         try:
             self.username = storage_resource.get_attribute("Storage username")
             self.password = storage_resource.get_attribute("Storage password")
-            # self.ftp = ftplib.FTP(self.address, self.username, self.password)
-            self.ftp = ftplib.FTP()
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
+            # Each thread gets its own logged-in session from the pool
+            self.pool = FTPConnectionPool(self.address, self.port, self.username, self.password)
+            # Open the first session now to validate the connection details
+            with self.pool.connection():
+                pass
 
         except Exception as e:
             self.sandbox.report_error("Failed to connect to the FTP server . Error is: " + str(e), raise_error=True)
@@ -26,7 +30,7 @@ class FTPClient(StorageClient):
     # ----------------------------------
     def __del__(self):
         try:
-            self.ftp.quit()
+            self.pool.close()
         except:
             pass
 
@@ -46,14 +50,74 @@ class FTPClient(StorageClient):
         :param str destination:  destination file name
         """
         try:
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
-            source = self._remove_header(source)
-            self.ftp.retrbinary("RETR " + source, open(destination, 'wb').write)
+            with open(destination, 'wb') as destination_file:
+                self._retrieve(source, destination_file)
         except Exception as e:
             self.sandbox.report_error("Failed to download file " + source + " to " + destination +
                                       " from  the FTP server. Error is: " + str(e), raise_error=True)
 
+    # ----------------------------------
+    # ----------------------------------
+    def download_fileobj(self, source, fileobj):
+        """
+        Download file from the ftp server into a file-like object
+        :param str source:  The path to the file on the ftp server
+        :param fileobj:  A file-like object to write the content to
+        """
+        try:
+            self._retrieve(source, fileobj)
+        except Exception as e:
+            self.sandbox.report_error("Failed to download file " + source +
+                                      " from  the FTP server. Error is: " + str(e), raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _retrieve(self, source, fileobj):
+        source = self._remove_header(source)
+        with self.pool.connection() as ftp:
+            ftp.retrbinary("RETR " + source, fileobj.write)
+
+    # ----------------------------------
+    # ----------------------------------
+    @contextmanager
+    def open_reader(self, source):
+        """
+        Stream a file from the ftp server. The data is read from the connection as it arrives
+        :param str source:  The path to the file on the ftp server
+        :rtype: file
+        """
+        source = self._remove_header(source)
+        with self.pool.connection() as ftp:
+            ftp.voidcmd('TYPE I')
+            conn = ftp.transfercmd("RETR " + source)
+            reader = conn.makefile('rb')
+            try:
+                yield reader
+            finally:
+                reader.close()
+                conn.close()
+            ftp.voidresp()
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_validator(self, source):
+        """
+        Get the size and modification time of a file on the ftp server
+        :param str source:  The path to the file on the ftp server
+        :return: 'size:modification time' or None if the server doesn't support SIZE/MDTM
+        :rtype: str
+        """
+        source = self._remove_header(source)
+        try:
+            with self.pool.connection() as ftp:
+                # SIZE is not allowed in ascii mode on some servers
+                ftp.voidcmd('TYPE I')
+                size = ftp.size(source)
+                modified = ftp.sendcmd('MDTM ' + source).split()[-1]
+            return str(size) + ':' + modified
+        except Exception:
+            return None
+
     # ----------------------------------
     # ----------------------------------
     def upload(self, destination, source):
@@ -63,36 +127,88 @@ class FTPClient(StorageClient):
         :param str destination:  destination file name
         """
         try:
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
-            file_idx = destination.rfind('/')
-            destination_dir = destination[:(file_idx-len(destination))]
-            destination_dir = self._remove_header(destination_dir)
-            destination_file = destination[file_idx+1:]
-            # destination_dir = destination_dir.replace('//','/')
-            self.ftp.cwd(destination_dir)
-            myfile = open(source, 'r')
-            self.ftp.storlines('STOR ' + destination_file, myfile)
-            myfile.close()
-            self.sandbox.report_info("Successfully uploaded " + source + " to " + destination_file)
+            with open(source, 'r') as myfile:
+                self._store(destination, myfile)
+            self.sandbox.report_info("Successfully uploaded " + source + " to " + destination)
+        except Exception as e:
+            self.sandbox.report_error("Failed to upload file " + source + " to " + destination +
+                                      " on  the FTP server. Error is: " + str(e), raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload_fileobj(self, destination, fileobj):
+        """
+        Upload the content of a file-like object to the ftp server
+        :param str destination:  destination file name
+        :param fileobj:  A file-like object to read the content from
+        """
+        try:
+            self._store(destination, fileobj)
+            self.sandbox.report_info("Successfully uploaded " + destination)
         except Exception as e:
-            self.sandbox.report_error("Failed to upload file " + source + " to " + destination_file +
+            self.sandbox.report_error("Failed to upload file " + destination +
                                       " on  the FTP server. Error is: " + str(e), raise_error=True)
-            print "Failed to upload file " + source + " to " + destination_file + \
-                  " on  the FTP server. Error is: " + str(e)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _store(self, destination, fileobj):
+        file_idx = destination.rfind('/')
+        destination_dir = destination[:(file_idx-len(destination))]
+        destination_dir = self._remove_header(destination_dir)
+        destination_file = destination[file_idx+1:]
+        # destination_dir = destination_dir.replace('//','/')
+        with self.pool.connection() as ftp:
+            ftp.cwd(destination_dir)
+            ftp.storlines('STOR ' + destination_file, fileobj)
 
     # ----------------------------------
     # ----------------------------------
     def dir_exist(self, dir_name):
         try:
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
             dir_name = self._remove_header(dir_name)
-            self.ftp.cwd(dir_name)
+            with self.pool.connection() as ftp:
+                ftp.cwd(dir_name)
             return True
         except:
             return False
 
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        """
+        Get the names of the files and directories in a directory on the ftp server
+        :param str dir_name:  The path to the directory on the ftp server
+        :return: The names, or None if the directory could not be listed
+        :rtype: list[str]
+        """
+        dir_name = self._remove_header(dir_name)
+        try:
+            with self.pool.connection() as ftp:
+                names = ftp.nlst(dir_name)
+        except (ftplib.error_perm, ftplib.error_temp) as e:
+            # servers answer 450/550 for an empty or a missing directory, but also for a denied one.
+            # A denied directory is not known to be empty
+            if self._is_empty_dir_reply(str(e)):
+                return []
+            return None
+        except Exception:
+            return None
+        # some servers return the names with the path of the directory
+        return [name.rstrip('/').split('/')[-1] for name in names]
+
+    # ----------------------------------
+    # ----------------------------------
+    def _is_empty_dir_reply(self, reply):
+        """
+        :param str reply:  The reply of the ftp server to the listing of a directory
+        :return: True if the reply says there are no files or no such directory
+        :rtype: bool
+        """
+        if not (reply.startswith('450') or reply.startswith('550')):
+            return False
+        reply = reply.lower()
+        return any(phrase in reply for phrase in EMPTY_DIR_REPLY_PHRASES)
+
     # ----------------------------------
     # ----------------------------------
     def _remove_header(self, path):
@@ -107,10 +223,9 @@ class FTPClient(StorageClient):
 
     def create_dir(self,env_dir, write_to_output=True):
         try:
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
             dir_name = self._remove_header(env_dir)
-            self.ftp.mkd(dir_name)
+            with self.pool.connection() as ftp:
+                ftp.mkd(dir_name)
             self.create_src_file_on_storage(env_dir, write_to_output)
         except Exception as e:
             self.sandbox.report_error("Failed to create dir " + dir_name +
@@ -125,16 +240,7 @@ class FTPClient(StorageClient):
             snapshot_source_name = "Snapshot_" + self.sandbox.id
             head, tail = os.path.split(env_dir)
             path = head + '/' + snapshot_source_name + ".txt"
-
-            tmp_file = tempfile.NamedTemporaryFile(delete=False)
-            tf = file(tmp_file.name, 'wb+')
-            tf.write('1')
-            tf.flush()
-            tf.close()
-
-            self.upload(path, tmp_file.name)
-            tmp_file.close()
-            os.unlink(tmp_file.name)
+            self.upload_bytes(path, '1')
 
         except Exception as e:
             self.sandbox.report_error("Failed to create file " + snapshot_source_name +
@@ -145,20 +251,19 @@ class FTPClient(StorageClient):
     # -----------------------------------
     def rename_file(self, file_path, new_name):
         try:
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
             file_path = self._remove_header(file_path)
             new_name = self._remove_header(new_name)
             #self.ftp.rename(from_name,new_name)
             file_idx=file_path.rfind('/')
             destination_dir = file_path[:(file_idx-len(file_path))]
             destination_dir = self._remove_header(destination_dir)
-
-            pwd = self.ftp.pwd()
-            if pwd != destination_dir:
-                self.ftp.cwd(destination_dir)
             from_name = file_path[file_idx+1:]
-            self.ftp.rename(from_name, new_name)
+
+            with self.pool.connection() as ftp:
+                pwd = ftp.pwd()
+                if pwd != destination_dir:
+                    ftp.cwd(destination_dir)
+                ftp.rename(from_name, new_name)
         except Exception as e:
             self.sandbox.report_error("Failed to rename file " + from_name + " to " + new_name +
                                       ". Error is: " + str(e), write_to_output_window=False, raise_error=True)
@@ -172,18 +277,17 @@ class FTPClient(StorageClient):
         :param str file_path:  The path to the file on the ftp server
         """
         try:
-            self.ftp.connect(self.address, self.port)
-            self.ftp.login(self.username, self.password)
             file_path = self._remove_header(file_path)
             file_idx=file_path.rfind('/')
             destination_dir = file_path[:(file_idx-len(file_path))]
             destination_dir = self._remove_header(destination_dir)
-
-            pwd = self.ftp.pwd()
-            if pwd != destination_dir:
-                self.ftp.cwd(destination_dir)
             file_name = file_path[file_idx+1:]
-            self.ftp.delete(file_name)
+
+            with self.pool.connection() as ftp:
+                pwd = ftp.pwd()
+                if pwd != destination_dir:
+                    ftp.cwd(destination_dir)
+                ftp.delete(file_name)
         except Exception as e:
             self.sandbox.report_error("Failed to delete file " + file_path +
                                       ". Error is: " + str(e), write_to_output_window=False, raise_error=True)
@@ -196,15 +300,7 @@ class FTPClient(StorageClient):
         try:
             file_path = self._remove_header(file_path)
             new_config_path = file_path + '/' + dest_name
-
-            tmp_file = tempfile.NamedTemporaryFile(delete=False)
-            tf = file(tmp_file.name, 'wb+')
-            json.dump(saved_artifact_info, tf)
-            tf.flush()
-            tf.close()
-            self.upload(new_config_path, tmp_file.name)
-            tmp_file.close()
-            os.unlink(tmp_file.name)
+            self.upload_bytes(new_config_path, json.dumps(saved_artifact_info))
 
         except:
             err = 'saved artifact info failed '
@@ -219,16 +315,10 @@ class FTPClient(StorageClient):
         new_config_path = root_folder + '/' + dest_name
 
         try:
-            tmp_file = tempfile.NamedTemporaryFile(delete=False)
-            self.download(str(new_config_path), tmp_file)
-            with open(tmp_file, 'r') as outfile:
-                data = json.load(outfile)
-
-            tmp_file.close()
-            os.unlink(tmp_file.name)
+            data = json.loads(self.download_bytes(str(new_config_path)))
 
         except:
             err = 'failed to download artifact info file: ' + new_config_path
             self.sandbox.report_error(err, raise_error=False, write_to_output_window=write_to_output)
 
-        return data
\ No newline at end of file
+        return data
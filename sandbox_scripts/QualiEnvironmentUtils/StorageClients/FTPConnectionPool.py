@@ -0,0 +1,162 @@
+# coding=utf-8
+import ftplib
+import time
+from contextlib import contextmanager
+from threading import Lock, BoundedSemaphore, Thread, Event
+
+DEFAULT_FTP_POOL_SIZE = 8
+DEFAULT_FTP_KEEPALIVE_INTERVAL = 30
+
+
+class FTPConnectionPool(object):
+    def __init__(self, address, port, username, password, max_size=DEFAULT_FTP_POOL_SIZE,
+                 keepalive_interval=DEFAULT_FTP_KEEPALIVE_INTERVAL):
+        """
+        A bounded pool of logged-in FTP sessions. Each thread checks out its own session, so sessions are never
+        shared between threads
+        :param str address:  The address of the FTP server
+        :param int port:  The port of the FTP server
+        :param str username:
+        :param str password:
+        :param int max_size:  The max number of open sessions. Threads wait when all of them are in use
+        :param int keepalive_interval:  Idle sessions get a NOOP every keepalive_interval seconds. 0 to disable
+        """
+        self.address = address
+        self.port = port
+        self.username = username
+        self.password = password
+        self.max_size = max_size
+        self.keepalive_interval = keepalive_interval
+        self._idle = []
+        self._lock = Lock()
+        self._available = BoundedSemaphore(max_size)
+        self._closed = Event()
+        self._keepalive_thread = None
+
+    # ----------------------------------
+    # ----------------------------------
+    @contextmanager
+    def connection(self):
+        """
+        Check out a session for the current thread. The session starts in the login (home) directory
+        and is returned to the pool when done. A session that hit a connection error is dropped
+        :rtype: ftplib.FTP
+        """
+        self._available.acquire()
+        try:
+            ftp = self._checkout()
+            try:
+                yield ftp
+            except (ftplib.error_perm, ftplib.error_reply):
+                # the server answered, so the session is still good
+                self._checkin(ftp)
+                raise
+            except:
+                self._close_connection(ftp)
+                raise
+            else:
+                self._checkin(ftp)
+        finally:
+            self._available.release()
+
+    # ----------------------------------
+    # ----------------------------------
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                ftp, last_used = self._idle.pop()
+            # Health check - go back to the home dir, which also resets the state left by the last user
+            try:
+                ftp.cwd(ftp.home_dir)
+                return ftp
+            except Exception:
+                self._close_connection(ftp)
+        return self._connect()
+
+    # ----------------------------------
+    # ----------------------------------
+    def _checkin(self, ftp):
+        with self._lock:
+            if self._closed.is_set():
+                self._close_connection(ftp)
+                return
+            self._idle.append((ftp, time.time()))
+        self._start_keepalive()
+
+    # ----------------------------------
+    # ----------------------------------
+    def _connect(self):
+        ftp = ftplib.FTP()
+        ftp.connect(self.address, self.port)
+        ftp.login(self.username, self.password)
+        ftp.home_dir = ftp.pwd()
+        return ftp
+
+    # ----------------------------------
+    # ----------------------------------
+    def _close_connection(self, ftp):
+        try:
+            ftp.quit()
+        except Exception:
+            try:
+                ftp.close()
+            except Exception:
+                pass
+
+    # ----------------------------------
+    # ----------------------------------
+    def _start_keepalive(self):
+        if self.keepalive_interval <= 0 or self._keepalive_thread is not None:
+            return
+        with self._lock:
+            if self._keepalive_thread is None:
+                self._keepalive_thread = Thread(target=self._keepalive_loop, name='FTP keepalive')
+                self._keepalive_thread.daemon = True
+                self._keepalive_thread.start()
+
+    # ----------------------------------
+    # ----------------------------------
+    def _keepalive_loop(self):
+        while not self._closed.wait(self.keepalive_interval):
+            self.send_keepalive()
+
+    # ----------------------------------
+    # ----------------------------------
+    def send_keepalive(self):
+        """
+        Send a NOOP on the sessions that were idle for keepalive_interval seconds, drop the dead ones
+        """
+        now = time.time()
+        with self._lock:
+            stale = [(ftp, last_used) for ftp, last_used in self._idle if now - last_used >= self.keepalive_interval]
+            self._idle = [(ftp, last_used) for ftp, last_used in self._idle if now - last_used < self.keepalive_interval]
+        alive = []
+        for ftp, last_used in stale:
+            try:
+                ftp.voidcmd('NOOP')
+                alive.append((ftp, time.time()))
+            except Exception:
+                self._close_connection(ftp)
+        with self._lock:
+            self._idle.extend(alive)
+
+    # ----------------------------------
+    # ----------------------------------
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    # ----------------------------------
+    # ----------------------------------
+    def close(self):
+        """
+        Close all the idle sessions and stop the keepalive. Sessions in use are closed when checked in
+        """
+        self._closed.set()
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for ftp, last_used in idle:
+            self._close_connection(ftp)
@@ -0,0 +1,59 @@
+# coding=utf-8
+import requests
+from TFTPMetadataChannel import TFTPMetadataChannel
+
+HTTP_METADATA_TIMEOUT = 30
+
+
+class HttpMetadataChannel(TFTPMetadataChannel):
+    def __init__(self, tftp_client, agent_url):
+        """
+        Works on the tftp root through a small http agent that runs on the tftp server.
+        The agent gets the paths relative to the tftp root:
+            GET  <agent_url>/list?path=<dir>                      -> ["name", ...] (404 if no such dir)
+            POST <agent_url>/mkdir   {"path": <dir>}
+            POST <agent_url>/delete  {"paths": [<file>, ...]}     -> {"failed": {<file>: <error>}}
+            POST <agent_url>/rename  {"path": <file>, "new_name": <name>}
+        The calls use the storage username and password (basic auth) and share one keep-alive session
+        :param TFTPClient tftp_client:
+        :param str agent_url:  The url of the agent, e.g. http://tftp-server:8069
+        """
+        super(HttpMetadataChannel, self).__init__(tftp_client)
+        self.agent_url = agent_url.rstrip('/')
+        self.session = requests.Session()
+        if tftp_client.username:
+            self.session.auth = (tftp_client.username, tftp_client.password)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _post(self, action, data):
+        response = self.session.post(self.agent_url + '/' + action, json=data, timeout=HTTP_METADATA_TIMEOUT)
+        response.raise_for_status()
+        return response
+
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        response = self.session.get(self.agent_url + '/list', params={'path': dir_name},
+                                    timeout=HTTP_METADATA_TIMEOUT)
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return response.json()
+
+    # ----------------------------------
+    # ----------------------------------
+    def make_dir(self, dir_name):
+        self._post('mkdir', {'path': dir_name})
+
+    # ----------------------------------
+    # ----------------------------------
+    def delete_many(self, file_paths):
+        if len(file_paths) == 0:
+            return dict()
+        return self._post('delete', {'paths': file_paths}).json().get('failed', dict())
+
+    # ----------------------------------
+    # ----------------------------------
+    def rename(self, file_path, new_name):
+        self._post('rename', {'path': file_path, 'new_name': new_name})
@@ -0,0 +1,183 @@
+# coding=utf-8
+import json
+import posixpath
+from threading import Lock
+
+from StorageClient import *
+
+
+class InMemoryStorageClient(StorageClient):
+    # the files only live in this process, so they must not get into the cache that is shared by the scripts
+    cacheable = False
+    # The files of each storage (by address), shared by all the clients in the process
+    _stores = dict()
+    _stores_lock = Lock()
+
+    # ----------------------------------
+    # ----------------------------------
+    def __init__(self, sandbox, storage_resource):
+        """
+        Storage that keeps the files in the memory of the process. Nothing is sent over the network,
+        so it is used for tests and for runs that don't need to keep the files after the script ends
+        """
+        super(InMemoryStorageClient, self).__init__(sandbox, storage_resource)
+        with InMemoryStorageClient._stores_lock:
+            if self.address not in InMemoryStorageClient._stores:
+                InMemoryStorageClient._stores[self.address] = (dict(), set())
+            self._files, self._dirs = InMemoryStorageClient._stores[self.address]
+        self._lock = InMemoryStorageClient._stores_lock
+
+    # ----------------------------------
+    # ----------------------------------
+    @classmethod
+    def clear_all(cls):
+        """
+        Remove the files of all the in-memory storages
+        """
+        with cls._stores_lock:
+            cls._stores.clear()
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_configs_root(self):
+        if self.configs_root != "":
+            return 'memory://' + self.address + '/' + self.configs_root
+
+    # ----------------------------------
+    # ----------------------------------
+    def _remove_header(self, path):
+        path = path.replace('memory://' + self.address + '/', '')
+        path = path.replace(' ', '_').rstrip('/')
+        if path:
+            path = posixpath.normpath(path)
+        return path
+
+    # ----------------------------------
+    # ----------------------------------
+    def download(self, source, destination):
+        """
+        Write a file from the storage to a local file
+        :param str source:  The path to the file on the storage
+        :param str destination:  destination file name
+        """
+        with open(destination, 'wb') as destination_file:
+            self.download_fileobj(source, destination_file)
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_fileobj(self, source, fileobj):
+        """
+        Write a file from the storage to a file-like object
+        :param str source:  The path to the file on the storage
+        :param fileobj:  A file-like object to write the content to
+        """
+        with self._lock:
+            data = self._files.get(self._remove_header(source))
+        if data is None:
+            self.sandbox.report_error("Failed to download file " + source + ". Error is: file not found",
+                                      raise_error=True)
+        fileobj.write(data)
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload(self, destination, source):
+        """
+        Keep a local file in the storage
+        :param str destination:  The path to the file on the storage
+        :param str source:  source file name
+        """
+        with open(source, 'rb') as source_file:
+            self.upload_fileobj(destination, source_file)
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload_fileobj(self, destination, fileobj):
+        """
+        Keep the content of a file-like object in the storage
+        :param str destination:  The path to the file on the storage
+        :param fileobj:  A file-like object to read the content from
+        """
+        destination = self._remove_header(destination)
+        data = fileobj.read()
+        with self._lock:
+            self._files[destination] = data
+            self._add_parent_dirs(destination)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _add_parent_dirs(self, path):
+        path = posixpath.dirname(path)
+        while path and path not in self._dirs:
+            self._dirs.add(path)
+            path = posixpath.dirname(path)
+
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        dir_name = self._remove_header(dir_name)
+        with self._lock:
+            return [posixpath.basename(path) for path in list(self._files.keys()) + list(self._dirs)
+                    if posixpath.dirname(path) == dir_name]
+
+    # ----------------------------------
+    # ----------------------------------
+    def dir_exist(self, dir_name):
+        dir_name = self._remove_header(dir_name)
+        with self._lock:
+            return dir_name in self._dirs or dir_name in self._files
+
+    # ----------------------------------
+    # ----------------------------------
+    def create_dir(self, env_dir, write_to_output=True):
+        with self._lock:
+            dir_name = self._remove_header(env_dir)
+            self._dirs.add(dir_name)
+            self._add_parent_dirs(dir_name)
+        self.create_src_file_on_storage(env_dir, write_to_output)
+
+    # ----------------------------------
+    # ----------------------------------
+    def rename_file(self, file_path, new_name):
+        file_path = self._remove_header(file_path)
+        new_name = self._remove_header(new_name)
+        with self._lock:
+            data = self._files.pop(file_path, None)
+            if data is not None:
+                self._files[posixpath.join(posixpath.dirname(file_path), new_name)] = data
+        if data is None:
+            self.sandbox.report_error("Failed to rename file " + file_path + " to " + new_name +
+                                      ". Error is: file not found", write_to_output_window=False, raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def delete(self, file_path):
+        file_path = self._remove_header(file_path)
+        with self._lock:
+            data = self._files.pop(file_path, None)
+        if data is None:
+            self.sandbox.report_error("Failed to delete file " + file_path + ". Error is: file not found",
+                                      write_to_output_window=False, raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def create_src_file_on_storage(self, env_dir, write_to_output=True):
+        snapshot_source_name = "Snapshot_" + self.sandbox.id
+        head, tail = posixpath.split(self._remove_header(env_dir))
+        self.upload_bytes(posixpath.join(head, snapshot_source_name + ".txt"), '1')
+
+    # ----------------------------------
+    # ----------------------------------
+    def save_artifact_info(self, saved_artifact_info, env_dir, dest_name, write_to_output=True):
+        self.upload_bytes(env_dir + '/' + dest_name, json.dumps(saved_artifact_info))
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_artifact_info(self, root_folder, dest_name, write_to_output=False):
+        data = None
+        new_config_path = root_folder + '/' + dest_name
+        try:
+            data = json.loads(self.download_bytes(new_config_path))
+        except:
+            err = 'failed to download artifact info file: ' + new_config_path
+            self.sandbox.report_error(err, raise_error=False, write_to_output_window=write_to_output)
+        return data
@@ -0,0 +1,194 @@
+# coding=utf-8
+import errno
+import json
+import os
+import shutil
+
+from StorageClient import *
+
+
+class LocalFileSystemClient(StorageClient):
+    # reading the files directly is as fast as reading them from the cache
+    cacheable = False
+
+    # ----------------------------------
+    # ----------------------------------
+    def __init__(self, sandbox, storage_resource):
+        """
+        Storage on a local (or a mounted network) directory of the execution server, e.g. an NFS mount
+        of the config files tree. The "Storage Network configs Path" attribute is the path to the directory
+        """
+        super(LocalFileSystemClient, self).__init__(sandbox, storage_resource)
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_configs_root(self):
+        if self.configs_root != "":
+            return 'file://' + self.configs_root.replace('\\', '/').rstrip('/')
+
+    # ----------------------------------
+    # ----------------------------------
+    def _remove_header(self, path):
+        path = path.replace('file://', '')
+        # the names under the configs root have '_' instead of ' ', as on the FTP and TFTP storage,
+        # the path of the mounted directory itself is kept as is
+        configs_root = self.configs_root.replace('\\', '/').rstrip('/')
+        if path.startswith(configs_root):
+            return configs_root + path[len(configs_root):].replace(' ', '_')
+        return path.replace(' ', '_')
+
+    # ----------------------------------
+    # ----------------------------------
+    def download(self, source, destination):
+        """
+        Copy a file from the storage directory
+        :param str source:  The path to the file on the storage
+        :param str destination:  destination file name
+        """
+        try:
+            shutil.copyfile(self._remove_header(source), destination)
+        except Exception as e:
+            self.sandbox.report_error("Failed to download file " + source + " to " + destination +
+                                      ". Error is: " + str(e), raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_fileobj(self, source, fileobj):
+        """
+        Copy a file from the storage directory into a file-like object
+        :param str source:  The path to the file on the storage
+        :param fileobj:  A file-like object to write the content to
+        """
+        try:
+            with open(self._remove_header(source), 'rb') as source_file:
+                shutil.copyfileobj(source_file, fileobj)
+        except Exception as e:
+            self.sandbox.report_error("Failed to download file " + source + ". Error is: " + str(e),
+                                      raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload(self, destination, source):
+        """
+        Copy a file to the storage directory
+        :param str destination:  The path to the file on the storage
+        :param str source:  source file name
+        """
+        try:
+            with open(source, 'rb') as source_file:
+                self._store(destination, source_file)
+        except Exception as e:
+            self.sandbox.report_error("Failed to upload file " + source + " to " + destination +
+                                      ". Error is: " + str(e), raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload_fileobj(self, destination, fileobj):
+        """
+        Copy the content of a file-like object to the storage directory
+        :param str destination:  The path to the file on the storage
+        :param fileobj:  A file-like object to read the content from
+        """
+        try:
+            self._store(destination, fileobj)
+        except Exception as e:
+            self.sandbox.report_error("Failed to upload file " + destination + ". Error is: " + str(e),
+                                      raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _store(self, destination, fileobj):
+        destination = self._remove_header(destination)
+        destination_dir = os.path.dirname(destination)
+        if destination_dir and not os.path.isdir(destination_dir):
+            os.makedirs(destination_dir)
+        with open(destination, 'wb') as destination_file:
+            shutil.copyfileobj(fileobj, destination_file)
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_validator(self, source):
+        try:
+            stat = os.stat(self._remove_header(source))
+            return str(stat.st_size) + ':' + str(stat.st_mtime)
+        except OSError:
+            return None
+
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        """
+        :return: The names in the directory, empty if it does not exist. None if it could not be listed
+        :rtype: list[str]
+        """
+        try:
+            return os.listdir(self._remove_header(dir_name))
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return []
+            return None
+
+    # ----------------------------------
+    # ----------------------------------
+    def dir_exist(self, dir_name):
+        return os.path.exists(self._remove_header(dir_name))
+
+    # ----------------------------------
+    # ----------------------------------
+    def create_dir(self, env_dir, write_to_output=True):
+        try:
+            dir_name = self._remove_header(env_dir)
+            if not os.path.isdir(dir_name):
+                os.makedirs(dir_name)
+            self.create_src_file_on_storage(env_dir, write_to_output)
+        except Exception as e:
+            self.sandbox.report_error("Failed to create dir " + env_dir + ". Error is: " + str(e),
+                                      write_to_output_window=False, raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def rename_file(self, file_path, new_name):
+        try:
+            file_path = self._remove_header(file_path)
+            new_name = self._remove_header(new_name)
+            os.rename(file_path, os.path.join(os.path.dirname(file_path), new_name))
+        except Exception as e:
+            self.sandbox.report_error("Failed to rename file " + file_path + " to " + new_name +
+                                      ". Error is: " + str(e), write_to_output_window=False, raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def delete(self, file_path):
+        try:
+            os.remove(self._remove_header(file_path))
+        except Exception as e:
+            self.sandbox.report_error("Failed to delete file " + file_path +
+                                      ". Error is: " + str(e), write_to_output_window=False, raise_error=True)
+
+    # ----------------------------------
+    # ----------------------------------
+    def create_src_file_on_storage(self, env_dir, write_to_output=True):
+        snapshot_source_name = "Snapshot_" + self.sandbox.id
+        head, tail = os.path.split(env_dir)
+        self.upload_bytes(head + '/' + snapshot_source_name + ".txt", '1')
+
+    # ----------------------------------
+    # ----------------------------------
+    def save_artifact_info(self, saved_artifact_info, env_dir, dest_name, write_to_output=True):
+        try:
+            self.upload_bytes(env_dir + '/' + dest_name, json.dumps(saved_artifact_info))
+        except:
+            err = 'saved artifact info failed '
+            self.sandbox.report_error(err, write_to_output_window=write_to_output)
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_artifact_info(self, root_folder, dest_name, write_to_output=False):
+        data = None
+        new_config_path = root_folder + '/' + dest_name
+        try:
+            data = json.loads(self.download_bytes(new_config_path))
+        except:
+            err = 'failed to download artifact info file: ' + new_config_path
+            self.sandbox.report_error(err, raise_error=False, write_to_output_window=write_to_output)
+        return data
@@ -0,0 +1,55 @@
+# coding=utf-8
+import errno
+import os
+from TFTPMetadataChannel import TFTPMetadataChannel
+
+
+class MountMetadataChannel(TFTPMetadataChannel):
+    def __init__(self, tftp_client, mount_path):
+        """
+        Works on the tftp root through a share that is mounted on the execution server
+        (e.g. \\\\tftp-server\\tftpboot or an NFS mount)
+        :param TFTPClient tftp_client:
+        :param str mount_path:  The path to the tftp root on the execution server
+        """
+        super(MountMetadataChannel, self).__init__(tftp_client)
+        self.mount_path = mount_path
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_local_path(self, path):
+        return os.path.join(self.mount_path, *[part for part in path.split('/') if part])
+
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        try:
+            return os.listdir(self._get_local_path(dir_name))
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return []
+            raise
+
+    # ----------------------------------
+    # ----------------------------------
+    def make_dir(self, dir_name):
+        local_path = self._get_local_path(dir_name)
+        if not os.path.isdir(local_path):
+            os.makedirs(local_path)
+
+    # ----------------------------------
+    # ----------------------------------
+    def delete_many(self, file_paths):
+        failed = dict()
+        for file_path in file_paths:
+            try:
+                os.remove(self._get_local_path(file_path))
+            except OSError as e:
+                failed[file_path] = str(e)
+        return failed
+
+    # ----------------------------------
+    # ----------------------------------
+    def rename(self, file_path, new_name):
+        local_path = self._get_local_path(file_path)
+        os.rename(local_path, os.path.join(os.path.dirname(local_path), new_name))
@@ -0,0 +1,69 @@
+# coding=utf-8
+import subprocess
+from TFTPMetadataChannel import TFTPMetadataChannel
+
+
+class PsExecMetadataChannel(TFTPMetadataChannel):
+    def __init__(self, tftp_client):
+        """
+        Runs the commands on the tftp server (windows) with psexec. Each call starts a psexec process,
+        so the calls are batched where possible
+        :param TFTPClient tftp_client:
+        """
+        super(PsExecMetadataChannel, self).__init__(tftp_client)
+        self.psexec_path = tftp_client.tftp_psexe.replace('/', '\\') + '\\psexec.exe'
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_windows_path(self, path):
+        return (self.tftp_client.tftp_root_dir + '\\' + path).replace('/', '\\')
+
+    # ----------------------------------
+    # ----------------------------------
+    def _run(self, command_array, interactive=True):
+        ia = [
+                 self.psexec_path,
+                 '\\\\' + self.tftp_client.address,
+                 '/accepteula',
+                 '-u',
+                 self.tftp_client.username,
+                 '-p',
+                 self.tftp_client.password,
+                 '-h'
+             ] + (['-i', '0'] if interactive else []) + command_array
+        return subprocess.check_output(ia, stderr=subprocess.STDOUT)
+
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        try:
+            rv = self._run(['cmd', '/c', 'dir', '/b', self._get_windows_path(dir_name)], interactive=False)
+        except subprocess.CalledProcessError as e:
+            # 'dir' fails on an empty or a missing directory. Any other failure (e.g. logon) is raised
+            if 'file not found' in str(e.output).lower() or 'cannot find' in str(e.output).lower():
+                return []
+            raise
+        # 'dir /b' prints a bare name per line, names may have spaces
+        return [line.strip() for line in str(rv).splitlines() if line.strip() != '']
+
+    # ----------------------------------
+    # ----------------------------------
+    def make_dir(self, dir_name):
+        self._run(['cmd', '/c', 'mkdir', self._get_windows_path(dir_name)])
+
+    # ----------------------------------
+    # ----------------------------------
+    def delete_many(self, file_paths):
+        if len(file_paths) == 0:
+            return dict()
+        try:
+            self._run(['cmd', '/c', 'del', '/q'] + [self._get_windows_path(path) for path in file_paths])
+        except subprocess.CalledProcessError as e:
+            # the output doesn't tell which of the files failed
+            return dict((path, str(e.output)) for path in file_paths)
+        return dict()
+
+    # ----------------------------------
+    # ----------------------------------
+    def rename(self, file_path, new_name):
+        self._run(['cmd', '/c', 'ren', self._get_windows_path(file_path), new_name])
@@ -1,9 +1,12 @@
 # coding=utf-8
 from abc import ABCMeta
 from abc import abstractmethod
+from io import BytesIO
 
 class StorageClient(object):
     __metaclass__ = ABCMeta
+    # Can the downloaded files be kept in the local StorageCache
+    cacheable = True
 
     def __init__(self, sandbox, storage_resource):
         self.sandbox = sandbox
@@ -26,6 +29,72 @@ class StorageClient(object):
     def upload(self, destination, source):
         raise NotImplementedError('subclasses must override upload()!')
 
+    @abstractmethod
+    def download_fileobj(self, source, fileobj):
+        raise NotImplementedError('subclasses must override download_fileobj()!')
+
+    @abstractmethod
+    def upload_fileobj(self, destination, fileobj):
+        raise NotImplementedError('subclasses must override upload_fileobj()!')
+
+    def download_bytes(self, source):
+        """
+        Download a file from the storage into memory
+        :param str source:  The path to the file on the storage
+        :rtype: str
+        """
+        buf = BytesIO()
+        self.download_fileobj(source, buf)
+        return buf.getvalue()
+
+    def upload_bytes(self, destination, data):
+        """
+        Upload data from memory to a file on the storage
+        :param str destination:  The path to the file on the storage
+        :param str data:  The content of the file
+        """
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        self.upload_fileobj(destination, BytesIO(data))
+
+    def open_reader(self, source):
+        """
+        Open a file on the storage for reading, use it in a with statement.
+        Subclasses that can stream the file override this
+        :param str source:  The path to the file on the storage
+        :rtype: file
+        """
+        return BytesIO(self.download_bytes(source))
+
+    def get_validator(self, source):
+        """
+        Get a value that changes when the file on the storage changes (e.g. its size and modification time)
+        Used to check that a cached copy of the file is still valid
+        :param str source:  The path to the file on the storage
+        :return: The validator or None if the storage can't tell
+        :rtype: str
+        """
+        return None
+
+    def list_dir(self, dir_name):
+        """
+        Get the names of the files and directories in a directory on the storage
+        :param str dir_name:  The path to the directory on the storage
+        :return: The names, or None if the storage can't list directories
+        :rtype: list[str]
+        """
+        return None
+
+    def delete_files(self, file_paths):
+        """
+        Delete files in one go, if the storage supports it
+        :param list[str] file_paths:  The paths to the files on the storage
+        :return: The error of each file that could not be deleted, the key is the path,
+                 or None if the storage can't delete files in one go
+        :rtype: dict[str, str]
+        """
+        return None
+
     @abstractmethod
     def dir_exist(self, dir_name):
         raise NotImplementedError('subclasses must override dir_exist()!')
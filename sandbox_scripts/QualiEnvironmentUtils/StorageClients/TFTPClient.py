@@ -1,8 +1,10 @@
 # coding=utf-8
-import subprocess
+from threading import Lock
 from StorageClient import *
+from PsExecMetadataChannel import PsExecMetadataChannel
+from MountMetadataChannel import MountMetadataChannel
+from HttpMetadataChannel import HttpMetadataChannel
 from sandbox_scripts.QualiEnvironmentUtils.Sandbox import *
-import tempfile
 import pip
 
 
@@ -16,6 +18,9 @@ except:
     except:
         imported_tftpy = False
 
+# 1428 bytes blocks fit in a single packet on a 1500 bytes MTU link
+DEFAULT_TFTP_BLKSIZE = 1428
+
 
 class TFTPClient(StorageClient):
     # ----------------------------------
@@ -29,8 +34,100 @@ class TFTPClient(StorageClient):
         self.password = storage_resource.get_attribute("Storage password")
         self.tftp_psexe = storage_resource.get_attribute('TFTP psexec')
         self.tftp_root_dir = storage_resource.get_attribute('TFTP Root')
+        # The block size to negotiate (RFC 2348). 0 for the default 512 bytes blocks
+        self.blksize = DEFAULT_TFTP_BLKSIZE
+        if storage_resource.attribute_exist('TFTP Block Size') and \
+                storage_resource.get_attribute('TFTP Block Size') != '':
+            self.blksize = int(storage_resource.get_attribute('TFTP Block Size'))
+        # Set when the server refused the options, so the next transfers don't ask for them
+        self.options_refused = False
+        self._options_lock = Lock()
+        self.metadata_channel = self._get_metadata_channel(storage_resource)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_metadata_channel(self, storage_resource):
+        """
+        The channel for listing, mkdir, delete and rename on the tftp server: a share of the tftp root
+        mounted on the execution server ('TFTP Mount Path'), an http agent on the tftp server
+        ('TFTP Agent URL'), or psexec
+        :rtype: TFTPMetadataChannel
+        """
+        for attribute_name, channel_class in [('TFTP Mount Path', MountMetadataChannel),
+                                              ('TFTP Agent URL', HttpMetadataChannel)]:
+            if storage_resource.attribute_exist(attribute_name) and \
+                    storage_resource.get_attribute(attribute_name) != '':
+                return channel_class(self, storage_resource.get_attribute(attribute_name))
+        return PsExecMetadataChannel(self)
 
-        self.tftp_client = tftpy.TftpClient(self.address, self.port)
+    # ----------------------------------
+    # ----------------------------------
+    def _get_options(self, download):
+        """
+        The options to negotiate with the server: the block size (RFC 2348), and the transfer size (RFC 2349)
+        of the downloaded files
+        :param bool download:  Options for a download or for an upload
+        :rtype: dict
+        """
+        options = dict()
+        with self._options_lock:
+            if self.options_refused:
+                return options
+        if self.blksize > 0:
+            options['blksize'] = self.blksize
+        if download:
+            options['tsize'] = 0
+        return options
+
+    # ----------------------------------
+    # ----------------------------------
+    def _transfer(self, download, path, local):
+        """
+        Download or upload a file. If the server refuses the options, the transfer is done again without them
+        :param bool download:  Download or upload
+        :param str path:  The path to the file on the tftp server
+        :param local:  The local file name or a file-like object
+        """
+        tftpy_log = logging.getLogger('tftpy')
+        tftpy_log.propagate = False
+        tftpy_log.addHandler(logging.NullHandler())
+
+        path = str(unicode(self._remove_header(path)))
+        options = self._get_options(download)
+        start = local.tell() if hasattr(local, 'tell') else 0
+        try:
+            tftp_client = self._run_transfer(download, path, local, options)
+        except tftpy.TftpException as e:
+            # error code 8 is the server's "failed to negotiate options", the rest are raised by tftpy
+            if not options or ('option' not in str(e).lower() and 'errorcode = 8' not in str(e)):
+                raise
+            with self._options_lock:
+                self.options_refused = True
+            self.sandbox.report_info("The tftp server refused the options " + str(options) + " (" + str(e) +
+                                     "), transferring with the default options", write_to_output_window=False)
+            if hasattr(local, 'seek'):
+                local.seek(start)
+                if download:
+                    local.truncate()
+            tftp_client = self._run_transfer(download, path, local, dict())
+        metrics = tftp_client.context.metrics
+        if metrics.duration > 0:
+            self.sandbox.report_info("{0} {1}: {2} bytes in {3:.2f} seconds ({4:.2f} kbps), block size {5}"
+                                     .format('Downloaded' if download else 'Uploaded', path, metrics.bytes,
+                                             metrics.duration, metrics.kbps,
+                                             tftp_client.context.getBlocksize()),
+                                     write_to_output_window=False)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _run_transfer(self, download, path, local, options):
+        # a client per transfer, tftpy keeps the state of the transfer on the client
+        tftp_client = tftpy.TftpClient(self.address, self.port, options)
+        if download:
+            tftp_client.download(path, local)
+        else:
+            tftp_client.upload(path, local)
+        return tftp_client
 
     # ----------------------------------
     # ----------------------------------
@@ -47,12 +144,7 @@ class TFTPClient(StorageClient):
         :param str source:  The path to the file on the tftp server
         :param str destination:  destination file name
         """
-
-        tftpy.log.propagate = False
-        tftpy.log.addHandler(logging.NullHandler())
-
-        source = self._remove_header(source)
-        self.tftp_client.download(str(unicode(source)), str(unicode(destination)))
+        self._transfer(True, source, str(unicode(destination)))
 
     # ----------------------------------
     # ----------------------------------
@@ -62,60 +154,51 @@ class TFTPClient(StorageClient):
         :param str source:  The path to the file on the tftp server
         :param str destination:  destination file name
         """
-        destination = self._remove_header(destination)
-        self.tftp_client.upload(str(unicode(destination)), str(source))
+        self._transfer(False, destination, str(source))
 
     # ----------------------------------
     # ----------------------------------
-    def dir_exist(self, dir_name):
-
-        try:
-
-            dir_name = self._remove_header(dir_name)
-
-            head,tail = os.path.split(dir_name)
-
-            new_config_path = self.tftp_root_dir +'\\'+ head
-            new_config_path = new_config_path.replace('/', "\\")
-
-            command_array = ['cmd', '/c', 'dir', new_config_path]
-            interactive = True
-
-            self.tftp_psexe = self.tftp_psexe.replace('/', '\\')
-            pspath = self.tftp_psexe + '\psexec.exe'
-            user = self.username
-            password = self.password
-
-            ia = [
-                     pspath,
-                     '\\\\' + self.address,
-                     '/accepteula',
-                     '-u',
-                     user,
-                     '-p',
-                     password,
-                     '-h',
-                 ] + command_array
-
-            rv = subprocess.check_output(ia, stderr=subprocess.STDOUT)
-            #print ' psexec result for dir: ' + str(rv).replace('\r\n', '\n')
-
-            list = str(rv).split()
-            #print list
-            matching = [s for s in list if tail in s]
-
-            for word in matching:
+    def download_fileobj(self, source, fileobj):
+        """
+        Download file from the tftp server into a file-like object
+        :param str source:  The path to the file on the tftp server
+        :param fileobj:  A file-like object to write the content to
+        """
+        self._transfer(True, source, fileobj)
 
-                if word == tail:
-                   return True
+    # ----------------------------------
+    # ----------------------------------
+    def upload_fileobj(self, destination, fileobj):
+        """
+        Upload the content of a file-like object to the tftp server
+        :param str destination:  destination file name
+        :param fileobj:  A file-like object to read the content from
+        """
+        self._transfer(False, destination, fileobj)
 
-            return False
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        """
+        Get the names of the files and directories in a directory on the tftp server, with the metadata channel
+        :param str dir_name:  The path to the directory on the tftp server
+        :return: The names, or None if the directory could not be listed
+        :rtype: list[str]
+        """
+        try:
+            return self.metadata_channel.list_dir(self._remove_header(dir_name).rstrip('/'))
+        except Exception:
+            return None
 
+    # ----------------------------------
+    # ----------------------------------
+    def dir_exist(self, dir_name):
+        try:
+            head, tail = os.path.split(self._remove_header(dir_name).rstrip('/'))
+            return tail in self.metadata_channel.list_dir(head)
         except:
             return False
 
-
-
     # ----------------------------------
     # ----------------------------------
     def _remove_header(self, path):
@@ -133,140 +216,63 @@ class TFTPClient(StorageClient):
 
         """
         try:
-            win_path = self._remove_header(env_dir)
-            new_config_path = self.tftp_root_dir+'\\'+ win_path
-            new_config_path = new_config_path.replace('/',"\\")
-
-            self.tftp_psexe = self.tftp_psexe.replace('/','\\')
-            pspath = self.tftp_psexe +'\psexec.exe'
-            user = self.username
-            password = self.password
-
-            command_array = ['cmd', '/c', 'mkdir', new_config_path]
-
-            interactive = True
-
-            ia = [
-                     pspath,
-                     '\\\\' + self.address,
-                     '/accepteula',
-                     '-u',
-                     user,
-                     '-p',
-                     password,
-                     '-h'
-                 ] + (['-i', '0'] if interactive else []) + command_array
-
-        #   self.sandbox.report_info('Creating new folder: ' +  new_config_path, write_to_output)
-            rv = subprocess.check_output(ia, stderr=subprocess.STDOUT)
-            #print ' psexec result for mkdir: ' + str(rv).replace('\r\n', '\n')
-
+            self.metadata_channel.make_dir(self._remove_header(env_dir))
         except Exception as e:
-            if hasattr(e, 'output'):
-                ou = str(e.output)
-            else:
-                ou = 'no output'
-                err = 'psexec failed: ' + str(e).replace('\r\n', '\n') + ': ' + ou.replace('\r\n', '\n')
-                self.sandbox.report_error(err, write_to_output_window=write_to_output)
+            ou = str(e.output) if hasattr(e, 'output') else 'no output'
+            err = 'Failed to create dir ' + env_dir + ': ' + str(e).replace('\r\n', '\n') + ': ' + \
+                  ou.replace('\r\n', '\n')
+            self.sandbox.report_error(err, raise_error=False, write_to_output_window=write_to_output)
 
-        self.create_src_file_on_tftp(env_dir,write_to_output)
+        self.create_src_file_on_storage(env_dir,write_to_output)
 
     #-----------------------------------
     #-----------------------------------
     def delete(self, file_path):
         """
-		Delete file from the tftp server
-		:param str file_path:  The path to the file on the ftp server
-		"""
-        try:
-            win_path = self._remove_header(file_path)
-            new_config_path = self.tftp_root_dir + '\\' + win_path
-            new_config_path = new_config_path.replace('/', "\\")
-
-            self.tftp_psexe = self.tftp_psexe.replace('/', '\\')
-            pspath = self.tftp_psexe + '\psexec.exe'
-            user = self.username
-            password = self.password
-
-            command_array = ['cmd', '/c', 'del ', new_config_path]
-
-            interactive = True
-
-            ia = [
-                     pspath,
-                     '\\\\' + self.address,
-                     '/accepteula',
-                     '-u',
-                     user,
-                     '-p',
-                     password,
-                     '-h'
-                 ] + (['-i', '0'] if interactive else []) + command_array
-
-            #   self.sandbox.report_info('delete file: ' +  new_config_path, write_to_output)
-            rv = subprocess.check_output(ia, stderr=subprocess.STDOUT)
+        Delete file from the tftp server
+        :param str file_path:  The path to the file on the tftp server
+        """
+        failed = self.delete_files([file_path])
+        if failed:
+            self.sandbox.report_error('Failed to delete file ' + file_path + ': ' + failed[file_path],
+                                      write_to_output_window=True)
 
+    #-----------------------------------
+    #-----------------------------------
+    def delete_files(self, file_paths):
+        """
+        Delete files from the tftp server in one call of the metadata channel
+        :param list[str] file_paths:  The paths to the files on the tftp server
+        :return: The error of each file that could not be deleted, the key is the path
+        :rtype: dict[str, str]
+        """
+        paths = dict((self._remove_header(file_path), file_path) for file_path in file_paths)
+        try:
+            failed = self.metadata_channel.delete_many(list(paths.keys()))
         except Exception as e:
-            if hasattr(e, 'output'):
-                ou = str(e.output)
-            else:
-                ou = 'no output'
-                err = 'psexec failed: ' + str(e).replace('\r\n', '\n') + ': ' + ou.replace('\r\n', '\n')
-                self.sandbox.report_error(err, write_to_output_window=True)
+            failed = dict((path, str(e)) for path in paths)
+        return dict((paths[path], error) for path, error in failed.iteritems())
 
     # ----------------------------------
     # ----------------------------------
     def rename_file(self, file_path, new_name):
         """
-        Rename file from the ftp server
-        :param str file_path:  The path to the file on the ftp server
+        Rename file on the tftp server
+        :param str file_path:  The path to the file on the tftp server
         """
         try:
-            win_path = self._remove_header(file_path)
-            new_config_path = self.tftp_root_dir + '\\' + win_path
-            new_config_path = new_config_path.replace('/', "\\")
-
-            self.tftp_psexe = self.tftp_psexe.replace('/', '\\')
-            pspath = self.tftp_psexe + '\psexec.exe'
-            user = self.username
-            password = self.password
-
-            command_array = ['cmd', '/c', 'ren ', new_config_path,new_name]
-
-            interactive = True
-
-            ia = [
-                     pspath,
-                     '\\\\' + self.address,
-                     '/accepteula',
-                     '-u',
-                     user,
-                     '-p',
-                     password,
-                     '-h'
-                 ] + (['-i', '0'] if interactive else []) + command_array
-
-            #   self.sandbox.report_info('rename file: ' +  new_config_path, write_to_output)
-            rv = subprocess.check_output(ia, stderr=subprocess.STDOUT)
-
-
+            self.metadata_channel.rename(self._remove_header(file_path), new_name)
         except Exception as e:
-            if hasattr(e, 'output'):
-                ou = str(e.output)
-            else:
-                ou = 'no output'
-                err = 'psexec failed: ' + str(e).replace('\r\n', '\n') + ': ' + ou.replace('\r\n', '\n')
-                self.sandbox.report_error(err, write_to_output_window=True)
+            ou = str(e.output) if hasattr(e, 'output') else 'no output'
+            err = 'Failed to rename file ' + file_path + ' to ' + new_name + ': ' + \
+                  str(e).replace('\r\n', '\n') + ': ' + ou.replace('\r\n', '\n')
+            self.sandbox.report_error(err, write_to_output_window=True)
 
     # ----------------------------------
     # ----------------------------------
     def create_src_file_on_storage(self,win_path,write_to_output=True):
         #creating new file on tftp with the sandbox id name to indicate that this topology was saved as snapshot
 
-       #Src
-        #tmp_file = "C:\\tmp.txt"
-        tmp_file = "C:\\tmp" + self.sandbox.id + ".txt"
-        src_path = tmp_file.replace("\\","/")
         #destination
         snapshot_source_name = "Snapshot_"+self.sandbox.id
         head,tail = os.path.split(win_path)
@@ -274,11 +280,7 @@ class TFTPClient(StorageClient):
         path = path.replace("\\","/")
 
         try:
-            with open(tmp_file, 'w+') as outfile:
-                outfile.write("1")
-
-            self.upload(path,tmp_file)
-            os.remove(tmp_file)
+            self.upload_bytes(path, "1")
 
         except Exception as e:
             if hasattr(e, 'output'):
@@ -291,19 +293,12 @@ class TFTPClient(StorageClient):
     # ----------------------------------
     def save_artifact_info(self,saved_artifact_info,env_dir,dest_name,write_to_output=False):
 
-        tmp_file = tempfile.NamedTemporaryFile(delete=False)
         win_path = self._remove_header(env_dir)
         new_config_path = win_path + '/' + dest_name
         new_config_path = new_config_path.replace("\\","/")
 
         try:
-
-            with open(tmp_file, 'w+') as outfile:
-                json.dump(saved_artifact_info,outfile)
-
-            self.upload(new_config_path,tmp_file)
-            tmp_file.close()
-            os.unlink(tmp_file.name)
+            self.upload_bytes(new_config_path, json.dumps(saved_artifact_info))
 
         except:
             err = 'saved artifact info failed'
@@ -319,20 +314,9 @@ class TFTPClient(StorageClient):
         new_config_path = new_config_path.replace("\\","/")
 
         try:
-            # Reading data backm
-            tmp_file = tempfile.NamedTemporaryFile(delete=False)
-            tftpy.log.propagate = False
-            tftpy.log.addHandler(logging.NullHandler())
-
-            self.tftp_client.download(str(new_config_path),tmp_file)
-            with open(tmp_file,'r') as outfile:
-                data = json.load(outfile)
-
-            tmp_file.close()
-            os.unlink(tmp_file.name)
+            data = json.loads(self.download_bytes(new_config_path))
         except:
             err = 'failed to download artifact info file: ' + new_config_path
             self.sandbox.report_error(err, raise_error=False, write_to_output_window=write_to_output)
 
         return data
-
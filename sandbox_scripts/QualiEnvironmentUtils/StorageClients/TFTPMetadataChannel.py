@@ -0,0 +1,44 @@
+# coding=utf-8
+from abc import ABCMeta
+from abc import abstractmethod
+
+
+class TFTPMetadataChannel(object):
+    __metaclass__ = ABCMeta
+
+    def __init__(self, tftp_client):
+        """
+        TFTP only transfers files. A metadata channel does the rest of the file operations on the
+        tftp server (list, mkdir, delete and rename), out of band.
+        The paths are relative to the tftp root, with '/' separators
+        :param TFTPClient tftp_client:
+        """
+        self.tftp_client = tftp_client
+
+    @abstractmethod
+    def list_dir(self, dir_name):
+        """
+        :param str dir_name:  The path to the directory
+        :return: The names of the files and directories in the directory, empty if the directory doesn't exist.
+        Raises if the directory could not be listed
+        :rtype: list[str]
+        """
+        raise NotImplementedError('subclasses must override list_dir()!')
+
+    @abstractmethod
+    def make_dir(self, dir_name):
+        raise NotImplementedError('subclasses must override make_dir()!')
+
+    @abstractmethod
+    def delete_many(self, file_paths):
+        """
+        Delete files in one go
+        :param list[str] file_paths:  The paths to the files
+        :return: The error of each file that could not be deleted, the key is the path
+        :rtype: dict[str, str]
+        """
+        raise NotImplementedError('subclasses must override delete_many()!')
+
+    @abstractmethod
+    def rename(self, file_path, new_name):
+        raise NotImplementedError('subclasses must override rename()!')
@@ -1,22 +1,52 @@
 # coding=utf-8
+import time
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+from threading import Lock
 from sandbox_scripts.QualiEnvironmentUtils.StorageClients.TFTPClient import *
 from sandbox_scripts.QualiEnvironmentUtils.StorageClients.FTPClient import *
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.LocalFileSystemClient import LocalFileSystemClient
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.InMemoryStorageClient import InMemoryStorageClient
 from sandbox_scripts.QualiEnvironmentUtils.RepositoryClients.GitLabClient import *
+from sandbox_scripts.QualiEnvironmentUtils.StorageCache import StorageCache
+from sandbox_scripts.QualiEnvironmentUtils.RepositoryMirror import RepositoryMirror
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import transfer_result_struct, transfer_stats_struct
+
+DEFAULT_MAX_CONCURRENT_TRANSFERS = 8
 
 class StorageManager(object):
-    def __init__(self, sandbox ):
+    def __init__(self, sandbox, storage_cache=None, max_concurrent_transfers=DEFAULT_MAX_CONCURRENT_TRANSFERS,
+                 repository_mirror=None):
         """
         Check if there is an ip pool
         :param SandboxBase sandbox:  The sandbox the config file mgr will work with
-        :param ResourceBase storage_resource:  The storage resource in the sandbox
+        :param StorageCache storage_cache:  Optional. The local cache of the downloaded files.
+                                            The cache shared by all the storage managers is used by default
+        :param int max_concurrent_transfers:  The max number of files download_many/upload_many/delete_many
+                                              transfer in parallel
+        :param RepositoryMirror repository_mirror:  Optional. The local copy of the repository files.
+                                                    The mirror shared by all the storage managers is used by default
         """
         self.sandbox = sandbox
+        self.max_concurrent_transfers = max_concurrent_transfers
+        self.last_transfer_stats = None
+        self.storage_cache = storage_cache if storage_cache is not None else StorageCache.shared()
+        # directory listings of the storage, the key is the path of the directory
+        self._listings = dict()
+        self._listings_lock = Lock()
         storage_resource = self.sandbox.get_storage_server_resource()
         self.storage_exist = False
         if storage_resource is not None:
             self.storage_exist = True
             self.storage_client = self._get_storage_client(storage_resource)
+            if not self.storage_client.cacheable:
+                self.storage_cache = StorageCache(max_size=0)
         self.repository_client = None
+        self.repository_mirror = repository_mirror if repository_mirror is not None else RepositoryMirror.shared()
+        # the files of the repository revision, once the repository was mirrored
+        self._repository_snapshot = None
+        self._repository_snapshot_loaded = False
+        self._repository_lock = Lock()
 
         repository_resource = self.sandbox.get_repository_server_resource()
         self.repo_exist = False
@@ -37,6 +67,10 @@ class StorageManager(object):
             return TFTPClient(self.sandbox,storage_resource)
         elif storage_resource.model.lower() == 'generic ftp server':
             return FTPClient(self.sandbox,storage_resource)
+        elif storage_resource.model.lower() == 'generic local storage':
+            return LocalFileSystemClient(self.sandbox,storage_resource)
+        elif storage_resource.model.lower() == 'generic in-memory storage':
+            return InMemoryStorageClient(self.sandbox,storage_resource)
 
     #----------------------------------
     # ----------------------------------
@@ -71,53 +105,368 @@ class StorageManager(object):
             :param str destination: destination file path
         """
         #TODO download from git if exists in topo
-        if self.repository_client is not None:
+        if self._get_repository_snapshot() is not None:
+            with open(destination, 'wb') as destination_file:
+                destination_file.write(self.download_bytes(source))
+        elif self.repository_client is not None:
             #change the path header to git   from ftp...
             repo_path = source.replace(self.storage_client.get_configs_root(),'')
             # download from git directly to destination
             self.repository_client.download(repo_path, destination)
             if not self._is_template(source):
                 # download to the destination, but also upload from git to the storage in the correlating path
-                self.storage_client.upload(source,destination)
+                self.upload(source,destination)
         else:
-            self.storage_client.download(source,destination)
+            data = self._download_from_storage(source)
+            with open(destination, 'wb') as destination_file:
+                destination_file.write(data)
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_bytes(self, source):
+        """
+            Download a file into memory
+            :param str source: source file path
+            :rtype: str
+        """
+        repository_snapshot = self._get_repository_snapshot()
+        if repository_snapshot is not None:
+            # the files were already copied to the storage when the repository was mirrored
+            repo_path = source.replace(self.storage_client.get_configs_root(),'')
+            if repo_path not in repository_snapshot:
+                raise QualiError("StorageManager", "File " + repo_path + " was not found in the repository")
+            return repository_snapshot[repo_path]
+        if self.repository_client is not None:
+            repo_path = source.replace(self.storage_client.get_configs_root(),'')
+            data = self.repository_client.download_bytes(repo_path)
+            if not self._is_template(source):
+                # also upload from git to the storage in the correlating path
+                self.upload_bytes(source, data)
+            return data
+        return self._download_from_storage(source)
+
+    # ----------------------------------
+    # ----------------------------------
+    def prefetch_repository_dir(self, dir_name):
+        """
+            Download all the files of a directory from the repository in one go, so the files of the
+            directory are not fetched from the repository one by one. Does nothing without a repository
+            :param str dir_name: the path to the directory on the storage
+        """
+        if self.repository_client is None or self._get_repository_snapshot() is not None:
+            return
+        repo_path = dir_name.replace(self.storage_client.get_configs_root(),'')
+        try:
+            self.repository_client.download_dir(repo_path)
+        except QualiError as qe:
+            # the files will be downloaded one by one
+            self.sandbox.report_info("Failed to download " + repo_path + " from the repository. " + str(qe),
+                                     write_to_output_window=False)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_repository_snapshot(self):
+        """
+            Mirror the repository, if it has revisions: get the files of its current revision from the mirror
+            and copy the files that changed to the storage. Done once per storage manager
+            :return: The files of the repository, or None if the repository is not mirrored
+            :rtype: dict[str, str]
+        """
+        if self.repository_client is None:
+            return None
+        with self._repository_lock:
+            if not self._repository_snapshot_loaded:
+                self._repository_snapshot_loaded = True
+                try:
+                    revision = self.repository_client.get_revision()
+                    if revision is not None:
+                        files = self.repository_mirror.get_snapshot(
+                            self.repository_client.get_key(), revision,
+                            lambda: self.repository_client.download_snapshot(revision))
+                        self.repository_mirror.sync_to_storage(self, revision, files)
+                        self._repository_snapshot = files
+                except QualiError as qe:
+                    # the files will be downloaded from the repository one by one
+                    self.sandbox.report_info("Failed to mirror the repository. " + str(qe),
+                                             write_to_output_window=False)
+            return self._repository_snapshot
+
+    # ----------------------------------
+    # ----------------------------------
+    def _download_from_storage(self, source):
+        """
+            Download a file from the storage, through the local cache
+            :param str source: source file path
+            :rtype: str
+        """
+        return self.storage_cache.fetch(source,
+                                        lambda: self.storage_client.download_bytes(source),
+                                        lambda: self.storage_client.get_validator(source))
+
+    # ----------------------------------
+    # ----------------------------------
+    def open_reader(self, source):
+        """
+            Open a file for reading, use it in a with statement
+            :param str source: source file path
+            :rtype: file
+        """
+        if self.repository_client is not None or self.storage_cache.enabled:
+            return BytesIO(self.download_bytes(source))
+        return self.storage_client.open_reader(source)
 
     # ----------------------------------
     # ----------------------------------
     def upload(self, destination, source):
         self.storage_client.upload(destination,source)
+        self.storage_cache.invalidate(destination)
+        self._forget_listing(destination)
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload_bytes(self, destination, data):
+        """
+            Upload data from memory to a file
+            :param str destination: destination file path
+            :param str data: the content of the file
+        """
+        self.storage_client.upload_bytes(destination, data)
+        self.storage_cache.invalidate(destination)
+        self._forget_listing(destination)
 
     # ----------------------------------
     # ----------------------------------
     def dir_exist(self, dir_name):
-        self.storage_client.dir_exist(dir_name)
+        """
+            Check if a directory (or a file) exists on the storage
+            :param str dir_name: the path to the directory
+            :rtype: bool
+        """
+        exist = self._exist_in_listing(dir_name)
+        if exist is None:
+            exist = self.storage_client.dir_exist(dir_name)
+        return exist
+
+    # ----------------------------------
+    # ----------------------------------
+    def file_exist(self, file_path):
+        """
+            Check if a file exists. Looked up in the listing of its directory when the storage can list
+            directories, otherwise the file is downloaded (through the cache)
+            :param str file_path: the path to the file
+            :rtype: bool
+        """
+        exist = None
+        # with a repository the files are downloaded from the repository, not from the storage
+        if self.repository_client is None:
+            exist = self._exist_in_listing(file_path)
+        if exist is None:
+            try:
+                self.download_bytes(file_path)
+                exist = True
+            except:
+                exist = False
+        return exist
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_first(self, file_paths):
+        """
+            Download the first file that exists out of the given files
+            :param list[str] file_paths: the paths to the files, by order of preference
+            :return: the path to the file that was downloaded and its content
+            :rtype: (str, str)
+        """
+        for file_path in file_paths[:-1]:
+            exist = None
+            if self.repository_client is None:
+                exist = self._exist_in_listing(file_path)
+            if exist is False:
+                continue
+            try:
+                return file_path, self.download_bytes(file_path)
+            except:
+                if exist:
+                    raise
+        return file_paths[-1], self.download_bytes(file_paths[-1])
+
+    # ----------------------------------
+    # ----------------------------------
+    def list_dir(self, dir_name):
+        """
+            Get the names of the files and directories in a directory on the storage.
+            The listing of each directory is fetched once and kept until something changes in the directory
+            :param str dir_name: the path to the directory
+            :return: The names, or None if the storage can't list directories
+            :rtype: set[str]
+        """
+        dir_name = dir_name.rstrip('/')
+        with self._listings_lock:
+            if dir_name not in self._listings:
+                listing = self.storage_client.list_dir(dir_name)
+                if listing is None:
+                    return None
+                self._listings[dir_name] = set(listing)
+            return self._listings[dir_name]
+
+    # ----------------------------------
+    # ----------------------------------
+    def _exist_in_listing(self, path):
+        """
+            :return: True/False, or None if the storage can't list directories
+            :rtype: bool
+        """
+        path = path.rstrip('/')
+        listing = self.list_dir(path[:path.rfind('/')])
+        if listing is None:
+            return None
+        return path[path.rfind('/') + 1:] in listing
+
+    # ----------------------------------
+    # ----------------------------------
+    def _forget_listing(self, path):
+        """
+            Drop the cached listing of the directory that holds the given path, after it changed
+            :param str path: the path to the changed file or directory
+        """
+        path = path.rstrip('/')
+        with self._listings_lock:
+            self._listings.pop(path[:path.rfind('/')], None)
 
     # ----------------------------------
     # ----------------------------------
     def create_dir(self,env_dir, write_to_output=True):
         self.storage_client.create_dir(env_dir, write_to_output)
+        self._forget_listing(env_dir)
 
     # ----------------------------------
     # ----------------------------------
     def rename_file(self, file_path, new_name):
         self.storage_client.rename_file(file_path, new_name)
+        self.storage_cache.invalidate(file_path)
+        self.storage_cache.invalidate(file_path[:file_path.rfind('/') + 1] + new_name)
+        self._forget_listing(file_path)
 
     # ----------------------------------
     # ----------------------------------
     def delete(self, file_path):
         self.storage_client.delete(file_path)
+        self.storage_cache.invalidate(file_path)
+        self._forget_listing(file_path)
 
     # ----------------------------------
     # ----------------------------------
     def create_src_file_on_storage(self,win_path,write_to_output=False):
         self.storage_client.create_src_file_on_storage(win_path, write_to_output)
+        self._forget_listing(win_path)
 
     # ----------------------------------
     # ----------------------------------
     def save_artifact_info(self,saved_artifact_info,env_dir,dest_name,write_to_output=False):
         self.storage_client.save_artifact_info(saved_artifact_info,env_dir,dest_name,write_to_output)
+        self._forget_listing(env_dir + '/' + dest_name)
 
     # ----------------------------------
     # ----------------------------------
     def download_artifact_info(self,root_folder,dest_name,write_to_output=False):
-        self.storage_client.download_artifact_info(root_folder, dest_name,write_to_output)
+        return self.storage_client.download_artifact_info(root_folder, dest_name,write_to_output)
+
+    # ----------------------------------
+    # ----------------------------------
+    def download_many(self, sources, use_cache=True):
+        """
+            Download files into memory in parallel
+            :param list[str] sources: the paths to the files
+            :param bool use_cache: Optional. False to read the files straight from the storage, for files that
+                                   other scripts may have just written
+            :return: A result per file, in the order of sources. The content is in the data of the result
+            :rtype: list[transfer_result_struct]
+        """
+        def download(result, payload):
+            if use_cache:
+                result.data = self.download_bytes(result.path)
+            else:
+                result.data = self.storage_client.download_bytes(result.path)
+            result.size = len(result.data)
+
+        return self._run_transfers([(source, None) for source in sources], download, 'Downloaded')
+
+    # ----------------------------------
+    # ----------------------------------
+    def upload_many(self, files):
+        """
+            Upload data from memory to files in parallel
+            :param list[(str, str)] files: (destination file path, the content of the file) for each file
+            :return: A result per file, in the order of files
+            :rtype: list[transfer_result_struct]
+        """
+        def upload(result, data):
+            self.upload_bytes(result.path, data)
+            result.size = len(data)
+
+        return self._run_transfers(files, upload, 'Uploaded')
+
+    # ----------------------------------
+    # ----------------------------------
+    def delete_many(self, file_paths):
+        """
+            Delete files in one go if the storage supports it, otherwise in parallel
+            :param list[str] file_paths: the paths to the files
+            :return: A result per file, in the order of file_paths
+            :rtype: list[transfer_result_struct]
+        """
+        start_time = time.time()
+        failed = self.storage_client.delete_files(file_paths) if len(file_paths) > 0 else None
+        if failed is not None:
+            results = [transfer_result_struct(file_path) for file_path in file_paths]
+            for result in results:
+                self.storage_cache.invalidate(result.path)
+                self._forget_listing(result.path)
+                if result.path in failed:
+                    result.success = False
+                    result.message = failed[result.path]
+            self.last_transfer_stats = transfer_stats_struct(results, time.time() - start_time)
+            return results
+
+        def delete(result, payload):
+            self.delete(result.path)
+
+        return self._run_transfers([(file_path, None) for file_path in file_paths], delete, 'Deleted')
+
+    # ----------------------------------
+    # ----------------------------------
+    def _run_transfers(self, items, transfer, action):
+        """
+            Run a transfer function on each file in a thread pool, and keep the stats of the transfers
+            in last_transfer_stats
+            :param list[(str, object)] items: (file path, payload for the transfer function) for each file
+            :param transfer: function that gets the transfer_result_struct of the file and the payload
+            :param str action: the name of the action for the log
+            :rtype: list[transfer_result_struct]
+        """
+        results = [transfer_result_struct(path) for path, payload in items]
+        if len(results) == 0:
+            self.last_transfer_stats = transfer_stats_struct(results, 0)
+            return results
+
+        def run_transfer(result_and_payload):
+            result, payload = result_and_payload
+            start_time = time.time()
+            try:
+                transfer(result, payload)
+            except Exception as e:
+                result.success = False
+                result.message = str(e)
+            result.run_time = time.time() - start_time
+
+        start_time = time.time()
+        pool = ThreadPool(min(len(results), self.max_concurrent_transfers))
+        pool.map(run_transfer, zip(results, [payload for path, payload in items]))
+        pool.close()
+        pool.join()
+        self.last_transfer_stats = transfer_stats_struct(results, time.time() - start_time)
+        stats = self.last_transfer_stats
+        self.sandbox.report_info("{0} {1} files ({2} failed), {3} bytes in {4:.1f} seconds ({5:.0f} bytes/sec)"
+                                 .format(action, stats.files, stats.failed, stats.bytes, stats.run_time,
+                                         stats.bytes_per_second), write_to_output_window=False)
+        return results
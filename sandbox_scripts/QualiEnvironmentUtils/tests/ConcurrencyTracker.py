@@ -0,0 +1,32 @@
+import time
+from threading import Lock
+
+
+class ConcurrencyTracker(object):
+    def __init__(self, duration=0):
+        """
+        Track the calls that the worker threads of a test make, and how many of them run at the same time.
+        A mock does not update its call count atomically, so the calls are tracked here under a lock instead
+        :param float duration:  Optional. How long in seconds each call takes
+        """
+        self.duration = duration
+        self.calls = []
+        self.max_running = 0
+        self._running = 0
+        self._lock = Lock()
+
+    # ----------------------------------
+    # ----------------------------------
+    def run(self, call=None):
+        """
+        Run a call: record it and wait duration seconds
+        :param call:  Optional. What to record in calls, e.g. the name of the resource
+        """
+        with self._lock:
+            self.calls.append(call)
+            self._running += 1
+            self.max_running = max(self.max_running, self._running)
+        if self.duration:
+            time.sleep(self.duration)
+        with self._lock:
+            self._running -= 1
@@ -0,0 +1,81 @@
+import unittest
+import time
+from threading import Lock
+from mock import Mock
+from sandbox_scripts.QualiEnvironmentUtils.DagScheduler import DagScheduler
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+
+
+class DagSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = DagScheduler(Mock(), max_parallel_steps=4)
+        self.lock = Lock()
+        self.events = []
+
+    def tearDown(self):
+        pass
+
+    def _step(self, name, duration=0.0, error=None):
+        def run():
+            with self.lock:
+                self.events.append(('start', name))
+            time.sleep(duration)
+            with self.lock:
+                self.events.append(('end', name))
+            if error:
+                raise error
+            return name
+        return run
+
+    def _index(self, event, name):
+        return self.events.index((event, name))
+
+    def test_steps_run_after_their_dependencies(self):
+        self.scheduler.add_step('c', self._step('c'), depends_on=['b'])
+        self.scheduler.add_step('b', self._step('b'), depends_on=['a'])
+        self.scheduler.add_step('a', self._step('a'))
+
+        self.assertTrue(self.scheduler.run())
+        self.assertLess(self._index('end', 'a'), self._index('start', 'b'))
+        self.assertLess(self._index('end', 'b'), self._index('start', 'c'))
+        self.assertEqual(self.scheduler.step_results, {'a': 'a', 'b': 'b', 'c': 'c'})
+
+    def test_independent_steps_run_in_parallel(self):
+        self.scheduler.add_step('root', self._step('root'))
+        self.scheduler.add_step('left', self._step('left', 0.3), depends_on=['root'])
+        self.scheduler.add_step('right', self._step('right', 0.3), depends_on=['root'])
+        self.scheduler.add_step('join', self._step('join'), depends_on=['left', 'right'])
+
+        start = time.time()
+        self.assertTrue(self.scheduler.run())
+        self.assertLess(time.time() - start, 0.55)
+        self.assertLess(self._index('start', 'right'), self._index('end', 'left'))
+        self.assertGreater(self._index('start', 'join'), self._index('end', 'right'))
+
+    def test_dependents_of_failed_step_are_skipped(self):
+        self.scheduler.add_step('a', self._step('a', error=ValueError('a failed')))
+        self.scheduler.add_step('b', self._step('b'), depends_on=['a'])
+        self.scheduler.add_step('c', self._step('c'), depends_on=['b'])
+        self.scheduler.add_step('d', self._step('d'))
+
+        self.assertFalse(self.scheduler.run())
+        self.assertEqual(list(self.scheduler.step_errors.keys()), ['a'])
+        self.assertEqual(self.scheduler.skipped_steps, ['b', 'c'])
+        self.assertIn(('end', 'd'), self.events)
+        self.assertNotIn(('start', 'b'), self.events)
+
+    def test_unknown_dependency(self):
+        self.scheduler.add_step('a', self._step('a'), depends_on=['missing'])
+        with self.assertRaises(QualiError):
+            self.scheduler.run()
+
+    def test_circular_dependency(self):
+        self.scheduler.add_step('a', self._step('a'), depends_on=['b'])
+        self.scheduler.add_step('b', self._step('b'), depends_on=['a'])
+        with self.assertRaises(QualiError):
+            self.scheduler.run()
+        self.assertEqual(self.events, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
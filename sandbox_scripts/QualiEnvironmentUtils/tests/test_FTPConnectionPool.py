@@ -0,0 +1,105 @@
+import unittest
+import ftplib
+import time
+from threading import Lock, Thread
+from mock import patch, Mock
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.FTPConnectionPool import FTPConnectionPool
+
+
+class FTPConnectionPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.sessions = []
+        self.lock = Lock()
+
+        def create_session():
+            ftp = Mock()
+            ftp.pwd.return_value = '/home/user'
+            with self.lock:
+                self.sessions.append(ftp)
+            return ftp
+
+        patcher = patch('sandbox_scripts.QualiEnvironmentUtils.StorageClients.FTPConnectionPool.ftplib.FTP',
+                        side_effect=create_session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = FTPConnectionPool('1.2.3.4', 21, 'user', 'pass', max_size=2, keepalive_interval=0)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_session_is_reused(self):
+        with self.pool.connection() as ftp1:
+            pass
+        with self.pool.connection() as ftp2:
+            pass
+        self.assertIs(ftp1, ftp2)
+        self.assertEqual(len(self.sessions), 1)
+        ftp1.login.assert_called_once_with('user', 'pass')
+        # the reused session is sent back to the home dir
+        ftp2.cwd.assert_called_once_with('/home/user')
+
+    def test_threads_get_different_sessions(self):
+        with self.pool.connection() as ftp1:
+            with self.pool.connection() as ftp2:
+                self.assertIsNot(ftp1, ftp2)
+        self.assertEqual(self.pool.idle_count(), 2)
+
+    def test_max_size_is_not_exceeded(self):
+        in_use = []
+        max_in_use = []
+
+        def use_session():
+            with self.pool.connection():
+                with self.lock:
+                    in_use.append(1)
+                    max_in_use.append(len(in_use))
+                time.sleep(0.05)
+                with self.lock:
+                    in_use.pop()
+
+        threads = [Thread(target=use_session) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(max_in_use), 2)
+        self.assertLessEqual(len(self.sessions), 2)
+
+    def test_dead_session_is_replaced(self):
+        with self.pool.connection() as ftp1:
+            pass
+        ftp1.cwd.side_effect = EOFError()
+        with self.pool.connection() as ftp2:
+            pass
+        self.assertIsNot(ftp1, ftp2)
+        self.assertEqual(len(self.sessions), 2)
+
+    def test_session_is_kept_after_server_error(self):
+        with self.assertRaises(ftplib.error_perm):
+            with self.pool.connection():
+                raise ftplib.error_perm('550 No such file')
+        self.assertEqual(self.pool.idle_count(), 1)
+
+    def test_session_is_dropped_after_connection_error(self):
+        with self.assertRaises(EOFError):
+            with self.pool.connection():
+                raise EOFError()
+        self.assertEqual(self.pool.idle_count(), 0)
+        self.sessions[0].quit.assert_called_once_with()
+
+    def test_keepalive_sends_noop_to_idle_sessions(self):
+        with self.pool.connection() as ftp:
+            pass
+        self.pool.send_keepalive()
+        ftp.voidcmd.assert_called_once_with('NOOP')
+
+    def test_keepalive_drops_dead_sessions(self):
+        with self.pool.connection() as ftp:
+            pass
+        ftp.voidcmd.side_effect = EOFError()
+        self.pool.send_keepalive()
+        self.assertEqual(self.pool.idle_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
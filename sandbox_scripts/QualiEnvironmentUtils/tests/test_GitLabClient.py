@@ -0,0 +1,98 @@
+import unittest
+import base64
+import tarfile
+from io import BytesIO
+from mock import patch, Mock
+from sandbox_scripts.QualiEnvironmentUtils.RepositoryClients.GitLabClient import GitLabClient
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+
+
+def create_archive(files):
+    archive_data = BytesIO()
+    with tarfile.open(fileobj=archive_data, mode='w:gz') as archive:
+        for path, data in files.items():
+            info = tarfile.TarInfo('configs-master-1a2b3c/' + path)
+            info.size = len(data)
+            archive.addfile(info, BytesIO(data))
+    return archive_data.getvalue()
+
+
+class GitLabClientTests(unittest.TestCase):
+    def setUp(self):
+        GitLabClient._project_ids.clear()
+        GitLabClient._sessions.clear()
+        patcher = patch('sandbox_scripts.QualiEnvironmentUtils.RepositoryClients.GitLabClient.gitlab.Gitlab')
+        self.mock_gitlab_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gl = self.mock_gitlab_class.return_value
+        self.gl.headers = {'PRIVATE-TOKEN': 'token'}
+        self.gl.verify_ssl = True
+        self.gl.projects_url = 'https://gitlab/api/v3/projects'
+        self.gl.getall.side_effect = lambda fn, *args, **kwargs: fn(*args)
+        patcher = patch('sandbox_scripts.QualiEnvironmentUtils.RepositoryClients.GitLabClient.requests.Session')
+        self.mock_session_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = self.mock_session_class.return_value
+        self.session.headers = dict()
+
+    def _create_client(self, project_name='configs'):
+        attributes = {'GitLab URL': 'https://gitlab',
+                      'GitLab Token': 'token',
+                      'GitLab Project Name': project_name,
+                      'Repository Path': 'Configs'}
+        repository_resource = Mock()
+        repository_resource.get_attribute.side_effect = lambda name: attributes[name]
+        return GitLabClient(Mock(), repository_resource)
+
+    def _file_response(self, data):
+        response = Mock()
+        response.json.return_value = {'content': base64.b64encode(data)}
+        return response
+
+    def test_project_id_is_found_once_for_all_clients(self):
+        self.gl.searchproject.return_value = [{'id': 7, 'name': 'configs-old'}, {'id': 8, 'name': 'configs'}]
+        self.session.get.return_value = self._file_response('hostname r1')
+        self._create_client().download_bytes('/Gold/r1_Switch.cfg')
+        data = self._create_client().download_bytes('/Gold/r1_Switch.cfg')
+        self.assertEqual(data, 'hostname r1')
+        self.gl.searchproject.assert_called_once_with('configs')
+        self.gl.getprojects.assert_not_called()
+        self.session.get.assert_called_with('https://gitlab/api/v3/projects/8/repository/files',
+                                            params={'file_path': 'Configs/Gold/r1_Switch.cfg', 'ref': 'master'})
+        self.assertEqual(self.mock_session_class.call_count, 1)
+        self.assertEqual(self.session.headers, {'PRIVATE-TOKEN': 'token'})
+
+    def test_project_with_namespace_is_looked_up_by_path(self):
+        self.gl.getproject.return_value = {'id': 9, 'name': 'configs'}
+        self.assertEqual(self._create_client('network/configs').get_project_id(), 9)
+        self.gl.getproject.assert_called_once_with('network/configs')
+        self.gl.searchproject.assert_not_called()
+
+    def test_project_not_found(self):
+        self.gl.searchproject.return_value = []
+        self.gl.getprojects.return_value = [{'id': 7, 'name': 'other'}]
+        with self.assertRaises(QualiError) as ctx:
+            self._create_client().get_project_id()
+        self.assertIn('7-other', ctx.exception.message)
+
+    def test_download_dir_fetches_one_archive(self):
+        self.gl.searchproject.return_value = [{'id': 8, 'name': 'configs'}]
+        response = Mock()
+        response.content = create_archive({'Configs/Gold/r1_Switch.cfg': 'hostname r1',
+                                           'Configs/Gold/Switch.tm': 'hostname {Device.Self.Name}',
+                                           'Configs/Base/r1_Switch.cfg': 'hostname base'})
+        self.session.get.return_value = response
+        client = self._create_client()
+
+        files = client.download_dir('/Gold/')
+
+        self.assertEqual(files, {'r1_Switch.cfg': 'hostname r1', 'Switch.tm': 'hostname {Device.Self.Name}'})
+        self.assertEqual(client.download_bytes('/Base/r1_Switch.cfg'), 'hostname base')
+        with self.assertRaises(QualiError):
+            client.download_bytes('/Gold/r2_Switch.cfg')
+        self.session.get.assert_called_once_with('https://gitlab/api/v3/projects/8/repository/archive',
+                                                 params={'sha': 'master'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import errno
+import os
+import shutil
+import tempfile
+from mock import Mock, patch
+from sandbox_scripts.QualiEnvironmentUtils.StorageManager import StorageManager
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.LocalFileSystemClient import LocalFileSystemClient
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.InMemoryStorageClient import InMemoryStorageClient
+
+
+class StorageClientContractTests(object):
+    """
+    Tests that run on each of the local storage clients, through StorageManager
+    """
+    def _create_storage_resource(self, model, configs_root):
+        attributes = {'Storage Port': '0',
+                      'Storage Network configs Path': configs_root}
+        storage_resource = Mock()
+        storage_resource.model = model
+        storage_resource.address = 'localhost'
+        storage_resource.get_attribute.side_effect = lambda name: attributes[name]
+        self.sandbox = Mock()
+        self.sandbox.id = '5487c6ce-d0b3-43e9-8ee7-e27af8406905'
+        self.sandbox.get_storage_server_resource.return_value = storage_resource
+        self.sandbox.get_repository_server_resource.return_value = None
+        self.sandbox.report_error.side_effect = ValueError('reported')
+        self.storage_mgr = StorageManager(self.sandbox)
+        self.root = self.storage_mgr.get_configs_root()
+
+    def test_upload_and_download_bytes(self):
+        self.storage_mgr.upload_bytes(self.root + '/Gold/r1_Switch.cfg', 'hostname r1')
+        self.assertEqual(self.storage_mgr.download_bytes(self.root + '/Gold/r1_Switch.cfg'), 'hostname r1')
+        with self.storage_mgr.open_reader(self.root + '/Gold/r1_Switch.cfg') as reader:
+            self.assertEqual(reader.read(), 'hostname r1')
+
+    def test_download_missing_file_is_reported(self):
+        with self.assertRaises(ValueError):
+            self.storage_mgr.download_bytes(self.root + '/Gold/missing.cfg')
+
+    def test_file_exist(self):
+        self.storage_mgr.upload_bytes(self.root + '/Gold/Switch.tm', 'hostname {Device.Self.Name}')
+        self.assertTrue(self.storage_mgr.file_exist(self.root + '/Gold/Switch.tm'))
+        self.assertFalse(self.storage_mgr.file_exist(self.root + '/Gold/r1_Switch.cfg'))
+
+    def test_create_snapshot_dir(self):
+        snapshot_dir = self.root + '/Snapshots/s1'
+        self.assertFalse(self.storage_mgr.dir_exist(snapshot_dir))
+        self.storage_mgr.create_dir(snapshot_dir)
+        self.assertTrue(self.storage_mgr.dir_exist(snapshot_dir))
+        self.assertTrue(self.storage_mgr.dir_exist(self.root + '/Snapshots/Snapshot_' + self.sandbox.id + '.txt'))
+
+    def test_artifact_info(self):
+        snapshot_dir = self.root + '/Snapshots/s1'
+        self.storage_mgr.create_dir(snapshot_dir)
+        self.storage_mgr.save_artifact_info({'resource_name': 'r1'}, snapshot_dir, 'r1.json')
+        self.assertEqual(self.storage_mgr.download_artifact_info(snapshot_dir, 'r1.json'), {'resource_name': 'r1'})
+
+    def test_rename_and_delete(self):
+        self.storage_mgr.upload_bytes(self.root + '/Snapshots/s1/r1.cfg', 'hostname r1')
+        self.storage_mgr.rename_file(self.root + '/Snapshots/s1/r1.cfg', 'r1_Switch.cfg')
+        self.assertEqual(self.storage_mgr.download_bytes(self.root + '/Snapshots/s1/r1_Switch.cfg'), 'hostname r1')
+        self.storage_mgr.delete(self.root + '/Snapshots/s1/r1_Switch.cfg')
+        self.assertFalse(self.storage_mgr.file_exist(self.root + '/Snapshots/s1/r1_Switch.cfg'))
+
+
+class LocalFileSystemClientTests(StorageClientContractTests, unittest.TestCase):
+    def setUp(self):
+        self.configs_dir = tempfile.mkdtemp()
+        self._create_storage_resource('Generic Local Storage', self.configs_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.configs_dir)
+
+    def test_client_type(self):
+        self.assertIsInstance(self.storage_mgr.storage_client, LocalFileSystemClient)
+        self.assertFalse(self.storage_mgr.storage_cache.enabled)
+
+    def test_files_are_written_to_the_directory(self):
+        self.storage_mgr.upload_bytes(self.root + '/Gold/r1_Switch.cfg', 'hostname r1')
+        with open(os.path.join(self.configs_dir, 'Gold', 'r1_Switch.cfg')) as config_file:
+            self.assertEqual(config_file.read(), 'hostname r1')
+
+    def test_spaces_in_names_are_underscores(self):
+        os.makedirs(os.path.join(self.configs_dir, 'Gold', 'Large_Office'))
+        with open(os.path.join(self.configs_dir, 'Gold', 'Large_Office', 'r1_Switch.cfg'), 'w') as config_file:
+            config_file.write('hostname r1')
+        self.assertEqual(self.storage_mgr.download_bytes(self.root + '/Gold/Large Office/r1_Switch.cfg'),
+                         'hostname r1')
+
+    def test_list_dir(self):
+        self.storage_mgr.upload_bytes(self.root + '/Gold/r1_Switch.cfg', 'hostname r1')
+        client = self.storage_mgr.storage_client
+        self.assertEqual(client.list_dir(self.root + '/Gold'), ['r1_Switch.cfg'])
+        self.assertEqual(client.list_dir(self.root + '/Base'), [])
+        with patch('os.listdir', side_effect=OSError(errno.EACCES, 'Permission denied')):
+            self.assertIsNone(client.list_dir(self.root + '/Gold'))
+
+
+class InMemoryStorageClientTests(StorageClientContractTests, unittest.TestCase):
+    def setUp(self):
+        InMemoryStorageClient.clear_all()
+        self._create_storage_resource('Generic In-Memory Storage', 'Configs')
+
+    def tearDown(self):
+        InMemoryStorageClient.clear_all()
+
+    def test_client_type(self):
+        self.assertIsInstance(self.storage_mgr.storage_client, InMemoryStorageClient)
+        self.assertFalse(self.storage_mgr.storage_cache.enabled)
+
+    def test_files_are_shared_in_the_process(self):
+        self.storage_mgr.upload_bytes(self.root + '/Gold/r1_Switch.cfg', 'hostname r1')
+        other_storage_mgr = StorageManager(self.sandbox)
+        self.assertEqual(other_storage_mgr.download_bytes(self.root + '/Gold/r1_Switch.cfg'), 'hostname r1')
+
+
+if __name__ == '__main__':
+    unittest.main()
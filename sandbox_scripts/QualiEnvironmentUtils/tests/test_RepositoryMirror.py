@@ -0,0 +1,90 @@
+import unittest
+import shutil
+import tempfile
+from mock import Mock
+from sandbox_scripts.QualiEnvironmentUtils.StorageManager import StorageManager
+from sandbox_scripts.QualiEnvironmentUtils.RepositoryMirror import RepositoryMirror
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.InMemoryStorageClient import InMemoryStorageClient
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+
+
+class RepositoryMirrorTests(unittest.TestCase):
+    def setUp(self):
+        InMemoryStorageClient.clear_all()
+        self.addCleanup(InMemoryStorageClient.clear_all)
+        self.mirror_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mirror_dir)
+        self.repository_files = {'/Gold/r1_Switch.cfg': 'hostname r1',
+                                 '/Gold/Switch.tm': 'hostname {Device.Self.Name}'}
+        self.revision = 'a1'
+        self.repository_client = Mock()
+        self.repository_client.get_key.return_value = 'https://gitlab/configs/Configs'
+        self.repository_client.get_revision.side_effect = lambda: self.revision
+        self.repository_client.download_snapshot.side_effect = lambda revision: dict(self.repository_files)
+
+        attributes = {'Storage Port': '0',
+                      'Storage Network configs Path': 'Configs'}
+        storage_resource = Mock()
+        storage_resource.model = 'Generic In-Memory Storage'
+        storage_resource.address = 'localhost'
+        storage_resource.get_attribute.side_effect = lambda name: attributes[name]
+        self.sandbox = Mock()
+        self.sandbox.id = '5487c6ce-d0b3-43e9-8ee7-e27af8406905'
+        self.sandbox.get_storage_server_resource.return_value = storage_resource
+        self.sandbox.get_repository_server_resource.return_value = None
+
+    def _create_storage_mgr(self, mirror=None):
+        storage_mgr = StorageManager(self.sandbox, repository_mirror=mirror or RepositoryMirror(self.mirror_dir))
+        storage_mgr.repository_client = self.repository_client
+        return storage_mgr
+
+    def test_files_come_from_the_mirror_and_are_synced_once(self):
+        storage_mgr = self._create_storage_mgr()
+        root = storage_mgr.get_configs_root()
+
+        self.assertEqual(storage_mgr.download_bytes(root + '/Gold/r1_Switch.cfg'), 'hostname r1')
+        self.assertEqual(storage_mgr.download_bytes(root + '/Gold/Switch.tm'), 'hostname {Device.Self.Name}')
+        with self.assertRaises(QualiError):
+            storage_mgr.download_bytes(root + '/Gold/r2_Switch.cfg')
+
+        self.repository_client.download_bytes.assert_not_called()
+        self.assertEqual(self.repository_client.download_snapshot.call_count, 1)
+        # the concrete config is on the storage, the template is not
+        self.assertEqual(storage_mgr.storage_client.download_bytes(root + '/Gold/r1_Switch.cfg'), 'hostname r1')
+        self.assertFalse(storage_mgr.storage_client.dir_exist(root + '/Gold/Switch.tm'))
+
+    def test_revision_is_downloaded_once_by_all_the_scripts(self):
+        self._create_storage_mgr()._get_repository_snapshot()
+        # a new mirror on the same dir, as in a script that runs later
+        storage_mgr = self._create_storage_mgr(RepositoryMirror(self.mirror_dir))
+        self.assertEqual(storage_mgr.download_bytes(storage_mgr.get_configs_root() + '/Gold/r1_Switch.cfg'),
+                         'hostname r1')
+        self.assertEqual(self.repository_client.download_snapshot.call_count, 1)
+
+    def test_only_changed_files_are_synced(self):
+        self.repository_files['/Gold/r2_Switch.cfg'] = 'hostname r2'
+        self._create_storage_mgr()._get_repository_snapshot()
+
+        self.revision = 'b2'
+        self.repository_files['/Gold/r2_Switch.cfg'] = 'hostname r2 changed'
+        storage_mgr = self._create_storage_mgr()
+        storage_mgr._get_repository_snapshot()
+
+        self.assertEqual(storage_mgr.last_transfer_stats.files, 1)
+        root = storage_mgr.get_configs_root()
+        self.assertEqual(storage_mgr.storage_client.download_bytes(root + '/Gold/r2_Switch.cfg'),
+                         'hostname r2 changed')
+
+    def test_repository_without_revisions_is_not_mirrored(self):
+        self.repository_client.get_revision.side_effect = None
+        self.repository_client.get_revision.return_value = None
+        self.repository_client.download_bytes.return_value = 'hostname r1'
+        storage_mgr = self._create_storage_mgr()
+        root = storage_mgr.get_configs_root()
+        self.assertEqual(storage_mgr.download_bytes(root + '/Gold/r1_Switch.cfg'), 'hostname r1')
+        self.repository_client.download_bytes.assert_called_once_with('/Gold/r1_Switch.cfg')
+        self.repository_client.download_snapshot.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
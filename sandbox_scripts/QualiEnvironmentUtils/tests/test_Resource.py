@@ -2,6 +2,7 @@ import unittest
 from mock import patch, Mock,call
 from sandbox_scripts.QualiEnvironmentUtils.Resource import ResourceBase
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+from sandbox_scripts.QualiEnvironmentUtils.RetryPolicy import RetryPolicy
 from cloudshell.api.cloudshell_api import CommandParameter
 from cloudshell.api.cloudshell_api import ReservationDescriptionInfo
 from cloudshell.api.cloudshell_api import ResourceCommandInfo
@@ -82,6 +83,23 @@ class ResourceTests(unittest.TestCase):
 
         self.assertFalse(ret, "command was not expected to be found but was found")
 
+    # ================================================================
+    # test lazy loading of the commands
+    def test_commands_not_loaded_on_init(self):
+        self.mock_api_session.return_value.GetResourceCommands.assert_not_called()
+        self.mock_api_session.return_value.GetResourceConnectedCommands.assert_not_called()
+
+    def test_commands_loaded_once_on_first_use(self):
+        command1 = Mock()
+        command1.Name = 'example_command'
+        self.mock_api_session.return_value.GetResourceCommands.return_value.Commands = [command1]
+        self.mock_api_session.return_value.GetResourceConnectedCommands.return_value.Commands = []
+        self.assertTrue(self.resource.has_command('example_command'))
+        self.assertFalse(self.resource.has_command('other_command'))
+
+        self.mock_api_session.return_value.GetResourceCommands.assert_called_once_with('r1')
+        self.mock_api_session.return_value.GetResourceConnectedCommands.assert_called_once_with('r1')
+
     # ================================================================
     # test attribute exists
     def test_attribute_found(self):
@@ -143,6 +161,67 @@ class ResourceTests(unittest.TestCase):
         self.assertEqual(str(the_exception),
                          "CloudShell error at r1. Error is: Attribute: 'LocationXYZ' not found")
 
+    def test_get_attribute_by_name_ending(self):
+        attr1 = Mock()
+        attr1.Name = 'Generic Router.Juniper.OS Version'
+        attr1.Type = 'String'
+        attr1.Value = '15.1'
+        self.resource.attributes = [attr1]
+
+        self.assertEqual(self.resource.get_attribute('os version'), '15.1')
+        self.assertEqual(self.resource.get_attribute('Juniper.OS Version'), '15.1')
+        self.assertFalse(self.resource.attribute_exist('Version'))
+
+    def test_get_attribute_first_match_wins(self):
+        attr1 = Mock()
+        attr1.Name = 'A.Location'
+        attr1.Type = 'String'
+        attr1.Value = 'New York'
+        attr2 = Mock()
+        attr2.Name = 'B.Location'
+        attr2.Type = 'String'
+        attr2.Value = 'Boston'
+        self.resource.attributes = [attr1, attr2]
+
+        self.assertEqual(self.resource.get_attribute('Location'), 'New York')
+        self.assertEqual(self.resource.get_attribute('B.Location'), 'Boston')
+
+    def test_get_password_attribute_decrypted_once(self):
+        attr1 = Mock()
+        attr1.Name = 'MyPassword'
+        attr1.Type = 'Password'
+        attr1.Value = 'abcdefg'
+        self.resource.attributes = [attr1]
+        self.mock_api_session.return_value.DecryptPassword.return_value.Value = 'secret'
+        self.resource.get_attribute('MyPassword')
+        ret = self.resource.get_attribute('mypassword')
+
+        self.assertEqual(ret, 'secret')
+        self.mock_api_session.return_value.DecryptPassword.assert_called_once_with('abcdefg')
+
+    def test_set_attribute_value_updates_cached_values(self):
+        attr1 = Mock()
+        attr1.Name = 'Generic Router.Location'
+        attr1.Type = 'String'
+        attr1.Value = 'New York'
+        attr2 = Mock()
+        attr2.Name = 'Generic Router.Password'
+        attr2.Type = 'Password'
+        attr2.Value = 'abcdefg'
+        self.resource.attributes = [attr1, attr2]
+        self.mock_api_session.return_value.DecryptPassword.return_value.Value = 'old secret'
+        self.resource.get_attribute('Password')
+
+        self.resource.set_attribute_value('location', 'Boston')
+        self.resource.set_attribute_value('Password', 'new secret')
+
+        self.mock_api_session.return_value.SetAttributeValue.assert_has_calls(
+            [call(resourceFullPath='r1', attributeName='Generic Router.Location', attributeValue='Boston'),
+             call(resourceFullPath='r1', attributeName='Generic Router.Password', attributeValue='new secret')])
+        self.assertEqual(self.resource.get_attribute('Location'), 'Boston')
+        self.assertEqual(self.resource.get_attribute('Password'), 'new secret')
+        self.assertEqual(self.mock_api_session.return_value.DecryptPassword.call_count, 1)
+
     # ================================================================
     # test health_check
     def test_health_check_passed(self):
@@ -209,6 +288,28 @@ class ResourceTests(unittest.TestCase):
         self.assertEqual('',ret, "command was expected to be pass but wasn't")
         self.assertEqual(mock_time.call_count,1)
 
+    @patch('sandbox_scripts.QualiEnvironmentUtils.RetryPolicy.time.sleep')
+    def test_health_check_retries_when_the_device_is_online(self, mock_sleep):
+        command1 = Mock()
+        command1.Name = 'health_check'
+        self.resource.commands = [command1]
+        failed = Mock()
+        failed.Output = "Health check failed"
+        passed = Mock()
+        passed.Output = "Health check passed"
+        self.mock_api_session.return_value.ExecuteCommand.side_effect = [failed, passed]
+        offline = Mock()
+        offline.liveStatusName = 'Offline'
+        online = Mock()
+        online.liveStatusName = 'Online'
+        self.mock_api_session.return_value.GetResourceLiveStatus.side_effect = [offline, online]
+
+        ret = self.resource.health_check("5487c6ce-d0b3-43e9-8ee7-e27af8406905", health_check_attempts=2,
+                                         retry_policy=RetryPolicy(initial_delay=30, jitter=0, poll_interval=2),
+                                         poll_live_status=True)
+        self.assertEqual('', ret)
+        self.assertEqual(mock_sleep.call_count, 2)
+
     def test_health_check_not_found(self):
         ret = self.resource.health_check("5487c6ce-d0b3-43e9-8ee7-e27af8406905")
         self.assertEqual('',ret, "command was expected to be found but wasn't")
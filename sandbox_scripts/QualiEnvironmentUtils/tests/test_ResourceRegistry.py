@@ -0,0 +1,74 @@
+import unittest
+import time
+from threading import Lock
+from mock import Mock
+from sandbox_scripts.QualiEnvironmentUtils.ResourceRegistry import ResourceRegistry
+
+
+class ResourceRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        self.lock = Lock()
+
+        def create_resource(resource_name, resource_alias):
+            with self.lock:
+                self.created.append(resource_name)
+            resource = Mock()
+            resource.name = resource_name
+            resource.alias = resource_alias
+            return resource
+
+        self.registry = ResourceRegistry(create_resource, pool_size=4)
+
+    def tearDown(self):
+        pass
+
+    def test_same_object_returned_for_same_resource(self):
+        r1 = self.registry.get('r1', 'alias1')
+        r1_again = self.registry.get_many([('r1', 'alias1'), ('r2', '')])[0]
+        self.assertIs(r1, r1_again)
+        self.assertEqual(self.created.count('r1'), 1)
+
+    def test_duplicate_names_are_loaded_once(self):
+        resources = self.registry.get_many([('r1', ''), ('r2', ''), ('r1', '')])
+        self.assertEqual(len(resources), 3)
+        self.assertIs(resources[0], resources[2])
+        self.assertEqual(sorted(self.created), ['r1', 'r2'])
+
+    def test_alias_is_set_when_first_loaded_without_it(self):
+        self.registry.get('r1')
+        resource = self.registry.get('r1', 'my r1')
+        self.assertEqual(resource.alias, 'my r1')
+
+    def test_keeps_the_order_of_the_request(self):
+        names = [('r' + str(i), '') for i in range(10)]
+        resources = self.registry.get_many(names)
+        self.assertEqual([r.name for r in resources], [name for name, alias in names])
+
+    def test_resources_are_loaded_in_parallel(self):
+        def create_slow_resource(resource_name, resource_alias):
+            time.sleep(0.2)
+            return Mock()
+
+        registry = ResourceRegistry(create_slow_resource, pool_size=8)
+        start = time.time()
+        registry.get_many([('r' + str(i), '') for i in range(8)])
+        self.assertLess(time.time() - start, 1.0)
+
+    def test_load_error_is_raised(self):
+        def create_failing_resource(resource_name, resource_alias):
+            raise ValueError('no such resource ' + resource_name)
+
+        registry = ResourceRegistry(create_failing_resource)
+        with self.assertRaises(ValueError):
+            registry.get_many([('r1', ''), ('r2', '')])
+
+    def test_clear(self):
+        self.registry.get('r1')
+        self.registry.clear()
+        self.registry.get('r1')
+        self.assertEqual(self.created.count('r1'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from mock import patch
+from sandbox_scripts.QualiEnvironmentUtils.RetryPolicy import RetryPolicy
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RetryPolicyTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for name in ['time', 'sleep']:
+            patcher = patch('sandbox_scripts.QualiEnvironmentUtils.RetryPolicy.time.' + name,
+                            side_effect=getattr(self.clock, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_exponential_backoff_up_to_max_delay(self):
+        retry_policy = RetryPolicy(initial_delay=2, max_delay=30, jitter=0)
+        self.assertEqual([retry_policy.get_delay(attempt) for attempt in range(6)], [2, 4, 8, 16, 30, 30])
+
+    @patch('sandbox_scripts.QualiEnvironmentUtils.RetryPolicy.random.random')
+    def test_jitter_cuts_a_random_part_of_the_delay(self, mock_random):
+        retry_policy = RetryPolicy(initial_delay=4, jitter=0.5)
+        mock_random.return_value = 0.0
+        self.assertEqual(retry_policy.get_delay(0), 4)
+        mock_random.return_value = 0.5
+        self.assertEqual(retry_policy.get_delay(0), 3)
+
+    def test_wait_stops_at_the_deadline(self):
+        retry_policy = RetryPolicy(initial_delay=8, jitter=0, deadline=10)
+        start_time = self.clock.time()
+        self.assertTrue(retry_policy.wait(0, start_time))
+        self.assertTrue(retry_policy.wait(1, start_time))
+        self.assertFalse(retry_policy.wait(2, start_time))
+        self.assertEqual(self.clock.sleeps, [8, 2])
+
+    def test_wait_ends_when_ready(self):
+        retry_policy = RetryPolicy(initial_delay=30, jitter=0, poll_interval=2)
+        start_time = self.clock.time()
+        self.assertTrue(retry_policy.wait(0, start_time, ready=lambda: self.clock.time() - start_time >= 4))
+        self.assertEqual(self.clock.sleeps, [2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
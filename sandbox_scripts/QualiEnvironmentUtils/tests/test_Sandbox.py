@@ -182,6 +182,69 @@ class SandboxTests(unittest.TestCase):
         mock_resourcebase.assert_called_with('r1', 'my r1')
         self.assertEqual(len(resources), 1, "didn't get resources, excepted one")
 
+    #================================================================
+    #test the reservation snapshot cache
+    @patch('sandbox_scripts.QualiEnvironmentUtils.Sandbox.ResourceBase')
+    def test_root_resources_getters_share_one_reservation_snapshot(self, mock_resourcebase):
+        rdi = Mock()
+        resource1 = Mock()
+        resource1.Name = "r1"
+        resource1.VmDetails = None
+        rdi.ReservationDescription.Resources = [resource1]
+        rdi.ReservationDescription.TopologiesReservedResources = []
+        rdi.ReservationDescription.Apps = []
+        self.mock_api_session.return_value.GetReservationDetails = Mock(return_value=rdi)
+
+        self.sandbox.get_root_resources()
+        self.sandbox.get_root_resources()
+        self.sandbox.get_root_networking_resources()
+        self.sandbox.get_Apps_resources()
+
+        self.assertEqual(self.mock_api_session.return_value.GetReservationDetails.call_count, 1)
+        self.assertEqual(mock_resourcebase.call_count, 1)
+        self.assertEqual(self.sandbox.cache_stats, {'hits': 3, 'misses': 1})
+
+    #---------------------------
+    @patch('sandbox_scripts.QualiEnvironmentUtils.Sandbox.ResourceBase')
+    def test_root_resources_getters_share_resource_objects(self, mock_resourcebase):
+        rdi = Mock()
+        resource1 = Mock()
+        resource1.Name = "r1"
+        resource1.VmDetails = None
+        resource2 = Mock()
+        resource2.Name = "r2"
+        rdi.ReservationDescription.Resources = [resource1, resource2]
+        rdi.ReservationDescription.TopologiesReservedResources = []
+        self.mock_api_session.return_value.GetReservationDetails = Mock(return_value=rdi)
+        mock_resourcebase.side_effect = lambda name, alias: Mock(name=name)
+
+        all_resources = self.sandbox.get_root_resources()
+        vm_resources = self.sandbox.get_root_vm_resources()
+
+        self.assertEqual(mock_resourcebase.call_count, 2)
+        self.assertIn(vm_resources[0], all_resources)
+        self.assertIs(self.sandbox.get_resource('r2'), vm_resources[0])
+
+    #---------------------------
+    @patch('sandbox_scripts.QualiEnvironmentUtils.Sandbox.ResourceBase')
+    def test_invalidate_cache_reloads_reservation_snapshot(self, mock_resourcebase):
+        rdi = Mock()
+        resource1 = Mock()
+        resource1.Name = "r1"
+        rdi.ReservationDescription.Resources = [resource1]
+        rdi.ReservationDescription.TopologiesReservedResources = []
+        self.mock_api_session.return_value.GetReservationDetails = Mock(return_value=rdi)
+
+        self.sandbox.get_root_resources()
+        resource2 = Mock()
+        resource2.Name = "r2"
+        rdi.ReservationDescription.Resources = [resource1, resource2]
+        self.assertEqual(len(self.sandbox.get_root_resources()), 1, "expected the cached resources")
+
+        self.sandbox.invalidate_cache()
+        self.assertEqual(len(self.sandbox.get_root_resources()), 2, "expected the reloaded resources")
+        self.assertEqual(self.mock_api_session.return_value.GetReservationDetails.call_count, 2)
+
     #================================================================
     #test clear_all_resources_live_status
     def test_clear_all_resources_live_status_no_devices(self):
@@ -0,0 +1,87 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+from sandbox_scripts.QualiEnvironmentUtils.StorageCache import StorageCache
+
+
+class StorageCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = StorageCache(self.cache_dir, max_size=1024, ttl=60)
+        self.loads = []
+        self.lock = Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _loader(self, data):
+        def load():
+            with self.lock:
+                self.loads.append(data)
+            time.sleep(0.05)
+            return data
+        return load
+
+    def test_fetch_loads_once(self):
+        self.cache.fetch('ftp://a/Switch.tm', self._loader('template'))
+        data = self.cache.fetch('ftp://a/Switch.tm', self._loader('template'))
+        self.assertEqual(data, 'template')
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_parallel_fetches_of_the_same_url_load_once(self):
+        pool = ThreadPool(20)
+        results = pool.map(lambda i: self.cache.fetch('ftp://a/Switch.tm', self._loader('template')), range(20))
+        pool.close()
+        pool.join()
+        self.assertEqual(results, ['template'] * 20)
+        self.assertEqual(len(self.loads), 1)
+
+    def test_identical_content_is_kept_once(self):
+        self.cache.put('ftp://a/r1.cfg', 'hostname')
+        self.cache.put('ftp://a/r2.cfg', 'hostname')
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, 'blobs'))), 1)
+        self.assertEqual(self.cache.get('ftp://a/r2.cfg'), 'hostname')
+
+    def test_validator_mismatch_is_a_miss(self):
+        self.cache.put('ftp://a/r1.cfg', 'hostname r1', validator='11:1')
+        self.assertEqual(self.cache.get('ftp://a/r1.cfg', validator='11:1'), 'hostname r1')
+        self.assertIsNone(self.cache.get('ftp://a/r1.cfg', validator='12:2'))
+
+    def test_expired_entry_is_a_miss(self):
+        cache = StorageCache(self.cache_dir, max_size=1024, ttl=0)
+        cache.put('tftp://a/r1.cfg', 'hostname r1')
+        time.sleep(0.01)
+        self.assertIsNone(cache.get('tftp://a/r1.cfg'))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put('ftp://a/r1.cfg', 'a' * 400)
+        self.cache.put('ftp://a/r2.cfg', 'b' * 400)
+        # make r1 the least recently used
+        blobs_dir = os.path.join(self.cache_dir, 'blobs')
+        for blob_name in os.listdir(blobs_dir):
+            os.utime(os.path.join(blobs_dir, blob_name), (time.time() - 100, time.time() - 100))
+        self.cache.get('ftp://a/r2.cfg')
+        self.cache.put('ftp://a/r3.cfg', 'c' * 400)
+        self.assertIsNone(self.cache.get('ftp://a/r1.cfg'))
+        self.assertEqual(self.cache.get('ftp://a/r2.cfg'), 'b' * 400)
+        self.assertEqual(self.cache.get('ftp://a/r3.cfg'), 'c' * 400)
+
+    def test_invalidate(self):
+        self.cache.put('ftp://a/r1.cfg', 'hostname r1')
+        self.cache.invalidate('ftp://a/r1.cfg')
+        self.assertIsNone(self.cache.get('ftp://a/r1.cfg'))
+
+    def test_disabled_cache_always_loads(self):
+        cache = StorageCache(self.cache_dir, max_size=0)
+        cache.fetch('ftp://a/Switch.tm', self._loader('template'))
+        cache.fetch('ftp://a/Switch.tm', self._loader('template'))
+        self.assertEqual(len(self.loads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,14 @@
 import unittest
 from mock import patch, Mock,call
 from sandbox_scripts.QualiEnvironmentUtils.StorageManager import StorageManager
+from sandbox_scripts.QualiEnvironmentUtils.StorageCache import StorageCache
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
 from cloudshell.api.cloudshell_api import ReservationDescriptionInfo
 import json
 import os
+import shutil
+import tempfile
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 
 resContext = '''{"id":"5487c6ce-d0b3-43e9-8ee7-e27af8406905",
@@ -25,12 +29,173 @@ conContext = '''{"serverAddress": "localhost",
 class StorageManagerTests(unittest.TestCase):
     @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
     def setUp(self, mock_api_session):
-        pass
+        self.sandbox = Mock()
+        storage_resource = Mock()
+        storage_resource.model = 'Generic FTP Server'
+        self.sandbox.get_storage_server_resource.return_value = storage_resource
+        self.sandbox.get_repository_server_resource.return_value = None
+        patcher = patch('sandbox_scripts.QualiEnvironmentUtils.StorageManager.FTPClient')
+        self.mock_ftp_client_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.storage_client = self.mock_ftp_client_class.return_value
+        self.storage_client.get_configs_root.return_value = 'ftp://u:p@1.2.3.4/Configs'
+        self.storage_client.get_validator.return_value = '11:20170101000000'
+        self.storage_client.delete_files.return_value = None
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.storage_cache = StorageCache(self.cache_dir)
 
     def tearDown(self):
         pass
 
-# TODO: implement tests
+    def test_download_bytes_from_storage(self):
+        self.storage_client.download_bytes.return_value = 'hostname r1'
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        data = storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.cfg')
+        self.assertEqual(data, 'hostname r1')
+        self.storage_client.download_bytes.assert_called_once_with('ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.cfg')
+
+    def test_download_bytes_from_repository_is_uploaded_to_storage(self):
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        storage_mgr.repository_client = Mock()
+        storage_mgr.repository_client.get_revision.return_value = None
+        storage_mgr.repository_client.download_bytes.return_value = 'hostname r1'
+        data = storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.cfg')
+        self.assertEqual(data, 'hostname r1')
+        storage_mgr.repository_client.download_bytes.assert_called_once_with('/Gold/r1_Switch.cfg')
+        self.storage_client.upload_bytes.assert_called_once_with('ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.cfg',
+                                                                 'hostname r1')
+
+    def test_template_from_repository_is_not_uploaded_to_storage(self):
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        storage_mgr.repository_client = Mock()
+        storage_mgr.repository_client.get_revision.return_value = None
+        storage_mgr.repository_client.download_bytes.return_value = 'hostname {Device.Self.Name}'
+        storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        self.storage_client.upload_bytes.assert_not_called()
+
+    def test_download_bytes_is_cached(self):
+        self.storage_client.download_bytes.return_value = 'hostname r1'
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        data = storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        self.assertEqual(data, 'hostname r1')
+        self.assertEqual(self.storage_client.download_bytes.call_count, 1)
+
+    def test_changed_file_is_downloaded_again(self):
+        self.storage_client.download_bytes.return_value = 'hostname r1'
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        self.storage_client.get_validator.return_value = '12:20170102000000'
+        self.storage_client.download_bytes.return_value = 'hostname r12'
+        data = storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        self.assertEqual(data, 'hostname r12')
+
+    def test_upload_invalidates_the_cache(self):
+        self.storage_client.get_validator.return_value = None
+        self.storage_client.download_bytes.return_value = 'hostname r1'
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/temp/r1_Switch.cfg')
+        storage_mgr.upload_bytes('ftp://u:p@1.2.3.4/Configs/temp/r1_Switch.cfg', 'hostname r2')
+        storage_mgr.download_bytes('ftp://u:p@1.2.3.4/Configs/temp/r1_Switch.cfg')
+        self.assertEqual(self.storage_client.download_bytes.call_count, 2)
+
+    def test_dir_exist_uses_one_listing(self):
+        self.storage_client.list_dir.return_value = ['Gold', 'Snapshot_5487c6ce.txt']
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        self.assertTrue(storage_mgr.dir_exist('ftp://u:p@1.2.3.4/Configs/Snapshots/Gold'))
+        self.assertTrue(storage_mgr.dir_exist('ftp://u:p@1.2.3.4/Configs/Snapshots/Snapshot_5487c6ce.txt'))
+        self.assertFalse(storage_mgr.dir_exist('ftp://u:p@1.2.3.4/Configs/Snapshots/Silver'))
+        self.storage_client.list_dir.assert_called_once_with('ftp://u:p@1.2.3.4/Configs/Snapshots')
+        self.storage_client.dir_exist.assert_not_called()
+
+    def test_dir_exist_without_listing(self):
+        self.storage_client.list_dir.return_value = None
+        self.storage_client.dir_exist.return_value = True
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        self.assertTrue(storage_mgr.dir_exist('tftp://1.2.3.4/Configs/Snapshots/Gold'))
+
+    def test_listing_is_refreshed_after_create_dir(self):
+        self.storage_client.list_dir.return_value = []
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        self.assertFalse(storage_mgr.dir_exist('ftp://u:p@1.2.3.4/Configs/Snapshots/Gold'))
+        storage_mgr.create_dir('ftp://u:p@1.2.3.4/Configs/Snapshots/Gold')
+        self.storage_client.list_dir.return_value = ['Gold']
+        self.assertTrue(storage_mgr.dir_exist('ftp://u:p@1.2.3.4/Configs/Snapshots/Gold'))
+
+    def test_download_first_skips_missing_files(self):
+        self.storage_client.list_dir.return_value = ['Switch.tm']
+        self.storage_client.download_bytes.return_value = 'hostname {Device.Self.Name}'
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        self.assertFalse(storage_mgr.file_exist('ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.cfg'))
+        path, data = storage_mgr.download_first(['ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.tm',
+                                                 'ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm'])
+        self.assertEqual(path, 'ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        self.storage_client.download_bytes.assert_called_once_with('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm')
+        self.assertEqual(self.storage_client.list_dir.call_count, 1)
+
+    def test_download_first_without_listing_tries_the_files_by_order(self):
+        self.storage_client.list_dir.return_value = None
+        self.storage_client.download_bytes.side_effect = [QualiError('FTPClient', 'missing'), 'template']
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        path, data = storage_mgr.download_first(['ftp://u:p@1.2.3.4/Configs/Gold/r1_Switch.tm',
+                                                 'ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm'])
+        self.assertEqual((path, data), ('ftp://u:p@1.2.3.4/Configs/Gold/Switch.tm', 'template'))
+
+    def test_download_artifact_info_returns_the_data(self):
+        self.storage_client.download_artifact_info.return_value = {'saved_artifact': {}}
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        data = storage_mgr.download_artifact_info('ftp://u:p@1.2.3.4/Configs/Snapshots/s1', 'r1.json')
+        self.assertEqual(data, {'saved_artifact': {}})
+
+    def test_download_many_returns_the_results_in_order(self):
+        self.storage_client.download_bytes.side_effect = lambda path: 'content of ' + path
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        paths = ['ftp://u:p@1.2.3.4/Configs/Gold/r' + str(i) + '.cfg' for i in range(10)]
+        results = storage_mgr.download_many(paths)
+        self.assertEqual([res.path for res in results], paths)
+        self.assertEqual([res.data for res in results], ['content of ' + path for path in paths])
+        self.assertTrue(all(res.success for res in results))
+        self.assertEqual(storage_mgr.last_transfer_stats.files, 10)
+        self.assertEqual(storage_mgr.last_transfer_stats.failed, 0)
+        self.assertEqual(storage_mgr.last_transfer_stats.bytes, sum(len(res.data) for res in results))
+
+    def test_download_many_without_cache_reads_the_storage(self):
+        self.storage_client.download_bytes.side_effect = ['hash 1', 'hash 2']
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        path = 'ftp://u:p@1.2.3.4/Configs/LoadedConfigHashes/r1.sha1'
+        storage_mgr.download_many([path])
+        results = storage_mgr.download_many([path], use_cache=False)
+        self.assertEqual(results[0].data, 'hash 2')
+        self.assertEqual(self.storage_client.download_bytes.call_count, 2)
+
+    def test_upload_many_reports_the_failed_files(self):
+        def upload_bytes(path, data):
+            if path.endswith('r2.cfg'):
+                raise QualiError('Sandbox', 'Failed to upload ' + path)
+        self.storage_client.upload_bytes.side_effect = upload_bytes
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        results = storage_mgr.upload_many([('ftp://u:p@1.2.3.4/Configs/r1.cfg', 'a'),
+                                           ('ftp://u:p@1.2.3.4/Configs/r2.cfg', 'b')])
+        self.assertTrue(results[0].success)
+        self.assertFalse(results[1].success)
+        self.assertIn('Failed to upload', results[1].message)
+        self.assertEqual(storage_mgr.last_transfer_stats.failed, 1)
+        self.assertEqual(storage_mgr.last_transfer_stats.bytes, 1)
+
+    def test_delete_many(self):
+        deletes = ConcurrencyTracker()
+        self.storage_client.delete.side_effect = deletes.run
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        results = storage_mgr.delete_many(['ftp://u:p@1.2.3.4/Configs/r1.cfg', 'ftp://u:p@1.2.3.4/Configs/r2.cfg'])
+        self.assertTrue(all(res.success for res in results))
+        self.assertEqual(sorted(deletes.calls),
+                         ['ftp://u:p@1.2.3.4/Configs/r1.cfg', 'ftp://u:p@1.2.3.4/Configs/r2.cfg'])
+
+    def test_transfer_many_with_no_files(self):
+        storage_mgr = StorageManager(self.sandbox, self.storage_cache)
+        self.assertEqual(storage_mgr.download_many([]), [])
+        self.assertEqual(storage_mgr.last_transfer_stats.files, 0)
 
 if __name__ == '__main__':
     unittest.main()
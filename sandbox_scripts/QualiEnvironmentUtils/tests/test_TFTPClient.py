@@ -0,0 +1,73 @@
+import unittest
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from mock import Mock
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients import TFTPClient as tftp_client_module
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.TFTPClient import TFTPClient
+
+
+def get_free_udp_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+@unittest.skipUnless(tftp_client_module.imported_tftpy, 'tftpy is not installed')
+class TFTPClientTests(unittest.TestCase):
+    """
+    Transfers against a local tftpy server
+    """
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_dir)
+        self.port = get_free_udp_port()
+        self.server = tftp_client_module.tftpy.TftpServer(self.root_dir)
+        server_thread = threading.Thread(target=self.server.listen, args=('127.0.0.1', self.port))
+        server_thread.daemon = True
+        server_thread.start()
+        self.addCleanup(self.server.stop, True)
+        time.sleep(0.2)
+
+    def _create_client(self, blksize=''):
+        attributes = {'Storage Port': str(self.port),
+                      'Storage Network configs Path': 'Configs',
+                      'Storage username': '',
+                      'Storage password': '',
+                      'TFTP psexec': '',
+                      'TFTP Root': self.root_dir,
+                      'TFTP Block Size': blksize}
+        storage_resource = Mock()
+        storage_resource.address = '127.0.0.1'
+        storage_resource.get_attribute.side_effect = lambda name: attributes[name]
+        storage_resource.attribute_exist.side_effect = lambda name: name in attributes
+        return TFTPClient(Mock(), storage_resource)
+
+    def test_upload_and_download_with_negotiated_block_size(self):
+        data = os.urandom(100 * 1024)
+        tftp_client = self._create_client()
+        tftp_client.upload_bytes('tftp://127.0.0.1/config.bin', data)
+        self.assertEqual(tftp_client.download_bytes('tftp://127.0.0.1/config.bin'), data)
+        self.assertFalse(tftp_client.options_refused)
+
+    def test_block_size_benchmark(self):
+        data = os.urandom(1024 * 1024)
+        with open(os.path.join(self.root_dir, 'image.bin'), 'wb') as image:
+            image.write(data)
+        run_times = dict()
+        for blksize in ['0', '1428']:
+            tftp_client = self._create_client(blksize)
+            start = time.time()
+            self.assertEqual(tftp_client.download_bytes('tftp://127.0.0.1/image.bin'), data)
+            run_times[blksize] = time.time() - start
+        # fewer round trips with the bigger blocks
+        self.assertLess(run_times['1428'], run_times['0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
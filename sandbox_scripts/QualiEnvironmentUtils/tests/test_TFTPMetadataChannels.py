@@ -0,0 +1,119 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from mock import patch, Mock
+from sandbox_scripts.QualiEnvironmentUtils.StorageManager import StorageManager
+from sandbox_scripts.QualiEnvironmentUtils.StorageCache import StorageCache
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.MountMetadataChannel import MountMetadataChannel
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.PsExecMetadataChannel import PsExecMetadataChannel
+from sandbox_scripts.QualiEnvironmentUtils.StorageClients.HttpMetadataChannel import HttpMetadataChannel
+
+
+class TFTPMetadataChannelTests(unittest.TestCase):
+    def setUp(self):
+        self.mount_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mount_dir)
+        self.attributes = {'Storage Port': '69',
+                           'Storage Network configs Path': 'Configs',
+                           'Storage username': 'admin',
+                           'Storage password': 'pass',
+                           'TFTP psexec': 'C:/PsTools',
+                           'TFTP Root': 'C:/TFTP-Root'}
+        storage_resource = Mock()
+        storage_resource.model = 'Generic TFTP Server'
+        storage_resource.address = '1.2.3.4'
+        storage_resource.get_attribute.side_effect = lambda name: self.attributes[name]
+        storage_resource.attribute_exist.side_effect = lambda name: name in self.attributes
+        self.sandbox = Mock()
+        self.sandbox.id = '5487c6ce-d0b3-43e9-8ee7-e27af8406905'
+        self.sandbox.get_storage_server_resource.return_value = storage_resource
+        self.sandbox.get_repository_server_resource.return_value = None
+
+    def _create_storage_mgr(self):
+        storage_mgr = StorageManager(self.sandbox, StorageCache(max_size=0))
+        storage_mgr.storage_client.upload_bytes = Mock()
+        return storage_mgr
+
+    def test_mount_channel(self):
+        self.attributes['TFTP Mount Path'] = self.mount_dir
+        os.makedirs(os.path.join(self.mount_dir, 'Configs', 'Gold'))
+        for file_name in ['r1_Switch.cfg', 'r2_Switch.cfg']:
+            open(os.path.join(self.mount_dir, 'Configs', 'Gold', file_name), 'w').close()
+        storage_mgr = self._create_storage_mgr()
+        root = storage_mgr.get_configs_root()
+        self.assertIsInstance(storage_mgr.storage_client.metadata_channel, MountMetadataChannel)
+
+        self.assertTrue(storage_mgr.file_exist(root + '/Gold/r1_Switch.cfg'))
+        self.assertFalse(storage_mgr.file_exist(root + '/Gold/r3_Switch.cfg'))
+        storage_mgr.create_dir(root + '/Snapshots/s1')
+        self.assertTrue(storage_mgr.dir_exist(root + '/Snapshots/s1'))
+
+        results = storage_mgr.delete_many([root + '/Gold/r1_Switch.cfg', root + '/Gold/r3_Switch.cfg'])
+        self.assertTrue(results[0].success)
+        self.assertFalse(results[1].success)
+        self.assertEqual(os.listdir(os.path.join(self.mount_dir, 'Configs', 'Gold')), ['r2_Switch.cfg'])
+
+    @patch('sandbox_scripts.QualiEnvironmentUtils.StorageClients.PsExecMetadataChannel.subprocess.check_output')
+    def test_psexec_channel_lists_a_dir_once_and_deletes_in_one_call(self, mock_check_output):
+        mock_check_output.return_value = 'r1_Switch.cfg\r\nmy config.cfg\r\n'
+        storage_mgr = self._create_storage_mgr()
+        root = storage_mgr.get_configs_root()
+        self.assertIsInstance(storage_mgr.storage_client.metadata_channel, PsExecMetadataChannel)
+
+        self.assertTrue(storage_mgr.file_exist(root + '/Gold/r1_Switch.cfg'))
+        self.assertTrue(storage_mgr.file_exist(root + '/Gold/my config.cfg'))
+        self.assertFalse(storage_mgr.file_exist(root + '/Gold/r2_Switch.cfg'))
+        self.assertEqual(mock_check_output.call_count, 1)
+        self.assertEqual(mock_check_output.call_args[0][0][-5:],
+                         ['cmd', '/c', 'dir', '/b', 'C:\\TFTP-Root\\Configs\\Gold'])
+
+        mock_check_output.reset_mock()
+        results = storage_mgr.delete_many([root + '/temp/r1.cfg', root + '/temp/r2.cfg'])
+        self.assertTrue(all(res.success for res in results))
+        self.assertEqual(mock_check_output.call_count, 1)
+        self.assertEqual(sorted(mock_check_output.call_args[0][0][-2:]),
+                         ['C:\\TFTP-Root\\Configs\\temp\\r1.cfg', 'C:\\TFTP-Root\\Configs\\temp\\r2.cfg'])
+
+    @patch('sandbox_scripts.QualiEnvironmentUtils.StorageClients.PsExecMetadataChannel.subprocess.check_output')
+    def test_psexec_missing_dir(self, mock_check_output):
+        mock_check_output.side_effect = subprocess.CalledProcessError(1, 'psexec', 'File Not Found')
+        storage_mgr = self._create_storage_mgr()
+        self.assertFalse(storage_mgr.dir_exist(storage_mgr.get_configs_root() + '/Snapshots/s1'))
+
+    @patch('sandbox_scripts.QualiEnvironmentUtils.StorageClients.PsExecMetadataChannel.subprocess.check_output')
+    def test_psexec_failure_falls_back_to_download(self, mock_check_output):
+        storage_mgr = self._create_storage_mgr()
+        storage_mgr.storage_client.download_bytes = Mock(return_value='hostname r1')
+        root = storage_mgr.get_configs_root()
+        for error in [subprocess.CalledProcessError(1326, 'psexec', 'Logon failure: unknown user name'),
+                      OSError(2, 'No such file or directory')]:
+            mock_check_output.side_effect = error
+            self.assertIsNone(storage_mgr.list_dir(root + '/Gold'))
+            # not cached as an empty dir, the file is probed with a download
+            self.assertTrue(storage_mgr.file_exist(root + '/Gold/r1_Switch.cfg'))
+
+    @patch('sandbox_scripts.QualiEnvironmentUtils.StorageClients.HttpMetadataChannel.requests.Session')
+    def test_http_channel(self, mock_session_class):
+        self.attributes['TFTP Agent URL'] = 'http://1.2.3.4:8069/'
+        session = mock_session_class.return_value
+        session.get.return_value.status_code = 200
+        session.get.return_value.json.return_value = ['r1_Switch.cfg']
+        session.post.return_value.json.return_value = {'failed': {'Configs/temp/r2.cfg': 'access denied'}}
+        storage_mgr = self._create_storage_mgr()
+        root = storage_mgr.get_configs_root()
+        self.assertIsInstance(storage_mgr.storage_client.metadata_channel, HttpMetadataChannel)
+
+        self.assertTrue(storage_mgr.file_exist(root + '/Gold/r1_Switch.cfg'))
+        session.get.assert_called_once_with('http://1.2.3.4:8069/list', params={'path': 'Configs/Gold'}, timeout=30)
+
+        results = storage_mgr.delete_many([root + '/temp/r1.cfg', root + '/temp/r2.cfg'])
+        self.assertTrue(results[0].success)
+        self.assertFalse(results[1].success)
+        self.assertEqual(results[1].message, 'access denied')
+        self.assertEqual(session.auth, ('admin', 'pass'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,7 +32,9 @@ class EnvironmentSaveSnapshot:
 
                 saveNRestoreTool.save_config(snapshot_name=snapshot_name, config_type='running',
                                          ignore_models=['Generic TFTP server', 'Config Set Pool','Generic FTP server',
-                                                        'netscout switch 3912'])
+                                                        'netscout switch 3912', 'Generic Local Storage',
+                                                        'Generic In-Memory Storage'])
+                sandbox.report_cache_stats()
             else:
                  sandbox.report_error("There is no storage resource (e.g. FTP) available in the reservation",True,True)
 
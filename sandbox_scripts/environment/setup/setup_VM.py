@@ -6,27 +6,49 @@ from cloudshell.helpers.scripts import cloudshell_scripts_helpers as helpers
 from multiprocessing.pool import ThreadPool
 from threading import Lock
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import rsc_run_result_struct
+import time
+
+DEFAULT_MAX_CONCURRENT_VMS = 20
 
 
 class EnvironmentSetupVM(object):
 
-    def __init__(self):
+    def __init__(self, max_concurrent_vms=DEFAULT_MAX_CONCURRENT_VMS):
+        """
+        :param int max_concurrent_vms:  The max number of VMs that are powered on / refreshed in parallel
+        """
         self.reservation_id = helpers.get_reservation_context_details().id
         self.logger = get_qs_logger(log_file_prefix="CloudShell Sandbox Setup",
                                     log_group=self.reservation_id,
                                     log_category='Setup')
+        self.max_concurrent_vms = max_concurrent_vms
+        # The time (in seconds) it took to power on and refresh the IP of each VM, and of all of them
+        self.vm_run_times = dict()
+        self.total_run_time = 0
 
     # ---------------------------
     # ---------------------------
     def execute(self):
-        self.sandbox = SandboxBase(self.reservation_id, self.logger)
+        sandbox = SandboxBase(self.reservation_id, self.logger)
         #TODO: don't use networking save and restore to figure if it's a snapshot setup
-        self.is_snapshot = False
-        save_n_restore_mgr = SaveRestoreManager(self.sandbox)
+        is_snapshot = False
+        save_n_restore_mgr = SaveRestoreManager(sandbox)
         if save_n_restore_mgr.get_storage_manager():
             if save_n_restore_mgr.is_snapshot():
-                self.is_snapshot = True
+                is_snapshot = True
 
+        self.run(sandbox, is_snapshot)
+
+    # ---------------------------
+    # ---------------------------
+    def run(self, sandbox, is_snapshot):
+        """
+        Power on the VMs of the sandbox and refresh their IPs
+        :param SandboxBase sandbox:
+        :param bool is_snapshot:  Is the sandbox restored from a snapshot
+        """
+        self.sandbox = sandbox
+        self.is_snapshot = is_snapshot
         self.sandbox.report_info('Beginning VMs power on')
         self._run_async_power_on_refresh_ip()
 
@@ -40,18 +62,22 @@ class EnvironmentSetupVM(object):
             self.sandbox.report_info(message='No VMs to power on ', write_to_output_window=True)
             return
 
-        pool = ThreadPool(len(resources))
+        start_time = time.time()
+        pool = ThreadPool(min(len(resources), self.max_concurrent_vms))
         lock = Lock()
         message_status = {
             "power_on": False,
             "wait_for_ip": False
             }
-        async_results = [pool.apply_async(self._power_on_refresh_ip,
+        async_results = [pool.apply_async(self._timed_power_on_refresh_ip,
                                           (lock, message_status, resource))
                          for resource in resources]
 
         pool.close()
         pool.join()
+        self.total_run_time = time.time() - start_time
+        self.sandbox.report_info("VMs power on finished for {0} VMs in {1:.1f} seconds"
+                                 .format(len(resources), self.total_run_time))
         err_msg = ""
         for async_result in async_results:
             res = async_result.get()
@@ -61,6 +87,23 @@ class EnvironmentSetupVM(object):
         if err_msg:
             self.sandbox.report_error("Reservation is Active with Errors - " + err_msg,raise_error=True)
 
+    # ---------------------------
+    # ---------------------------
+    def _timed_power_on_refresh_ip(self, lock, message_status, resource):
+        """
+        Power on the VM and refresh its IP, and log how long it took
+        :param Lock lock:
+        :param (dict of str: Boolean) message_status:
+        :param ResourceBase resource:
+        :rtype: rsc_run_result_struct
+        """
+        start_time = time.time()
+        run_result = self._power_on_refresh_ip(lock, message_status, resource)
+        run_time = time.time() - start_time
+        self.vm_run_times[resource.name] = run_time
+        self.logger.info("Power on of deployed app {0} took {1:.1f} seconds".format(resource.name, run_time))
+        return run_result
+
     # ---------------------------
     # ---------------------------
     def _power_on_refresh_ip(self, lock, message_status, resource):
@@ -72,7 +115,6 @@ class EnvironmentSetupVM(object):
         :return:
         """
 
-        #deployed_app_name = resource.name
         run_result = rsc_run_result_struct(resource.name)
         power_on = "true"
         wait_for_ip = "true"
@@ -81,13 +123,13 @@ class EnvironmentSetupVM(object):
             self.logger.debug("Resource {0} is a static app".format(resource.name))
             wait_for_ip = "false"
         elif not self.is_snapshot:
-            return True, ""
+            return run_result
 
         try:
             self._power_on(resource, power_on, lock, message_status)
         except Exception as exc:
             self.sandbox.report_error("Error powering on deployed app '{0}' in reservation '{1}'. Error: {2}"
-                             .format(deployed_app_name, self.reservation_id, str(exc)),raise_error=False)
+                             .format(resource.name, self.reservation_id, str(exc)),raise_error=False)
             run_result.message = str("Error powering on deployed app '{0}'").format(resource.name)
             run_result.run_result = False
             return run_result
@@ -118,26 +160,27 @@ class EnvironmentSetupVM(object):
 
         self.sandbox.report_info("Executing 'Refresh IP' on deployed app '{0}' in reservation '{1}'"
                          .format(resource.name, self.reservation_id))
-        with lock:
-            resource.execute_connected_command(self.reservation_id,"remote_refresh_ip",
-                                            "remote_connectivity")
+        # The lock only protects the one-time message, the command itself runs in parallel
+        resource.execute_connected_command(self.reservation_id,"remote_refresh_ip",
+                                           "remote_connectivity")
 
     # ---------------------------
     # ---------------------------
     def _power_on(self, resource, power_on, lock, message_status):
 
         if power_on.lower() == "true":
-            with lock:
-                if not message_status['power_on']:
-                    message_status['power_on'] = True
-                    self.sandbox.report_info('Apps are powering on... ')
-
-                self.sandbox.report_info(message="Executing 'Power On' on deployed app '{0}' "
-                                         .format(resource.name),
-                                         log_message="Executing 'Power On' on deployed app '{0}' in reservation '{1}'"
-                                         .format(resource.name, self.reservation_id),
-                                         write_to_output_window=True)
-                resource.execute_connected_command(self.reservation_id,"PowerOn", "power")
+            if not message_status['power_on']:
+                with lock:
+                    if not message_status['power_on']:
+                        self.sandbox.report_info('Apps are powering on... ')
+                        message_status['power_on'] = True
+
+            self.sandbox.report_info(message="Executing 'Power On' on deployed app '{0}' "
+                                     .format(resource.name),
+                                     log_message="Executing 'Power On' on deployed app '{0}' in reservation '{1}'"
+                                     .format(resource.name, self.reservation_id),
+                                     write_to_output_window=True)
+            resource.execute_connected_command(self.reservation_id,"PowerOn", "power")
         else:
             self.sandbox.report_info("Auto Power On is off for deployed app {0} in reservation {1}"
                                     .format(resource.name, self.reservation_id))
@@ -0,0 +1,155 @@
+# coding=utf-8
+from cloudshell.helpers.scripts import cloudshell_scripts_helpers as helpers
+from cloudshell.core.logger.qs_logger import get_qs_logger
+from sandbox_scripts.helpers.Networking.save_restore_mgr import SaveRestoreManager
+from sandbox_scripts.QualiEnvironmentUtils.Sandbox import SandboxBase
+from sandbox_scripts.QualiEnvironmentUtils.DagScheduler import DagScheduler
+from sandbox_scripts.environment.setup.setup_script import EnvironmentSetup
+from sandbox_scripts.environment.setup.setup_VM import EnvironmentSetupVM
+from sandbox_scripts.environment.setup.setup_resources import EnvironmentSetupResources
+
+
+class EnvironmentSetupPipeline(object):
+    def __init__(self):
+        """
+        Run the setup of the sandbox (EnvironmentSetup, EnvironmentSetupVM and EnvironmentSetupResources)
+        as steps that depend on each other, so independent steps run in parallel.
+        All the steps share a single api session, SandboxBase and resource details cache
+        """
+        self.reservation_id = helpers.get_reservation_context_details().id
+        self.logger = get_qs_logger(log_file_prefix="CloudShell Sandbox Setup",
+                                    log_group=self.reservation_id,
+                                    log_category='Setup')
+        self.environment_setup = EnvironmentSetup()
+        self.environment_setup_vm = EnvironmentSetupVM()
+        self.environment_setup_resources = EnvironmentSetupResources()
+        self.api = None
+        self.sandbox = None
+        self.resource_details_cache = {}
+        self.reservation_details = None
+        self.deploy_result = None
+        self.save_n_restore_mgr = None
+        self.is_snapshot = False
+
+    # ---------------------------
+    # ---------------------------
+    def execute(self):
+        self.api = helpers.get_api_session()
+        self.sandbox = SandboxBase(self.reservation_id, self.logger)
+        self.sandbox.report_info('Beginning sandbox setup', write_to_output_window=True)
+
+        scheduler = self.create_scheduler()
+        scheduler.run()
+
+        if scheduler.step_errors:
+            err_msg = ""
+            for name, exc in scheduler.step_errors.iteritems():
+                err_msg += "\n" + "Step '{0}' failed: {1}".format(name, str(exc))
+            if scheduler.skipped_steps:
+                err_msg += "\n" + "Skipped steps: " + ", ".join(scheduler.skipped_steps)
+            self.sandbox.report_error("Reservation is Active with Errors - " + err_msg, raise_error=True)
+
+        self.logger.info("Setup for reservation {0} completed".format(self.reservation_id))
+
+    # ---------------------------
+    # ---------------------------
+    def create_scheduler(self):
+        """
+        Create the scheduler with the setup steps
+        :rtype: DagScheduler
+        """
+        scheduler = DagScheduler(self.logger)
+        scheduler.add_step('prepare_connectivity', self._prepare_connectivity)
+        scheduler.add_step('deploy', self._deploy, depends_on=['prepare_connectivity'])
+        scheduler.add_step('autoload', self._autoload, depends_on=['deploy'])
+        scheduler.add_step('connect_routes', self._connect_routes, depends_on=['autoload'])
+        scheduler.add_step('power_on_ip', self._power_on_refresh_ip, depends_on=['connect_routes'])
+        scheduler.add_step('configure_apps', self._configure_apps, depends_on=['power_on_ip'])
+        scheduler.add_step('detect_snapshot', self._detect_snapshot)
+        scheduler.add_step('vm_power_on', self._vm_power_on, depends_on=['detect_snapshot', 'power_on_ip'])
+        # the networking devices are loaded while the apps are set up, the VMs are restored after them
+        scheduler.add_step('networking_config_load', self._networking_config_load,
+                           depends_on=['deploy', 'detect_snapshot'])
+        scheduler.add_step('vm_restore', self._vm_restore, depends_on=['configure_apps', 'vm_power_on'])
+        scheduler.add_step('finalize', self._finalize,
+                           depends_on=['networking_config_load', 'vm_restore'])
+        return scheduler
+
+    # ---------------------------
+    # ---------------------------
+    def _prepare_connectivity(self):
+        self.environment_setup._prepare_connectivity(self.api, self.reservation_id)
+
+    # ---------------------------
+    # ---------------------------
+    def _deploy(self):
+        self.reservation_details = self.api.GetReservationDetails(self.reservation_id)
+        self.deploy_result = self.environment_setup._deploy_apps_in_reservation(
+            api=self.api, reservation_details=self.reservation_details)
+
+        # the deployed apps were added to the reservation
+        if self.deploy_result and self.deploy_result.ResultItems:
+            self.reservation_details = self.api.GetReservationDetails(self.reservation_id)
+            self.sandbox.invalidate_cache()
+
+    # ---------------------------
+    # ---------------------------
+    def _autoload(self):
+        self.environment_setup._try_exeucte_autoload(api=self.api,
+                                                     deploy_result=self.deploy_result,
+                                                     resource_details_cache=self.resource_details_cache)
+
+    # ---------------------------
+    # ---------------------------
+    def _connect_routes(self):
+        self.environment_setup._connect_all_routes_in_reservation(api=self.api,
+                                                                  reservation_details=self.reservation_details,
+                                                                  reservation_id=self.reservation_id,
+                                                                  resource_details_cache=self.resource_details_cache)
+
+    # ---------------------------
+    # ---------------------------
+    def _power_on_refresh_ip(self):
+        self.environment_setup._run_async_power_on_refresh_ip(api=self.api,
+                                                              reservation_details=self.reservation_details,
+                                                              deploy_results=self.deploy_result,
+                                                              resource_details_cache=self.resource_details_cache,
+                                                              reservation_id=self.reservation_id)
+
+    # ---------------------------
+    # ---------------------------
+    def _configure_apps(self):
+        self.environment_setup._configure_apps(api=self.api, reservation_id=self.reservation_id)
+
+    # ---------------------------
+    # ---------------------------
+    def _detect_snapshot(self):
+        #TODO: don't use networking save and restore to figure if it's a snapshot setup
+        self.save_n_restore_mgr = SaveRestoreManager(self.sandbox)
+        self.is_snapshot = False
+        if self.save_n_restore_mgr.get_storage_manager():
+            if self.save_n_restore_mgr.is_snapshot():
+                self.is_snapshot = True
+
+    # ---------------------------
+    # ---------------------------
+    def _vm_power_on(self):
+        self.environment_setup_vm.run(self.sandbox, self.is_snapshot)
+
+    # ---------------------------
+    # ---------------------------
+    def _networking_config_load(self):
+        self.sandbox.report_info('Beginning load configuration for resources')
+        self.environment_setup_resources.load_configuration(self.sandbox, self.save_n_restore_mgr,
+                                                            is_snapshot=self.is_snapshot, load_vms=False)
+
+    # ---------------------------
+    # ---------------------------
+    def _vm_restore(self):
+        self.environment_setup_resources.load_configuration(self.sandbox, self.save_n_restore_mgr,
+                                                            is_snapshot=self.is_snapshot, load_networking=False)
+
+    # ---------------------------
+    # ---------------------------
+    def _finalize(self):
+        self.environment_setup_resources.finalize(self.sandbox)
@@ -8,6 +8,11 @@ import os
 
 
 class EnvironmentSetupResources(object):
+    #Consider an ignore family capability? This list gets to be a maint issue...?
+    IGNORE_MODELS = ['Generic TFTP server', 'Config Set Pool', 'Generic FTP server',
+                     'netscout switch 3912', 'Subnet-28', 'Subnet-30', 'GitLab',
+                     'Generic Local Storage', 'Generic In-Memory Storage']
+
     def __init__(self):
         self.reservation_id = helpers.get_reservation_context_details().id
         self.logger = get_qs_logger(log_file_prefix="CloudShell Sandbox Setup Resources",
@@ -19,45 +24,67 @@ class EnvironmentSetupResources(object):
         saveNRestoreTool = SaveRestoreManager(sandbox)
         sandbox.report_info('Beginning load configuration for resources')
         try:
-            sandbox.clear_all_resources_live_status()
-            if sandbox.get_storage_server_resource():
-                # Get the config set name from the orchestration's params
-                config_set_name = ''
-                try:
-                    config_set_name = os.environ['Set Name']
-                except:
-                    pass
-                #Consider an ignore family capability? This list gets to be a maint issue...?
-                ignore_models=['Generic TFTP server', 'Config Set Pool', 'Generic FTP server',
-                               'netscout switch 3912', 'Subnet-28', 'Subnet-30', 'GitLab']
-
-                if saveNRestoreTool.get_storage_manager():
-                    if saveNRestoreTool.is_snapshot():
-                        saveNRestoreTool.load_config(config_stage='Snapshots', config_type='Running',
-                                                     ignore_models=ignore_models)
-                    else:
-                        saveNRestoreTool.load_config(config_stage='Gold', config_type='Running',
-                                                 ignore_models=ignore_models,
-                                                 config_set_name=config_set_name)
-            else:
-                sandbox.report_info("Skipping load configuration. No storage resource associated with the blueprint ",
-                                    write_to_output_window=True)
-
-            # power on Vms that might be powered off because of the snapshot configuration
-            # TODO: get a list of vms that were restored from snapshot and only power on these ones
-            sandbox.power_on_vms()
-
-            # call activate_all_routes_and_connectors
-            sandbox.activate_all_routes_and_connectors()
-
-            sandbox.report_info('Sandbox setup finished successfully')
-
-            # Call routes_validation
-            #   sandbox.routes_validation()
+            self.load_configuration(sandbox, saveNRestoreTool)
+            self.finalize(sandbox)
         except QualiError as qe:
             self.logger.error("Setup failed. " + str(qe))
         except Exception as ex:
             self.logger.error("Setup failed. Unexpected error:" + str(ex.message))
 
+    def load_configuration(self, sandbox, saveNRestoreTool, is_snapshot=None, load_networking=True, load_vms=True):
+        """
+        Load the configuration on the networking devices of the sandbox and restore its VMs
+        :param SandboxBase sandbox:
+        :param SaveRestoreManager saveNRestoreTool:
+        :param bool is_snapshot:  Is the sandbox restored from a snapshot. None to check it with the storage
+        :param bool load_networking:  Optional. Load the configuration on the networking devices
+        :param bool load_vms:  Optional. Restore the VMs
+        """
+        # only the live status of the resources that are loaded here, the other resources may be in other steps
+        if load_networking and load_vms:
+            sandbox.clear_all_resources_live_status()
+        elif load_networking:
+            sandbox.clear_resources_live_status(sandbox.get_root_networking_resources())
+        elif load_vms:
+            sandbox.clear_resources_live_status(sandbox.get_root_vm_resources())
+        if sandbox.get_storage_server_resource():
+            # Get the config set name from the orchestration's params
+            config_set_name = ''
+            try:
+                config_set_name = os.environ['Set Name']
+            except:
+                pass
+
+            if saveNRestoreTool.get_storage_manager():
+                if is_snapshot is None:
+                    is_snapshot = saveNRestoreTool.is_snapshot()
+                if is_snapshot:
+                    saveNRestoreTool.load_config(config_stage='Snapshots', config_type='Running',
+                                                 ignore_models=self.IGNORE_MODELS,
+                                                 load_networking=load_networking, load_vms=load_vms)
+                else:
+                    saveNRestoreTool.load_config(config_stage='Gold', config_type='Running',
+                                             ignore_models=self.IGNORE_MODELS,
+                                             config_set_name=config_set_name,
+                                             load_networking=load_networking, load_vms=load_vms)
+        else:
+            sandbox.report_info("Skipping load configuration. No storage resource associated with the blueprint ",
+                                write_to_output_window=True)
+
+    def finalize(self, sandbox):
+        """
+        Power on the VMs again, activate the routes and report that the setup finished
+        :param SandboxBase sandbox:
+        """
+        # power on Vms that might be powered off because of the snapshot configuration
+        # TODO: get a list of vms that were restored from snapshot and only power on these ones
+        sandbox.power_on_vms()
+
+        # call activate_all_routes_and_connectors
+        sandbox.activate_all_routes_and_connectors()
 
+        sandbox.report_info('Sandbox setup finished successfully')
+        sandbox.report_cache_stats()
 
+        # Call routes_validation
+        #   sandbox.routes_validation()
@@ -7,17 +7,24 @@ from cloudshell.core.logger.qs_logger import get_qs_logger
 from remap_child_resources_constants import *
 from sandbox_scripts.helpers.resource_helpers import *
 from sandbox_scripts.profiler.env_profiler import profileit
+import time
+
+DEFAULT_MAX_CONCURRENT_AUTOLOADS = 10
 
 
 class EnvironmentSetup(object):
     NO_DRIVER_ERR = "129"
     DRIVER_FUNCTION_ERROR = "151"
 
-    def __init__(self):
+    def __init__(self, max_concurrent_autoloads=DEFAULT_MAX_CONCURRENT_AUTOLOADS):
+        """
+        :param int max_concurrent_autoloads:  The max number of deployed apps that are discovered in parallel
+        """
         self.reservation_id = helpers.get_reservation_context_details().id
         self.logger = get_qs_logger(log_file_prefix="CloudShell Sandbox Setup",
                                     log_group=self.reservation_id,
                                     log_category='Setup')
+        self.max_concurrent_autoloads = max_concurrent_autoloads
 
     #@profileit(scriptName='Setup')
     def execute(self):
@@ -84,57 +91,86 @@ class EnvironmentSetup(object):
                                                 message='No apps to discover')
             return
 
-        message_written = False
+        deployed_app_names = [deployed_app.AppDeploymentyInfo.LogicalResourceName
+                              for deployed_app in deploy_result.ResultItems if deployed_app.Success]
+        if not deployed_app_names:
+            return
+
+        pool = ThreadPool(min(len(deployed_app_names), self.max_concurrent_autoloads))
+        lock = Lock()
+        message_status = {
+            "autoload": False
+        }
+        async_results = [pool.apply_async(self._autoload_deployed_app,
+                                          (api, deployed_app_name, lock, message_status, resource_details_cache))
+                         for deployed_app_name in deployed_app_names]
 
-        for deployed_app in deploy_result.ResultItems:
-            if not deployed_app.Success:
-                continue
-            deployed_app_name = deployed_app.AppDeploymentyInfo.LogicalResourceName
+        pool.close()
+        pool.join()
+        # get() re-raises an unexpected error of a worker (e.g. failing to get the resource details)
+        for async_result in async_results:
+            async_result.get()
 
-            resource_details = api.GetResourceDetails(deployed_app_name)
+    def _autoload_deployed_app(self, api, deployed_app_name, lock, message_status, resource_details_cache):
+        """
+        :param CloudShellAPISession api:
+        :param str deployed_app_name:
+        :param Lock lock:
+        :param (dict of str: Boolean) message_status:
+        :param (dict of str: ResourceInfo) resource_details_cache:
+        :return:
+        """
+        resource_details = api.GetResourceDetails(deployed_app_name)
+        with lock:
             resource_details_cache[deployed_app_name] = resource_details
 
-            autoload = "true"
-            autoload_param = get_vm_custom_param(resource_details, "autoload")
-            if autoload_param:
-                autoload = autoload_param.Value
-            if autoload.lower() != "true":
-                self.logger.info("Apps discovery is disabled on deployed app {0}".format(deployed_app_name))
-                continue
-
-            try:
-                self.logger.info("Executing Autoload command on deployed app {0}".format(deployed_app_name))
-                if not message_written:
-                    api.WriteMessageToReservationOutput(reservationId=self.reservation_id,
-                                                        message='Apps are being discovered...')
-                    message_written = True
-
-                api.AutoLoad(deployed_app_name)
-
-                # for devices that are autoloaded and have child resources attempt to call "Connect child resources"
-                # which copies CVCs from app to deployed app ports.
-                api.ExecuteCommand(self.reservation_id, deployed_app_name,
-                                   TARGET_TYPE_RESOURCE,
-                                   REMAP_CHILD_RESOURCES, [])
-
-            except CloudShellAPIError as exc:
-                if exc.code not in (EnvironmentSetup.NO_DRIVER_ERR,
-                                    EnvironmentSetup.DRIVER_FUNCTION_ERROR,
-                                    MISSING_COMMAND_ERROR):
-                    self.logger.error(
-                        "Error executing Autoload command on deployed app {0}. Error: {1}".format(deployed_app_name,
-                                                                                                  exc.rawxml))
-                    api.WriteMessageToReservationOutput(reservationId=self.reservation_id,
-                                                        message='Discovery failed on "{0}": {1}'
-                                                        .format(deployed_app_name, exc.message))
-
-            except Exception as exc:
-                self.logger.error("Error executing Autoload command on deployed app {0}. Error: {1}"
-                                  .format(deployed_app_name, str(exc)))
+        autoload = "true"
+        autoload_param = get_vm_custom_param(resource_details, "autoload")
+        if autoload_param:
+            autoload = autoload_param.Value
+        if autoload.lower() != "true":
+            self.logger.info("Apps discovery is disabled on deployed app {0}".format(deployed_app_name))
+            return
+
+        start_time = time.time()
+        try:
+            self.logger.info("Executing Autoload command on deployed app {0}".format(deployed_app_name))
+            if not message_status['autoload']:
+                with lock:
+                    if not message_status['autoload']:
+                        api.WriteMessageToReservationOutput(reservationId=self.reservation_id,
+                                                            message='Apps are being discovered...')
+                        message_status['autoload'] = True
+
+            api.AutoLoad(deployed_app_name)
+
+            # for devices that are autoloaded and have child resources attempt to call "Connect child resources"
+            # which copies CVCs from app to deployed app ports.
+            api.ExecuteCommand(self.reservation_id, deployed_app_name,
+                               TARGET_TYPE_RESOURCE,
+                               REMAP_CHILD_RESOURCES, [])
+
+        except CloudShellAPIError as exc:
+            if exc.code not in (EnvironmentSetup.NO_DRIVER_ERR,
+                                EnvironmentSetup.DRIVER_FUNCTION_ERROR,
+                                MISSING_COMMAND_ERROR):
+                self.logger.error(
+                    "Error executing Autoload command on deployed app {0}. Error: {1}".format(deployed_app_name,
+                                                                                              exc.rawxml))
                 api.WriteMessageToReservationOutput(reservationId=self.reservation_id,
                                                     message='Discovery failed on "{0}": {1}'
                                                     .format(deployed_app_name, exc.message))
 
+        except Exception as exc:
+            self.logger.error("Error executing Autoload command on deployed app {0}. Error: {1}"
+                              .format(deployed_app_name, str(exc)))
+            api.WriteMessageToReservationOutput(reservationId=self.reservation_id,
+                                                message='Discovery failed on "{0}": {1}'
+                                                .format(deployed_app_name, exc.message))
+
+        self.logger.info("Autoload of deployed app {0} took {1:.1f} seconds"
+                         .format(deployed_app_name, time.time() - start_time))
+
     def _deploy_apps_in_reservation(self, api, reservation_details):
         apps = reservation_details.ReservationDescription.Apps
         if not apps or (len(apps) == 1 and not apps[0].Name):
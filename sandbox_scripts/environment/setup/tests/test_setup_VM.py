@@ -2,6 +2,7 @@ import unittest
 from mock import patch, Mock, call
 from sandbox_scripts.environment.setup.setup_VM import EnvironmentSetupVM
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 from cloudshell.api.cloudshell_api import ResourceInfoVmDetails
 import json
@@ -176,5 +177,55 @@ class SetupVMTests(unittest.TestCase):
                     call.execute_connected_command(u'5487c6ce-d0b3-43e9-8ee7-e27af8406905', 'remote_refresh_ip', 'remote_connectivity')]
         resourcebase1.assert_has_calls(api_calls)
 
+    def _create_slow_vms(self, count, command_time):
+        """
+        Create deployed app mocks whose connected commands take command_time seconds.
+        Returns the vms and the ConcurrencyTracker of the commands
+        """
+        tracker = ConcurrencyTracker(duration=command_time)
+        vms = []
+        for i in range(count):
+            vm = Mock()
+            vm.name = 'vm' + str(i)
+            vm.model = 'deployed app'
+            vm.execute_connected_command.side_effect = \
+                lambda reservation_id, command_name, tag, vm=vm: tracker.run((vm.name, command_name))
+            vms.append(vm)
+        return vms, tracker
+
+    @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
+    @patch('sandbox_scripts.environment.setup.setup_VM.SandboxBase')
+    @patch('sandbox_scripts.environment.setup.setup_VM.SaveRestoreManager')
+    def test_setup_vm_power_on_runs_in_parallel(self, mock_save, mock_sandboxbase, mock_api_session):
+        vms, tracker = self._create_slow_vms(10, 0.1)
+        mock_sandboxbase.return_value.get_root_vm_resources.return_value = vms
+        mock_save.return_value.is_snapshot.return_value = True
+
+        self.setup_script.execute()
+
+        # Power on + refresh IP of 10 VMs take 2 seconds when run one after the other
+        self.assertLess(self.setup_script.total_run_time, 1.0)
+        self.assertEqual(tracker.max_running, 10)
+        self.assertEqual(sorted(self.setup_script.vm_run_times.keys()), sorted([vm.name for vm in vms]))
+        for vm in vms:
+            self.assertGreaterEqual(self.setup_script.vm_run_times[vm.name], 0.2)
+            self.assertEqual(len([name for name, command in tracker.calls if name == vm.name]), 2)
+
+    @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
+    @patch('sandbox_scripts.environment.setup.setup_VM.SandboxBase')
+    @patch('sandbox_scripts.environment.setup.setup_VM.SaveRestoreManager')
+    def test_setup_vm_power_on_concurrency_limit(self, mock_save, mock_sandboxbase, mock_api_session):
+        vms, tracker = self._create_slow_vms(6, 0.05)
+        mock_sandboxbase.return_value.get_root_vm_resources.return_value = vms
+        mock_save.return_value.is_snapshot.return_value = True
+        self.setup_script.max_concurrent_vms = 2
+
+        self.setup_script.execute()
+
+        self.assertEqual(tracker.max_running, 2)
+        messages = [c for c in mock_sandboxbase.return_value.report_info.call_args_list
+                    if c == call('Apps are powering on... ')]
+        self.assertEqual(len(messages), 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from mock import patch, Mock, call
+from sandbox_scripts.environment.setup.setup_pipeline import EnvironmentSetupPipeline
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
+import os
+from threading import Event
+
+
+resContext = '''{"id":"5487c6ce-d0b3-43e9-8ee7-e27af8406905",
+ "ownerUser":"bob",
+ "ownerPass":"nIqm+BG6ZGJjby5hUittVFFJASc=",
+ "domain":"Global",
+ "environmentName":"My environment",
+ "description":"New demo environment",
+ "parameters":
+   { "globalInputs": [],
+     "resourceRequirements":[],
+     "resourceAdditionalInfo":[]}}'''
+
+conContext = '''{"serverAddress": "localhost",
+"adminAuthToken": "anAdminToken"}'''
+
+
+class SetupPipelineTests(unittest.TestCase):
+
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.EnvironmentSetupResources')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.EnvironmentSetupVM')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.EnvironmentSetup')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.get_qs_logger')
+    def setUp(self, mock_logger, mock_setup, mock_setup_vm, mock_setup_resources):
+        os.environ['reservationContext'] = resContext
+        os.environ['qualiConnectivityContext'] = conContext
+        self.pipeline = EnvironmentSetupPipeline()
+        self.setup = self.pipeline.environment_setup
+        self.setup_vm = self.pipeline.environment_setup_vm
+        self.setup_resources = self.pipeline.environment_setup_resources
+
+    def tearDown(self):
+        pass
+
+    @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.SandboxBase')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.SaveRestoreManager')
+    def test_all_steps_share_the_reservation_context(self, mock_save, mock_sandboxbase, mock_api_session):
+        mock_save.return_value.is_snapshot.return_value = True
+        # the two loads run in parallel
+        loads = ConcurrencyTracker()
+        self.setup_resources.load_configuration.side_effect = lambda *args, **kwargs: loads.run(call(*args, **kwargs))
+
+        self.pipeline.execute()
+
+        sandbox = mock_sandboxbase.return_value
+        api = mock_api_session.return_value
+        mock_sandboxbase.assert_called_once_with('5487c6ce-d0b3-43e9-8ee7-e27af8406905', self.pipeline.logger)
+        self.setup._prepare_connectivity.assert_called_once_with(api, '5487c6ce-d0b3-43e9-8ee7-e27af8406905')
+        self.setup._try_exeucte_autoload.assert_called_once_with(
+            api=api, deploy_result=self.setup._deploy_apps_in_reservation.return_value,
+            resource_details_cache=self.pipeline.resource_details_cache)
+        self.setup._configure_apps.assert_called_once_with(api=api,
+                                                           reservation_id='5487c6ce-d0b3-43e9-8ee7-e27af8406905')
+        self.setup_vm.run.assert_called_once_with(sandbox, True)
+        self.assertItemsEqual(loads.calls, [
+            call(sandbox, mock_save.return_value, is_snapshot=True, load_vms=False),
+            call(sandbox, mock_save.return_value, is_snapshot=True, load_networking=False)])
+        self.setup_resources.finalize.assert_called_once_with(sandbox)
+        sandbox.invalidate_cache.assert_called_once_with()
+
+    @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.SandboxBase')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.SaveRestoreManager')
+    def test_networking_config_load_doesnt_wait_for_the_apps(self, mock_save, mock_sandboxbase, mock_api_session):
+        mock_save.return_value.is_snapshot.return_value = False
+        networking_loaded = Event()
+        steps = ConcurrencyTracker()
+        record = steps.run
+        order = steps.calls
+
+        def autoload(**kwargs):
+            # the networking devices are loaded while the apps are set up
+            record('autoload started, networking loaded: ' + str(networking_loaded.wait(5)))
+
+        def load_configuration(sandbox, save_n_restore_mgr, is_snapshot, load_networking=True, load_vms=True):
+            record('load networking' if load_networking else 'restore vms')
+            if load_networking:
+                networking_loaded.set()
+        self.setup._try_exeucte_autoload.side_effect = autoload
+        self.setup._configure_apps.side_effect = lambda **kwargs: record('configure_apps')
+        self.setup_vm.run.side_effect = lambda *args: record('vm_power_on')
+        self.setup_resources.load_configuration.side_effect = load_configuration
+        self.setup_resources.finalize.side_effect = lambda *args: record('finalize')
+
+        self.pipeline.execute()
+
+        self.assertIn('autoload started, networking loaded: True', order)
+        self.assertLess(order.index('load networking'), order.index('autoload started, networking loaded: True'))
+        self.assertGreater(order.index('restore vms'), order.index('configure_apps'))
+        self.assertGreater(order.index('restore vms'), order.index('vm_power_on'))
+        self.assertEqual(order[-1], 'finalize')
+
+    @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.SandboxBase')
+    @patch('sandbox_scripts.environment.setup.setup_pipeline.SaveRestoreManager')
+    def test_failed_step_skips_its_dependents(self, mock_save, mock_sandboxbase, mock_api_session):
+        self.setup._try_exeucte_autoload.side_effect = Exception('autoload failed')
+        mock_sandboxbase.return_value.report_error.side_effect = QualiError('r1', 'error')
+
+        with self.assertRaises(QualiError):
+            self.pipeline.execute()
+
+        self.setup._connect_all_routes_in_reservation.assert_not_called()
+        self.setup_vm.run.assert_not_called()
+        self.setup_resources.finalize.assert_not_called()
+        # the VMs are not restored, the networking devices don't depend on the autoload
+        self.setup_resources.load_configuration.assert_called_once_with(
+            mock_sandboxbase.return_value, mock_save.return_value, is_snapshot=True, load_vms=False)
+        error_message = mock_sandboxbase.return_value.report_error.call_args[0][0]
+        self.assertIn("Step 'autoload' failed: autoload failed", error_message)
+        self.assertIn("connect_routes", error_message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -40,7 +40,7 @@ class SetupResourcesTests(unittest.TestCase):
         mock_save.return_value.is_snapshot.return_value = True
         self.setup_script.execute()
         mock_sandboxbase.return_value.clear_all_resources_live_status.assert_called_with()
-        mock_save.return_value.load_config.assert_called_with(config_stage='Snapshots', config_type='Running', ignore_models=['Generic TFTP server', 'Config Set Pool', 'Generic FTP server', 'netscout switch 3912', 'Subnet-28', 'Subnet-30', 'GitLab'])
+        mock_save.return_value.load_config.assert_called_with(config_stage='Snapshots', config_type='Running', ignore_models=['Generic TFTP server', 'Config Set Pool', 'Generic FTP server', 'netscout switch 3912', 'Subnet-28', 'Subnet-30', 'GitLab', 'Generic Local Storage', 'Generic In-Memory Storage'], load_networking=True, load_vms=True)
         mock_sandboxbase.return_value.power_on_vms.assert_called_with()
         mock_sandboxbase.return_value.activate_all_routes_and_connectors.assert_called_with()
         report_info_calls = [call('Beginning load configuration for resources'),
@@ -48,6 +48,14 @@ class SetupResourcesTests(unittest.TestCase):
         mock_sandboxbase.return_value.report_info.assert_has_calls(report_info_calls)
 
 
+    def test_networking_only_load_clears_only_the_networking_devices(self):
+        sandbox = Mock()
+        save_n_restore_mgr = Mock()
+        self.setup_script.load_configuration(sandbox, save_n_restore_mgr, is_snapshot=False, load_vms=False)
+        sandbox.clear_all_resources_live_status.assert_not_called()
+        sandbox.clear_resources_live_status.assert_called_once_with(sandbox.get_root_networking_resources.return_value)
+        self.assertEqual(save_n_restore_mgr.load_config.call_args[1]['load_vms'], False)
+
     @patch('cloudshell.helpers.scripts.cloudshell_scripts_helpers.get_api_session')
     @patch('sandbox_scripts.environment.setup.setup_resources.SandboxBase')
     @patch('sandbox_scripts.environment.setup.setup_resources.SaveRestoreManager')
@@ -56,7 +64,7 @@ class SetupResourcesTests(unittest.TestCase):
         mock_sandboxbase.return_value.get_storage_server_resource.return_value = True
         self.setup_script.execute()
         mock_sandboxbase.return_value.clear_all_resources_live_status.assert_called_with()
-        mock_save.return_value.load_config.assert_called_with(config_set_name='', config_stage='Gold', config_type='Running', ignore_models=['Generic TFTP server', 'Config Set Pool', 'Generic FTP server', 'netscout switch 3912', 'Subnet-28', 'Subnet-30', 'GitLab'])
+        mock_save.return_value.load_config.assert_called_with(config_set_name='', config_stage='Gold', config_type='Running', ignore_models=['Generic TFTP server', 'Config Set Pool', 'Generic FTP server', 'netscout switch 3912', 'Subnet-28', 'Subnet-30', 'GitLab', 'Generic Local Storage', 'Generic In-Memory Storage'], load_networking=True, load_vms=True)
         mock_sandboxbase.return_value.power_on_vms.assert_called_with()
         mock_sandboxbase.return_value.activate_all_routes_and_connectors.assert_called_with()
         report_info_calls = [call('Beginning load configuration for resources'),
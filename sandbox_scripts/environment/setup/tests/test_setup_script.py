@@ -0,0 +1,93 @@
+import unittest
+from mock import patch, Mock, call
+from sandbox_scripts.environment.setup.setup_script import EnvironmentSetup
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
+from cloudshell.api.common_cloudshell_api import CloudShellAPIError
+import os
+
+
+resContext = '''{"id":"5487c6ce-d0b3-43e9-8ee7-e27af8406905",
+ "ownerUser":"bob",
+ "ownerPass":"nIqm+BG6ZGJjby5hUittVFFJASc=",
+ "domain":"Global",
+ "environmentName":"My environment",
+ "description":"New demo environment",
+ "parameters":
+   { "globalInputs": [],
+     "resourceRequirements":[],
+     "resourceAdditionalInfo":[]}}'''
+
+conContext = '''{"serverAddress": "localhost",
+"adminAuthToken": "anAdminToken"}'''
+
+
+class SetupScriptTests(unittest.TestCase):
+
+    @patch('sandbox_scripts.environment.setup.setup_script.get_qs_logger')
+    def setUp(self, mock_logger):
+        os.environ['reservationContext'] = resContext
+        os.environ['qualiConnectivityContext'] = conContext
+        self.setup_script = EnvironmentSetup()
+        self.api = Mock()
+        self.api.GetResourceDetails.side_effect = self._get_resource_details
+
+    def tearDown(self):
+        pass
+
+    def _get_resource_details(self, name):
+        resource_details = Mock()
+        resource_details.Name = name
+        resource_details.VmDetails.VmCustomParams = []
+        return resource_details
+
+    def _create_deploy_result(self, names, failed_names=()):
+        deploy_result = Mock()
+        deploy_result.ResultItems = []
+        for name in list(names) + list(failed_names):
+            item = Mock()
+            item.Success = name not in failed_names
+            item.AppDeploymentyInfo.LogicalResourceName = name
+            deploy_result.ResultItems.append(item)
+        return deploy_result
+
+    def test_autoload_runs_in_parallel(self):
+        autoloads = ConcurrencyTracker(duration=0.1)
+        child_resources_connections = ConcurrencyTracker()
+        self.api.AutoLoad.side_effect = autoloads.run
+        self.api.ExecuteCommand.side_effect = \
+            lambda reservation_id, name, target_type, command_name, inputs: child_resources_connections.run(name)
+        self.setup_script.max_concurrent_autoloads = 4
+        names = ['app' + str(i) for i in range(8)]
+        resource_details_cache = {}
+
+        self.setup_script._try_exeucte_autoload(self.api, self._create_deploy_result(names, ['failed app']),
+                                                resource_details_cache)
+
+        self.assertEqual(autoloads.max_running, 4)
+        self.assertEqual(sorted(resource_details_cache.keys()), sorted(names))
+        self.assertEqual(sorted(autoloads.calls), sorted(names))
+        self.assertEqual(sorted(child_resources_connections.calls), sorted(names))
+        messages = [c for c in self.api.WriteMessageToReservationOutput.call_args_list
+                    if c == call(reservationId='5487c6ce-d0b3-43e9-8ee7-e27af8406905',
+                                 message='Apps are being discovered...')]
+        self.assertEqual(len(messages), 1)
+
+    def test_autoload_ignores_missing_driver_errors(self):
+        def autoload(name):
+            if name == 'no driver':
+                raise CloudShellAPIError(EnvironmentSetup.NO_DRIVER_ERR, 'No driver', '')
+            raise CloudShellAPIError('100', 'Autoload failed', '')
+
+        self.api.AutoLoad.side_effect = autoload
+
+        self.setup_script._try_exeucte_autoload(self.api, self._create_deploy_result(['no driver', 'app1']), {})
+
+        self.api.WriteMessageToReservationOutput.assert_any_call(
+            reservationId='5487c6ce-d0b3-43e9-8ee7-e27af8406905', message='Discovery failed on "app1": Autoload failed')
+        discovery_failed_messages = [c for c in self.api.WriteMessageToReservationOutput.call_args_list
+                                     if 'Discovery failed' in c[1]['message']]
+        self.assertEqual(len(discovery_failed_messages), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,17 +4,37 @@ from sandbox_scripts.helpers.Networking.NetworkingSaveNRestore import *
 from sandbox_scripts.QualiEnvironmentUtils.Sandbox import SandboxBase
 from cloudshell.helpers.scripts import cloudshell_scripts_helpers as helpers
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
+from threading import BoundedSemaphore
+from sandbox_scripts.helpers.resource_helpers import prefetch_root_resource_details
+
+DEFAULT_MAX_CONCURRENT_VMS = 20
+DEFAULT_REMOVE_BATCH_SIZE = 50
 
 
 class EnvironmentTeardownVM:
     REMOVE_DEPLOYED_RESOURCE_ERROR = 153
 
-    def __init__(self):
+    def __init__(self, max_concurrent_vms=DEFAULT_MAX_CONCURRENT_VMS, max_concurrent_per_provider=None,
+                 remove_batch_size=DEFAULT_REMOVE_BATCH_SIZE, resource_details_cache=None):
+        """
+        :param int max_concurrent_vms:  The max number of VMs that are powered off in parallel
+        :param int max_concurrent_per_provider:  The max number of VMs of the same cloud provider (e.g. the same
+                                                 vCenter) that are powered off in parallel. None for no limit
+        :param int remove_batch_size:  The max number of deployed apps deleted in a single
+                                       RemoveResourcesFromReservation call
+        :param dict(str:ResourceInfo) resource_details_cache:  Resource details that were already fetched,
+                                                               may be shared with the other teardown scripts
+        """
         self.reservation_id = helpers.get_reservation_context_details().id
         self.logger = qs_logger.get_qs_logger(log_file_prefix="CloudShell Sandbox Teardown",
                                               log_group=self.reservation_id,
                                               log_category='Teardown')
         self.sandbox = None
+        self.max_concurrent_vms = max_concurrent_vms
+        self.max_concurrent_per_provider = max_concurrent_per_provider
+        self.remove_batch_size = remove_batch_size
+        self._provider_semaphores = dict()
+        self.resource_details_cache = resource_details_cache if resource_details_cache is not None else {}
 
     def execute(self):
 
@@ -22,7 +42,7 @@ class EnvironmentTeardownVM:
 
         self.sandbox.report_info("Beginning VMs cleanup")
 
-        reservation_details = self.sandbox.api_session.GetReservationDetails(self.reservation_id)
+        reservation_details = self.sandbox.get_cached_details()
 
         saveNRestoreTool = SaveRestoreManager(self.sandbox)
 
@@ -55,21 +75,25 @@ class EnvironmentTeardownVM:
         # filter out resources not created in this reservation
         resources = reservation_details.ReservationDescription.Resources
 
-        pool = ThreadPool()
-        async_results = []
+        vms_details = []
+        for resource_details in prefetch_root_resource_details(self.sandbox.api_session, resources,
+                                                               self.resource_details_cache):
+            vm_details = resource_details.VmDetails
+            if vm_details and hasattr(vm_details, "UID") and vm_details.UID:
+                vms_details.append(resource_details)
+
+        if not vms_details:
+            return
+
+        pool = ThreadPool(min(len(vms_details), self.max_concurrent_vms))
         lock = Lock()
         message_status = {
             "power_off": False,
             "delete": False
         }
-
-        for resource in resources:
-            resource_details = self.sandbox.api_session.GetResourceDetails(resource.Name)
-            vm_details = resource_details.VmDetails
-            if vm_details and hasattr(vm_details, "UID") and vm_details.UID:
-                result_obj = pool.apply_async(self._power_off_or_delete_deployed_app,
-                                    (resource_details, lock, message_status,to_delete))
-                async_results.append(result_obj)
+        async_results = [pool.apply_async(self._power_off_or_delete_deployed_app,
+                                          (resource_details, lock, message_status, to_delete))
+                         for resource_details in vms_details]
 
         pool.close()
         pool.join()
@@ -80,10 +104,12 @@ class EnvironmentTeardownVM:
             if result is not None:
                 resource_to_delete.append(result)
 
-        # delete resource - bulk
-        if resource_to_delete:
+        # delete resource - bulk, in batches of remove_batch_size
+        for index in range(0, len(resource_to_delete), self.remove_batch_size):
+            batch = resource_to_delete[index:index + self.remove_batch_size]
             try:
-                self.sandbox.api_session.RemoveResourcesFromReservation(self.reservation_id, resource_to_delete)
+                self.sandbox.api_session.RemoveResourcesFromReservation(self.reservation_id, batch)
+                self.sandbox.invalidate_cache()
             except QualiError as exc:
                 if exc.code == EnvironmentTeardownVM.REMOVE_DEPLOYED_RESOURCE_ERROR:
                     self.sandbox.report_error(error_message=exc.message,
@@ -91,6 +117,21 @@ class EnvironmentTeardownVM:
                                           "Error: {0}".format(exc.message),
                               raise_error=True, write_to_output_window=True)
 
+    def _get_provider_semaphore(self, resource_info, lock):
+        """
+        Get the semaphore that limits the number of parallel power off calls on the VM's cloud provider
+        :param ResourceInfo resource_info:
+        :param Lock lock:
+        :rtype: BoundedSemaphore
+        """
+        if not self.max_concurrent_per_provider:
+            return None
+        provider = getattr(resource_info.VmDetails, "CloudProviderFullName", "")
+        with lock:
+            if provider not in self._provider_semaphores:
+                self._provider_semaphores[provider] = BoundedSemaphore(self.max_concurrent_per_provider)
+            return self._provider_semaphores[provider]
+
 
     def _power_off_or_delete_deployed_app(self, resource_info, lock, message_status, to_delete):
         """
@@ -125,11 +166,14 @@ class EnvironmentTeardownVM:
                         self.sandbox.report_info('Apps are being powering off... ',
                                                  write_to_output_window=True)
 
-                with lock:
-                    self.logger.info("Executing 'Power Off' on deployed app {0}"
-                                     .format(resource_name, self.reservation_id))
-                    self.sandbox.api_session.ExecuteResourceConnectedCommand(self.reservation_id, resource_name,
-                                                                        "PowerOff", "power")
+                self.logger.info("Executing 'Power Off' on deployed app {0}"
+                                 .format(resource_name, self.reservation_id))
+                provider_semaphore = self._get_provider_semaphore(resource_info, lock)
+                if provider_semaphore:
+                    with provider_semaphore:
+                        self._power_off(resource_name)
+                else:
+                    self._power_off(resource_name)
 
                 return None
 
@@ -138,3 +182,6 @@ class EnvironmentTeardownVM:
                               .format(resource_name, self.reservation_id, str(exc)))
             return None
 
+    def _power_off(self, resource_name):
+        self.sandbox.api_session.ExecuteResourceConnectedCommand(self.reservation_id, resource_name,
+                                                                 "PowerOff", "power")
@@ -23,7 +23,8 @@ class EnvironmentTeardownResources:
         try:
             if saveNRestoreTool.get_storage_manager():
                 ignore_models = ['Generic TFTP server', 'Config Set Pool', 'Generic FTP server', 'netscout switch 3912',
-                             'OnPATH Switch 3903', 'Ixia Traffic generator', "SubNet-28", "SubNet-30", "GitLab"]
+                             'OnPATH Switch 3903', 'Ixia Traffic generator', "SubNet-28", "SubNet-30", "GitLab",
+                             'Generic Local Storage', 'Generic In-Memory Storage']
                 saveNRestoreTool.load_config(config_stage='Base',
                                              config_type='Running',
                                              ignore_models=ignore_models,
@@ -34,6 +35,7 @@ class EnvironmentTeardownResources:
                                     write_to_output_window=True)
 
             sandbox.report_info('Sandbox teardown finished successfully')
+            sandbox.report_cache_stats()
 
         except QualiError as qe:
             self.logger.error("Teardown failed. " + str(qe))
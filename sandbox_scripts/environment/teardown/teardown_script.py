@@ -6,17 +6,23 @@ from cloudshell.helpers.scripts import cloudshell_scripts_helpers as helpers
 from cloudshell.api.common_cloudshell_api import CloudShellAPIError
 from cloudshell.core.logger import qs_logger
 from sandbox_scripts.profiler.env_profiler import profileit
-from sandbox_scripts.helpers.resource_helpers import get_vm_custom_param, get_resources_created_in_res
+from sandbox_scripts.helpers.resource_helpers import get_vm_custom_param, get_resources_created_in_res, \
+    prefetch_root_resource_details
 
 
 class EnvironmentTeardown:
     REMOVE_DEPLOYED_RESOURCE_ERROR = 153
 
-    def __init__(self):
+    def __init__(self, resource_details_cache=None):
+        """
+        :param dict(str:ResourceInfo) resource_details_cache:  Resource details that were already fetched,
+                                                               may be shared with the other teardown scripts
+        """
         self.reservation_id = helpers.get_reservation_context_details().id
         self.logger = qs_logger.get_qs_logger(log_file_prefix="CloudShell Sandbox Teardown",
                                               log_group=self.reservation_id,
                                               log_category='Teardown')
+        self.resource_details_cache = resource_details_cache if resource_details_cache is not None else {}
 
     #@profileit(scriptName="Teardown")
     def execute(self):
@@ -79,20 +85,21 @@ class EnvironmentTeardown:
         resources = get_resources_created_in_res(reservation_details=reservation_details,
                                                  reservation_id=reservation_id)
 
+        vms_details = [resource_details for resource_details in
+                       prefetch_root_resource_details(api, resources, self.resource_details_cache)
+                       if resource_details.VmDetails]
+        if not vms_details:
+            return
+
         pool = ThreadPool()
-        async_results = []
         lock = Lock()
         message_status = {
             "power_off": False,
             "delete": False
         }
-
-        for resource in resources:
-            resource_details = api.GetResourceDetails(resource.Name)
-            if resource_details.VmDetails:
-                result_obj = pool.apply_async(self._power_off_or_delete_deployed_app,
-                                              (api, resource_details, lock, message_status))
-                async_results.append(result_obj)
+        async_results = [pool.apply_async(self._power_off_or_delete_deployed_app,
+                                          (api, resource_details, lock, message_status))
+                         for resource_details in vms_details]
 
         pool.close()
         pool.join()
@@ -0,0 +1,123 @@
+import unittest
+from mock import patch, Mock, call
+from sandbox_scripts.environment.teardown.teardown_VM import EnvironmentTeardownVM
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
+import os
+import time
+
+
+resContext = '''{"id":"5487c6ce-d0b3-43e9-8ee7-e27af8406905",
+ "ownerUser":"bob",
+ "ownerPass":"nIqm+BG6ZGJjby5hUittVFFJASc=",
+ "domain":"Global",
+ "environmentName":"My environment",
+ "description":"New demo environment",
+ "parameters":
+   { "globalInputs": [],
+     "resourceRequirements":[],
+     "resourceAdditionalInfo":[]}}'''
+
+conContext = '''{"serverAddress": "localhost",
+"adminAuthToken": "anAdminToken"}'''
+
+
+class TeardownVMTests(unittest.TestCase):
+
+    @patch('sandbox_scripts.environment.teardown.teardown_VM.qs_logger')
+    def setUp(self, mock_logger):
+        os.environ['reservationContext'] = resContext
+        os.environ['qualiConnectivityContext'] = conContext
+        self.teardown_script = EnvironmentTeardownVM()
+        self.teardown_script.sandbox = Mock()
+        self.power_offs = ConcurrencyTracker(duration=0.1)
+
+    def tearDown(self):
+        pass
+
+    def _create_reservation(self, vms):
+        """
+        :param list[(str, str, str)] vms:  list of (name, model, cloud provider)
+        """
+        details = dict()
+        resources = []
+        for name, model, provider in vms:
+            resource = Mock()
+            resource.Name = name
+            resources.append(resource)
+            resource_details = Mock()
+            resource_details.Name = name
+            resource_details.ResourceModelName = model
+            resource_details.VmDetails.UID = 'uid-' + name
+            resource_details.VmDetails.CloudProviderFullName = provider
+            details[name] = resource_details
+        reservation_details = Mock()
+        reservation_details.ReservationDescription.Resources = resources
+        self.teardown_script.sandbox.api_session.GetResourceDetails.side_effect = lambda name: details[name]
+        return reservation_details
+
+    def _slow_power_off(self, reservation_id, resource_name, command_name, tag):
+        self.power_offs.run(resource_name)
+
+    def test_power_off_runs_in_parallel(self):
+        reservation_details = self._create_reservation([('vm' + str(i), 'deployed app', 'vCenter')
+                                                        for i in range(8)])
+        api_session = self.teardown_script.sandbox.api_session
+        api_session.ExecuteResourceConnectedCommand.side_effect = self._slow_power_off
+
+        start = time.time()
+        self.teardown_script.delete_VM_or_Power_off(reservation_details, to_delete=False)
+
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(self.power_offs.max_running, 8)
+        self.assertEqual(len(self.power_offs.calls), 8)
+        api_session.RemoveResourcesFromReservation.assert_not_called()
+
+    def test_power_off_limited_per_provider(self):
+        reservation_details = self._create_reservation([('vm' + str(i), 'deployed app', 'vCenter')
+                                                        for i in range(6)])
+        api_session = self.teardown_script.sandbox.api_session
+        api_session.ExecuteResourceConnectedCommand.side_effect = self._slow_power_off
+        self.teardown_script.max_concurrent_per_provider = 2
+
+        self.teardown_script.delete_VM_or_Power_off(reservation_details, to_delete=False)
+
+        self.assertEqual(self.power_offs.max_running, 2)
+        self.assertEqual(len(self.power_offs.calls), 6)
+
+    def test_delete_in_batches(self):
+        reservation_details = self._create_reservation([('vm1', 'deployed app', 'vCenter'),
+                                                        ('vm2', 'deployed app', 'vCenter'),
+                                                        ('static1', 'vCenter Static VM', 'vCenter'),
+                                                        ('vm3', 'deployed app', 'AWS')])
+        self.teardown_script.remove_batch_size = 2
+
+        self.teardown_script.delete_VM_or_Power_off(reservation_details, to_delete=True)
+
+        api_session = self.teardown_script.sandbox.api_session
+        api_session.RemoveResourcesFromReservation.assert_has_calls(
+            [call('5487c6ce-d0b3-43e9-8ee7-e27af8406905', ['vm1', 'vm2']),
+             call('5487c6ce-d0b3-43e9-8ee7-e27af8406905', ['vm3'])])
+        api_session.ExecuteResourceConnectedCommand.assert_called_once_with(
+            '5487c6ce-d0b3-43e9-8ee7-e27af8406905', 'static1', 'PowerOff', 'power')
+
+
+    def test_details_fetched_only_for_root_resources_not_in_cache(self):
+        reservation_details = self._create_reservation([('vm1', 'deployed app', 'vCenter'),
+                                                        ('vm2', 'deployed app', 'vCenter')])
+        port = Mock()
+        port.Name = 'vm1/port 1'
+        reservation_details.ReservationDescription.Resources.append(port)
+        api_session = self.teardown_script.sandbox.api_session
+        cached_details = api_session.GetResourceDetails.side_effect('vm2')
+        self.teardown_script.resource_details_cache['vm2'] = cached_details
+        api_session.ExecuteResourceConnectedCommand.side_effect = self._slow_power_off
+
+        self.teardown_script.delete_VM_or_Power_off(reservation_details, to_delete=False)
+
+        api_session.GetResourceDetails.assert_called_once_with('vm1')
+        self.assertIn('vm1', self.teardown_script.resource_details_cache)
+        self.assertEqual(sorted(self.power_offs.calls), ['vm1', 'vm2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
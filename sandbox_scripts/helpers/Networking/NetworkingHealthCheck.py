@@ -55,8 +55,8 @@ class NetworkingHealthCheck:
         """
         # check route validation is set to true on both resources
         # Routes are only validated between 2 devices that require validation
-        source_resource = ResourceBase(resource1)
-        target_resource = ResourceBase(resource2)
+        source_resource = self.sandbox.get_resource(resource1)
+        target_resource = self.sandbox.get_resource(resource2)
         targetRunRoutesValidation = target_resource.get_attribute('RunRoutesValidation')
         sourceRunRoutesValidation = source_resource.get_attribute('RunRoutesValidation')
         if targetRunRoutesValidation == 'False' or not sourceRunRoutesValidation == 'False':
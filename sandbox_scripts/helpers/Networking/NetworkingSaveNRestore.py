@@ -1,8 +1,6 @@
 # coding=utf-8
 import csv
-import os
-import tempfile
-from multiprocessing.pool import ThreadPool
+import hashlib
 from threading import Lock
 from sandbox_scripts.QualiEnvironmentUtils.ConfigFileManager import ConfigFileManager
 from sandbox_scripts.QualiEnvironmentUtils.ConfigPoolManager import ConfigPoolManager
@@ -10,6 +8,10 @@ from sandbox_scripts.helpers.Networking.base_save_restore import *
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import rsc_run_result_struct
 
+# The dir under the configs root with the hash of the config that was last loaded on each device
+LOADED_CONFIG_HASHES_DIR = 'LoadedConfigHashes'
+
+
 class NetworkingSaveRestore(object):
     def __init__(self, sandbox):
         """
@@ -19,6 +21,10 @@ class NetworkingSaveRestore(object):
         self.sandbox = sandbox
         storage_server_resource = self.sandbox.get_storage_server_resource()
         self.storage_mgr = None
+        self._saved_artifacts = []
+        self._loaded_config_hashes = []
+        self._loaded_config_hashes_lock = Lock()
+        self._loaded_config_hashes_dir_exists = False
         if storage_server_resource is not None:
             self.storage_mgr = StorageManager(sandbox)
             self.config_files_root = self.storage_mgr.get_configs_root()
@@ -44,7 +50,8 @@ class NetworkingSaveRestore(object):
     # e.g. tftp://configs/Base/svl290-gg07-sw1_c3850.cfg
     # ----------------------------------
     def load_config(self, config_stage, config_type, restore_method="Override", config_set_name='', ignore_models=None,
-                    write_to_output=True, remove_temp_files=False, use_Config_file_path_attr=False):
+                    write_to_output=True, remove_temp_files=False, use_Config_file_path_attr=False,
+                    skip_unchanged=False, record_config_hashes=False):
         """
         Load the configuration from config files on the Blueprint's devices
         :param str config_stage:  The stage of the config e.g Gold, Base
@@ -54,6 +61,215 @@ class NetworkingSaveRestore(object):
         the nam of the set selected by the user
         :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
         :param bool write_to_output: Optional. should messages be sent to the command output.
+        :param bool skip_unchanged: Optional. Don't load the config on a device if it is the config that was
+        last loaded on it, see get_load_tasks
+        :param bool record_config_hashes: Optional. Keep the hash of the config loaded on each device,
+        see get_load_tasks
+        """
+        tasks = self.get_load_tasks(config_stage=config_stage, config_type=config_type,
+                                    restore_method=restore_method, config_set_name=config_set_name,
+                                    ignore_models=ignore_models, use_Config_file_path_attr=use_Config_file_path_attr,
+                                    skip_unchanged=skip_unchanged, record_config_hashes=record_config_hashes)
+        if len(tasks) > 0:
+            results = run_save_restore_tasks(tasks)
+            self.write_loaded_config_hashes(results)
+            report_load_results(self.sandbox, results, write_to_output=write_to_output)
+            if remove_temp_files:
+                self._remove_temp_config_files()
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_load_tasks(self, config_stage, config_type, restore_method="Override", config_set_name='',
+                       ignore_models=None, use_Config_file_path_attr=False, skip_unchanged=False,
+                       record_config_hashes=False):
+        """
+        Prepare the loading of the configuration on the Blueprint's devices, without running it
+        :param str config_stage:  The stage of the config e.g Gold, Base
+        :param str config_type:  Possible values - StartUp or Running
+        :param str restore_method: Optional. Restore method. Can be Append or Override
+        :param str config_set_name: Optional. The name of the config set selected by the user
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param bool skip_unchanged: Optional. Don't load the config on a device (and don't health check it after
+                                    the load) if its hash is the hash of the config that was last loaded on it.
+                                    Assumes the config of the devices is changed only by loading it (or that
+                                    every other load and save of the devices records the hashes too).
+                                    Implies record_config_hashes
+        :param bool record_config_hashes: Optional. Keep the hash of the config loaded on each device,
+                                          see write_loaded_config_hashes. Costs a download of each config
+                                          file, and a write of the hashes after the load
+        :return: A (function, args) task for each device, see run_save_restore_tasks
+        :rtype: list[(function, tuple)]
+        """
+        configsetpool = self.sandbox.get_config_set_pool_resource()
+        health_check = get_health_check_settings(configsetpool)
+        self.sandbox.report_info("Health Check Attempts set to %s" % (health_check.attempts))
+        plans = self.get_load_plan(config_stage=config_stage, config_set_name=config_set_name,
+                                   ignore_models=ignore_models)
+        self.sandbox.report_info("Loading image and configuration on the devices. This action may take some time.",
+                                 write_to_output_window=True)
+        if len(plans) == 0:
+            self.sandbox.report_info("No networking resources found to process.")
+            return []
+        for plan in plans:
+            if plan.skip_reason != '':
+                self.sandbox.report_info(plan.resource.name + " is skipped: " + plan.skip_reason)
+
+        # the workers only run the plans, the config files of the devices are created in parallel
+        config_set_pool_data = self._get_config_set_pool_data(configsetpool)
+        plans = [plan for plan in plans if plan.skip_reason == '']
+        loaded_config_hashes = dict()
+        if skip_unchanged:
+            loaded_config_hashes = self._get_loaded_config_hashes([plan.resource.name for plan in plans])
+        self._loaded_config_hashes = []
+        return [(self._run_asynch_load, (plan, config_stage, health_check, config_set_pool_data,
+                                         use_Config_file_path_attr,
+                                         loaded_config_hashes.get(plan.resource.name, '') if skip_unchanged else None,
+                                         skip_unchanged or record_config_hashes))
+                for plan in plans]
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_loaded_config_hash_path(self, resource_name):
+        return self.config_files_root + '/' + LOADED_CONFIG_HASHES_DIR + '/' + resource_name.replace(' ', '_') + \
+               '.sha1'
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_loaded_config_hashes(self, resource_names):
+        """
+        Get the hash of the config that was last loaded on each of the devices, in one batch.
+        The hashes are read straight from the storage, another script may have just written them
+        :param list[str] resource_names:
+        :return: The hashes, the key is the name of the resource. A device with no hash is not in it
+        :rtype: dict[str, str]
+        """
+        results = self.storage_mgr.download_many([self._get_loaded_config_hash_path(resource_name)
+                                                  for resource_name in resource_names], use_cache=False)
+        return dict((resource_name, result.data.strip()) for resource_name, result in zip(resource_names, results)
+                    if result.success)
+
+    # ----------------------------------
+    # ----------------------------------
+    def write_loaded_config_hashes(self, results):
+        """
+        Write the hashes of the configs that were loaded (or saved) by the load (or save) tasks to the storage,
+        in one batch. The hash of a device whose load failed, or whose config has no hash, is deleted,
+        its config is unknown. Nothing is written if the tasks did not record the hashes
+        :param list[rsc_run_result_struct] results:  The results of the load (or save) tasks
+        """
+        if len(self._loaded_config_hashes) == 0:
+            return
+        loaded = set(res.resource_name for res in results if res.run_result)
+        files = [(self._get_loaded_config_hash_path(resource_name), config_hash)
+                 for resource_name, config_hash in self._loaded_config_hashes
+                 if resource_name in loaded and config_hash is not None]
+        failed = [self._get_loaded_config_hash_path(resource_name)
+                  for resource_name, config_hash in self._loaded_config_hashes
+                  if resource_name not in loaded or config_hash is None]
+        self._loaded_config_hashes = []
+        if len(files) > 0:
+            self._create_loaded_config_hashes_dir()
+        for transfer_result in self.storage_mgr.upload_many(files):
+            if not transfer_result.success:
+                self.sandbox.report_info("Failed to write the hash of the loaded config " + transfer_result.path +
+                                         ". " + transfer_result.message)
+        if len(failed) > 0:
+            self.storage_mgr.delete_many(failed)
+
+    # ----------------------------------
+    # ----------------------------------
+    def _create_loaded_config_hashes_dir(self):
+        if self._loaded_config_hashes_dir_exists:
+            return
+        hashes_dir = self.config_files_root + '/' + LOADED_CONFIG_HASHES_DIR
+        try:
+            if not self.storage_mgr.dir_exist(hashes_dir):
+                self.storage_mgr.create_dir(hashes_dir, write_to_output=False)
+            self._loaded_config_hashes_dir_exists = True
+        except QualiError as e:
+            self.sandbox.report_info("Failed to create " + hashes_dir + ". " + str(e))
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_load_plan(self, config_stage, config_set_name='', ignore_models=None, read_firmware_versions=False):
+        """
+        Decide what will be loaded on each of the Blueprint's devices, without touching the devices:
+        the config file (or the templates it will be created from), the firmware image and why a device is skipped.
+        The reservation's resources, the FirmwareData.csv and the listing of the config dir are read once
+        :param str config_stage:  The stage of the config e.g Gold, Base
+        :param str config_set_name: Optional. The name of the config set selected by the user
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param bool read_firmware_versions: Optional. Read the current firmware version of the devices that have
+                                            a firmware image, to tell if their firmware will change.
+                                            It runs a (read only) command on these devices, in parallel
+        :return: A plan for each root networking resource, see format_load_plan
+        :rtype: list[device_load_plan]
+        """
+        root_path = self._get_root_path(config_stage, config_set_name)
+        self.sandbox.report_info("RootPath: " + root_path, write_to_output_window=True)
+        self.storage_mgr.prefetch_repository_dir(root_path)
+        images_path_dict = self._get_images_path_dict(root_path)
+        root_resources = self.sandbox.get_root_networking_resources()
+        """:type : list[ResourceBase]"""
+        app_names = [app.Name for app in self.sandbox.get_Apps_resources()] if len(root_resources) > 0 else []
+        plans = []
+        for resource in root_resources:
+            skip_reason = self._get_skip_reason(resource, ignore_models=ignore_models, app_names=app_names)
+            if skip_reason != '':
+                plans.append(device_load_plan(resource, skip_reason, '', (), False, '', None, None, None))
+                continue
+            if config_stage == 'snapshots':
+                config_path = root_path + resource.name + '_' + resource.model + '.cfg'
+            else:
+                config_path = root_path + resource.alias + '_' + resource.model + '.cfg'
+            config_path = config_path.replace(' ', '_')
+            template_paths = ()
+            # if no concrete file, look for a template file, or a generic template file for the model
+            if not self.storage_mgr.file_exist(config_path):
+                config_path = ''
+                template_paths = ((root_path + resource.alias + '_' + resource.model + '.tm').replace(' ', '_'),
+                                  (root_path + resource.model + '.tm').replace(' ', '_'))
+            image_key = ''
+            if config_stage.lower() != 'snapshots':
+                image_key = self._get_image_key(resource, images_path_dict)
+            image = images_path_dict[image_key] if image_key else None
+            plans.append(device_load_plan(resource, '', config_path, template_paths,
+                                          len(images_path_dict) > 0 and config_stage.lower() != 'snapshots',
+                                          image_key, image, None, None))
+        if read_firmware_versions:
+            plans = self._read_firmware_versions(plans)
+        return plans
+
+    # ----------------------------------
+    # ----------------------------------
+    def _read_firmware_versions(self, plans):
+        """
+        Read the current firmware version of the devices whose plan has a firmware image, in parallel
+        :param list[device_load_plan] plans:
+        :return: The plans, with the current version of these devices
+        :rtype: list[device_load_plan]
+        """
+        def read_version(plan):
+            try:
+                return plan._replace(current_version=plan.resource.get_version(self.sandbox.id))
+            except Exception as ex:
+                self.sandbox.report_info("Failed to read the firmware version of " + plan.resource.name + ". " +
+                                         str(ex))
+                return plan
+
+        read_plans = run_save_restore_tasks([(read_version, (plan,)) for plan in plans
+                                             if plan.skip_reason == '' and plan.image is not None])
+        read_plans = dict((plan.resource.name, plan) for plan in read_plans)
+        return [read_plans.get(plan.resource.name, plan) for plan in plans]
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_root_path(self, config_stage, config_set_name=''):
+        """
+        Get the dir of the config files of a config stage
+        :param str config_stage:  The stage of the config e.g Gold, Base
+        :param str config_set_name: Optional. The name of the config set selected by the user
+        :rtype: str
         """
         root_path = ''
         if config_stage.lower() == 'gold' or config_stage.lower() == 'snapshots':
@@ -62,172 +278,164 @@ class NetworkingSaveRestore(object):
             root_path = self.config_files_root + '/' + config_stage + '/'
         if config_set_name != '':
             root_path = root_path + config_set_name.strip() + '/'
-        configsetpool = self.sandbox.get_config_set_pool_resource()
-        if configsetpool is not None and configsetpool.attribute_exist("Health Check Attempts"):
-            health_check_attempts = configsetpool.get_attribute("Health Check Attempts")
-        else:
-            health_check_attempts = 1
-        self.sandbox.report_info("Health Check Attempts set to %s" % (health_check_attempts))
-        root_path = root_path.replace(' ', '_')
-        self.sandbox.report_info("RootPath: " + root_path, write_to_output_window=True)
-        images_path_dict = self._get_images_path_dict(root_path)
-        self.sandbox.report_info("Loading image and configuration on the devices. This action may take some time.",
-                                 write_to_output_window=True)
-        root_resources = self.sandbox.get_root_networking_resources()
-        """:type : list[ResourceBase]"""
-        if len(root_resources) > 0:
-            pool = ThreadPool(len(root_resources))
-            lock = Lock()
-            async_results = [pool.apply_async(self._run_asynch_load,
-                                              (resource, images_path_dict, root_path, ignore_models, config_stage,
-                                               health_check_attempts, lock,
-                                               use_Config_file_path_attr))
-                             for resource in root_resources]
-
-            pool.close()
-            pool.join()
-            for async_result in async_results:
-                res = async_result.get()
-                """:type : rsc_run_result_struct"""
-                if not res.run_result:
-                    err = "Failed to load configuration on device " + res.resource_name
-                    self.sandbox.report_error(err, write_to_output_window=write_to_output, raise_error=False)
-                    self.sandbox.report_error(res.message, raise_error=False)
-                    self.sandbox.api_session.SetResourceLiveStatus(res.resource_name, 'Error')
-                elif res.message != '':
-                    self.sandbox.report_info(res.resource_name + "\n" + res.message, write_to_output_window=True)
-            if remove_temp_files:
-                self._remove_temp_config_files()
-        else:
-            self.sandbox.report_info("No networking resources found to process.")
+        return root_path.replace(' ', '_')
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_image_key(self, resource, images_path_dict):
+        """
+        Find the entry of the device in FirmwareData.csv
+        :param ResourceBase resource:
+        :param dict images_path_dict:  See _get_images_path_dict
+        :return: The key of the entry, empty if there is none
+        :rtype: str
+        """
+        #  First try with an firmware image key of concrete resource name
+        if resource.name in images_path_dict:
+            return resource.name
+        # Try using alias_model
+        if (resource.alias + '_' + resource.model).replace(' ', '_') in images_path_dict:
+            return (resource.alias + '_' + resource.model).replace(' ', '_')
+        # Try using just model from attribute xxxxxx.Model
+        if resource.model.replace(' ', '_') in images_path_dict:
+            return resource.model.replace(' ', '_')
+        return ''
 
     # ----------------------------------
     # ----------------------------------
     def _remove_temp_config_files(self):
         root_resources = self.sandbox.get_root_resources()
         """:type : list[ResourceBase]"""
+        tmp_config_file_paths = []
         for resource in root_resources:
             if resource.attribute_exist('Config file path'):
                 tmp_config_file_path = resource.get_attribute('Config file path')
                 if tmp_config_file_path != '' and tmp_config_file_path.find('/temp/') > -1:
-                    try:
-                        self.storage_mgr.delete(tmp_config_file_path)
-                        # TODO - clean the attribute
-                    except QualiError as qe:
-                        self.sandbox.report_info("Failed to delete temp config file " + tmp_config_file_path +
-                                                 "Error is: " + str(qe))
+                    tmp_config_file_paths.append(tmp_config_file_path)
+                    # TODO - clean the attribute
+        for delete_result in self.storage_mgr.delete_many(tmp_config_file_paths):
+            if not delete_result.success:
+                self.sandbox.report_info("Failed to delete temp config file " + delete_result.path +
+                                         "Error is: " + delete_result.message)
 
     # ----------------------------------
     # ----------------------------------
-    def _run_asynch_load(self, resource, images_path_dict, root_path, ignore_models, config_stage,
-                         health_check_attempts, lock,
-                         use_Config_file_path_attr):
+    def _run_asynch_load(self, plan, config_stage, health_check, config_set_pool_data,
+                         use_Config_file_path_attr, loaded_config_hash=None, record_config_hash=False):
+        """
+        Load the configuration (and firmware) on a device as decided by its plan
+        :param device_load_plan plan:  See get_load_plan
+        :param health_check_settings health_check:  How to health check the device, see get_health_check_settings
+        :param str loaded_config_hash:  Optional. The hash of the config that was last loaded on the device,
+                                        empty if it is unknown. None to always load the config
+        :param bool record_config_hash:  Optional. Keep the hash of the loaded config, see write_loaded_config_hashes
+        :rtype: rsc_run_result_struct
+        """
+        resource = plan.resource
         message = ""
-        # run_status = True
         saved_artifact_info = None
         additionalinfo = ''
         load_result = rsc_run_result_struct(resource.name)
-        # Check if needs to load the config to the device
-        load_config_to_device = self._is_load_config_to_device(resource, ignore_models=ignore_models)
-        if load_config_to_device:
-
-            self.sandbox.report_info(resource.name + " starting health check", write_to_output_window=True)
-            health_check_result = resource.health_check(self.sandbox.id, health_check_attempts)
-            if health_check_result == "":
-                self.sandbox.report_info(resource.name + " -- Initial Health Check Passed.")
-                try:
-                    config_path = ''
-                    with lock:
-                        config_path = self._get_concrete_config_file_path(root_path, resource, config_stage,
-                                                                          write_to_output=False)
-                    if use_Config_file_path_attr:
-                        resource.set_attribute_value('Config file path', config_path)
-                    # TODO - Snapshots currently only restore configuration. We need to restore firmware as well
-                    if config_stage.lower() == 'snapshots':
-                        if resource.has_command('orchestration_restore'):
-                            dest_name = resource.name + '_' + resource.model + '_artifact.txt'
-                            dest_name = dest_name.replace(' ', '-')
-                            saved_artifact_info = self.storage_mgr.download_artifact_info(config_path, dest_name)
-                            resource.orchestration_restore(self.sandbox.id, config_path, saved_artifact_info)
-                        else:
-                            resource.load_network_config(self.sandbox.id, config_path, 'Running', 'Override')
+
+        self.sandbox.report_info(resource.name + " starting health check", write_to_output_window=True)
+        health_check_result = resource.health_check(self.sandbox.id, health_check.attempts,
+                                                    retry_policy=health_check.retry_policy,
+                                                    poll_live_status=health_check.poll_live_status)
+        if health_check_result == "":
+            self.sandbox.report_info(resource.name + " -- Initial Health Check Passed.")
+            try:
+                config_path = plan.config_path
+                config_data = None
+                if config_path == '':
+                    config_path, config_data = self._create_concrete_config_file(plan, config_set_pool_data)
+                if use_Config_file_path_attr:
+                    resource.set_attribute_value('Config file path', config_path)
+                if record_config_hash:
+                    # an orchestration restore restores more than the config file, what it loads has no hash
+                    config_hash = None
+                    if config_stage.lower() != 'snapshots' or not resource.has_command('orchestration_restore'):
+                        config_hash = self._get_config_hash(config_path, config_data)
+                        if loaded_config_hash is not None and \
+                                self._is_config_unchanged(plan, config_hash, loaded_config_hash):
+                            load_result.message = resource.name + ": the config from " + config_path + \
+                                                  " was already loaded, it is not loaded again"
+                            return load_result
+                    # written with the hashes of the other devices, see write_loaded_config_hashes
+                    with self._loaded_config_hashes_lock:
+                        self._loaded_config_hashes.append((resource.name, config_hash))
+                # TODO - Snapshots currently only restore configuration. We need to restore firmware as well
+                if config_stage.lower() == 'snapshots':
+                    if resource.has_command('orchestration_restore'):
+                        dest_name = resource.name + '_' + resource.model + '_artifact.txt'
+                        dest_name = dest_name.replace(' ', '-')
+                        saved_artifact_info = self.storage_mgr.download_artifact_info(config_path, dest_name)
+                        resource.orchestration_restore(self.sandbox.id, config_path, saved_artifact_info)
                     else:
-                        if len(images_path_dict) > 0:
-                            # check what the device FW version is currently.
-                            version = resource.get_version(self.sandbox.id)
-                            self.sandbox.report_info(resource.name + " current version: " + version,
-                                                     write_to_output_window=True)
-                            # First try with an firmware image key of concrete resource name!!
-                            dict_img_version = ''
-                            image_key = ''
-
-                            if resource.name in images_path_dict:
-                                #  Try using concrete resource name to find entry
-                                image_key = resource.name
-                            elif (resource.alias + '_' + resource.model).replace(' ', '_') in images_path_dict:
-                                # Try using alias_model
-                                image_key = (resource.alias + '_' + resource.model).replace(' ', '_')
-                            elif resource.model.replace(' ', '_') in images_path_dict:
-                                # Try using just model from attribute xxxxxx.Model
-                                image_key = resource.model.replace(' ', '_')
-
-                            if image_key:
-                                dict_img_version = images_path_dict[image_key].version
-                            else:
-                                # Getting here means no firmware specified in FirmwareData.csv
-                                message += "\n" + resource.name + ": NO firmware version specified in Base FirmwareData.csv"
-
-                            # same image version - Only load config (running override)
-                            message += resource.name + ": loading configuration from " + config_path
-                            if dict_img_version.lower() == version.lower():
-                                resource.load_network_config(self.sandbox.id, config_path=config_path,
-                                                             config_type='Running',
-                                                             restore_method='Override')
-                            # Different image - Load config to the RUNNING ALSO and load the image
-                            else:
-                                resource.load_network_config(self.sandbox.id, config_path,
-                                                             config_type='Running',
-                                                             restore_method='Override')
-
-                                if dict_img_version != '':
-                                    resource_image_path = images_path_dict[image_key].path
-                                    message += "\n" + resource.name + ": changing firmware from: " + version + \
-                                               " to: " + dict_img_version + " at \n    " + resource_image_path
-                                    additionalinfo = " (firmware) "
-                                    self.sandbox.report_info(resource.name + " changing firmware from: " + version +
-                                                             " to: " + dict_img_version + " at \n    " +
-                                                             resource_image_path,
-                                                             write_to_output_window=True)
-                                    resource.load_firmware(self.sandbox.id, resource_image_path)
+                        resource.load_network_config(self.sandbox.id, config_path, 'Running', 'Override')
+                else:
+                    if plan.check_firmware:
+                        # check what the device FW version is currently.
+                        version = resource.get_version(self.sandbox.id)
+                        self.sandbox.report_info(resource.name + " current version: " + version,
+                                                 write_to_output_window=True)
+                        dict_img_version = ''
+                        if plan.image is not None:
+                            dict_img_version = plan.image.version
                         else:
-                            message += "\n" + resource.name + ": loading config from:" + config_path
-                            resource.load_network_config(self.sandbox.id, config_path, 'Running', 'Override')
-
-                    health_check_result = resource.health_check(self.sandbox.id, health_check_attempts=1)
-                    if health_check_result != '':
-                        raise QualiError(self.sandbox.id, resource.name +
-                                         " did not pass health check after loading configuration")
+                            # Getting here means no firmware specified in FirmwareData.csv
+                            message += "\n" + resource.name + ": NO firmware version specified in Base FirmwareData.csv"
+
+                        # same image version - Only load config (running override)
+                        message += resource.name + ": loading configuration from " + config_path
+                        if dict_img_version.lower() == version.lower():
+                            resource.load_network_config(self.sandbox.id, config_path=config_path,
+                                                         config_type='Running',
+                                                         restore_method='Override')
+                        # Different image - Load config to the RUNNING ALSO and load the image
+                        else:
+                            resource.load_network_config(self.sandbox.id, config_path,
+                                                         config_type='Running',
+                                                         restore_method='Override')
+
+                            if dict_img_version != '':
+                                resource_image_path = plan.image.path
+                                message += "\n" + resource.name + ": changing firmware from: " + version + \
+                                           " to: " + dict_img_version + " at \n    " + resource_image_path
+                                additionalinfo = " (firmware) "
+                                self.sandbox.report_info(resource.name + " changing firmware from: " + version +
+                                                         " to: " + dict_img_version + " at \n    " +
+                                                         resource_image_path,
+                                                         write_to_output_window=True)
+                                resource.load_firmware(self.sandbox.id, resource_image_path)
                     else:
-                        self.sandbox.report_info(resource.name + " -- final Health Check Passed.")
-
-                except QualiError as qe:
-                    load_result.run_result = False
-                    err = "\nFailed to load configuration " + additionalinfo + " for device " + resource.name + ". " + str(
-                        qe)
-                    message += err
-                except Exception as ex:
-                    load_result.run_result = False
-                    err = "\nFailed to load configuration " + additionalinfo + " for device " + resource.name + \
-                          ". Unexpected error: " + str(ex)
-                    message += err
-            else:
-                self.sandbox.report_error(resource.name + " health check failed.",
-                                          write_to_output_window=True,
-                                          send_email=True)
+                        message += "\n" + resource.name + ": loading config from:" + config_path
+                        resource.load_network_config(self.sandbox.id, config_path, 'Running', 'Override')
+
+                health_check_result = resource.health_check(self.sandbox.id, health_check_attempts=1)
+                if health_check_result != '':
+                    raise QualiError(self.sandbox.id, resource.name +
+                                     " did not pass health check after loading configuration")
+                else:
+                    self.sandbox.report_info(resource.name + " -- final Health Check Passed.")
+
+            except QualiError as qe:
+                load_result.run_result = False
+                err = "\nFailed to load configuration " + additionalinfo + " for device " + resource.name + ". " + str(
+                    qe)
+                message += err
+            except Exception as ex:
                 load_result.run_result = False
-                err = resource.name + " did not pass health check. Configuration will not be " \
-                                      "loaded to the device.\nHealth check error is: " + health_check_result
+                err = "\nFailed to load configuration " + additionalinfo + " for device " + resource.name + \
+                      ". Unexpected error: " + str(ex)
                 message += err
+        else:
+            self.sandbox.report_error(resource.name + " health check failed.",
+                                      write_to_output_window=True,
+                                      send_email=True)
+            load_result.run_result = False
+            err = resource.name + " did not pass health check. Configuration will not be " \
+                                  "loaded to the device.\nHealth check error is: " + health_check_result
+            message += err
 
         load_result.message = message
         return load_result
@@ -243,110 +451,142 @@ class NetworkingSaveRestore(object):
         :rtype: dict
         """
         images_path_dict = dict()
-        tmp_firmware_file = tempfile.NamedTemporaryFile(delete=False)
 
         # Check if there is a file pointing to firmware images files in the config directory
         try:
             firmware_data_file = root_path + 'FirmwareData.csv'
-            self.storage_mgr.download(firmware_data_file, tmp_firmware_file.name)
             # Create a dictionary for each resource its image file location
-            with open(tmp_firmware_file.name) as csvfile:
+            with self.storage_mgr.open_reader(firmware_data_file) as csvfile:
                 reader = csv.DictReader(csvfile)
                 for row in reader:
                     image_data = image_struct(row['Path'], row['Version'])
                     images_path_dict[row['Device']] = image_data
         except:
-            if os.path.isfile(tmp_firmware_file.name):
-                tmp_firmware_file.close()
+            pass
         return images_path_dict
 
     # ----------------------------------
     # ----------------------------------
-    def _get_concrete_config_file_path(self, root_path, resource, config_stage, write_to_output=False):
+    def _get_config_set_pool_data(self, config_set_pool_resource=None):
         """
-        Get the path to a concrete config file. If there is only a template for the config file,
-        create a temp concrete config file, and send its path
-        :param str root_path:  The root dir on the tftp where the config files reside
-        :param ResourceBase resource:  The resource the file will be created for
-        :rtype: str
+        Get the data of the config set pool, if there is a pool resource
+        :param ResourceBase config_set_pool_resource:  Optional. The pool resource, if it was already read
+        :rtype: dict
         """
-
-        config_file_mgr = ConfigFileManager()
-        # TODO - set the pool dictionary only once during the init of the class
         config_set_pool_data = dict()
-        # If there is a pool resource, get the pool data
-        config_set_pool_resource = self.sandbox.get_config_set_pool_resource()
+        if config_set_pool_resource is None:
+            config_set_pool_resource = self.sandbox.get_config_set_pool_resource()
         if config_set_pool_resource is not None:
             config_set_pool_manager = ConfigPoolManager(sandbox=self.sandbox, pool_resource=config_set_pool_resource)
             config_set_pool_data = config_set_pool_manager.pool_data
-        if config_stage == 'snapshots':
-            config_path = root_path + resource.name + '_' + resource.model + '.cfg'
-        else:
-            config_path = root_path + resource.alias + '_' + resource.model + '.cfg'
-        config_path = config_path.replace(' ', '_')
-        # Look for a template config file
-        tmp_template_config_file = tempfile.NamedTemporaryFile(delete=False)
-        tftp_template_config_path = root_path + resource.alias + '_' + resource.model + '.tm'
-        tftp_template_config_path = tftp_template_config_path.replace(' ', '_')
-        # try:
-        # look for a concrete config file
+        return config_set_pool_data
+
+    # ----------------------------------
+    # ----------------------------------
+    def _create_concrete_config_file(self, plan, config_set_pool_data):
+        """
+        Create a temp concrete config file for a device from the first template of its plan, and send its path.
+        Runs for all the devices in parallel - it must not change shared state
+        :param device_load_plan plan:  The plan of the device, see get_load_plan
+        :param dict config_set_pool_data:  The data of the config set pool, see _get_config_set_pool_data
+        :return: The path to the file and its content
+        :rtype: (str, str)
+        """
+        resource = plan.resource
+        config_file_mgr = ConfigFileManager()
+        tftp_template_config_path, tmp_template_config_file_data = self.storage_mgr.download_first(
+            plan.template_paths)
+
+        concrete_config_data = ''
         try:
-            self.storage_mgr.download(config_path, tmp_template_config_file.name)
-            tmp_template_config_file.close()
-            os.unlink(tmp_template_config_file.name)
-        # if no concrete file, delete the look for a template file
-        except:
-            try:
-                self.storage_mgr.download(tftp_template_config_path, tmp_template_config_file.name)
-            except:
-                # look for a generic config file for the model
-                tftp_template_config_path = root_path + resource.model + '.tm'
-                tftp_template_config_path = tftp_template_config_path.replace(' ', '_')
-                self.storage_mgr.download(tftp_template_config_path, tmp_template_config_file.name)
-            with open(tmp_template_config_file.name, 'r') as content_file:
-                tmp_template_config_file_data = content_file.read()
-
-            concrete_config_data = ''
-            try:
-                concrete_config_data = config_file_mgr.create_concrete_config_from_template(
-                    tmp_template_config_file_data,
-                    config_set_pool_data,
-                    self.sandbox, resource)
-            except QualiError as qe:
-                self.sandbox.report_error(error_message='Could not create a concrete config file '
-                                                        'for resource {0}'.format(resource.name),
-                                          log_message=qe.message,
-                                          write_to_output_window=True)
-
-            tmp_concrete_config_file = tempfile.NamedTemporaryFile(delete=False)
-            tf = file(tmp_concrete_config_file.name, 'wb+')
-            tf.write(concrete_config_data)
-            tf.flush()
-            tf.close()
-            tmp_template_config_file.close()
-            os.unlink(tmp_template_config_file.name)
-            short_Reservation_id = self.sandbox.id[len(self.sandbox.id) - 4:len(self.sandbox.id)]
-            concrete_file_path = root_path + 'temp/' + short_Reservation_id + '_' + resource.alias + \
-                                 '_' + resource.model + '.cfg'
-            concrete_file_path = concrete_file_path.replace(' ', '_')
-            # TODO - clean the temp dir on the tftp server
-            self.storage_mgr.upload(concrete_file_path, tmp_concrete_config_file.name)
-            tmp_concrete_config_file.close()
-            os.unlink(tmp_concrete_config_file.name)
-            # Set the path to the new concrete file
-            config_path = concrete_file_path
-
-        return config_path
-
-    # ----------------------------------
-    # ----------------------------------
-    def save_config(self, snapshot_name, config_type, ignore_models=None, write_to_output=True):
+            concrete_config_data = config_file_mgr.create_concrete_config_from_template(
+                tmp_template_config_file_data,
+                config_set_pool_data,
+                self.sandbox, resource)
+        except QualiError as qe:
+            self.sandbox.report_error(error_message='Could not create a concrete config file '
+                                                    'for resource {0}'.format(resource.name),
+                                      log_message=qe.message,
+                                      write_to_output_window=True)
+
+        root_path = tftp_template_config_path[:tftp_template_config_path.rfind('/') + 1]
+        short_Reservation_id = self.sandbox.id[len(self.sandbox.id) - 4:len(self.sandbox.id)]
+        concrete_file_path = root_path + 'temp/' + short_Reservation_id + '_' + resource.alias + \
+                             '_' + resource.model + '.cfg'
+        concrete_file_path = concrete_file_path.replace(' ', '_')
+        # TODO - clean the temp dir on the tftp server
+        self.storage_mgr.upload_bytes(concrete_file_path, concrete_config_data)
+        return concrete_file_path, concrete_config_data
+
+    # ----------------------------------
+    # ----------------------------------
+    def _is_config_unchanged(self, plan, config_hash, loaded_config_hash):
+        """
+        Check if the device already runs the config of its plan (and its firmware), so nothing needs to be loaded
+        :param device_load_plan plan:  See get_load_plan
+        :param str config_hash:  The hash of the config of the plan, None if it is unknown
+        :param str loaded_config_hash:  The hash of the config that was last loaded on the device
+        :rtype: bool
+        """
+        if config_hash is None or config_hash != loaded_config_hash:
+            return False
+        if plan.image is not None:
+            return plan.resource.get_version(self.sandbox.id).lower() == plan.image.version.lower()
+        return True
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_config_hash(self, config_path, config_data=None):
+        """
+        :param str config_path:  The path of the config file on the storage
+        :param str config_data:  Optional. The content of the config file, if it was already read
+        :return: The hash of the config file, None if it could not be read
+        :rtype: str
+        """
+        try:
+            if config_data is None:
+                config_data = self.storage_mgr.download_bytes(config_path)
+            return hashlib.sha1(config_data).hexdigest()
+        except Exception as ex:
+            self.sandbox.report_info("Failed to read " + config_path + " to hash it. " + str(ex))
+            return None
+
+    # ----------------------------------
+    # ----------------------------------
+    def save_config(self, snapshot_name, config_type, ignore_models=None, write_to_output=True,
+                    record_config_hashes=False):
         """
         Load the configuration from the devices to the tftp
         :param str snapshot_name:  The name of the snapshot
         :param str config_type:  StartUp or Running
         :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
         :param bool write_to_output: Optional. should messages be sent to the command output.
+        :param bool record_config_hashes: Optional. Keep the hash of the config saved from each device,
+        see get_save_tasks
+        """
+        tasks = self.get_save_tasks(snapshot_name=snapshot_name, config_type=config_type,
+                                    ignore_models=ignore_models, write_to_output=write_to_output,
+                                    record_config_hashes=record_config_hashes)
+        results = run_save_restore_tasks(tasks)
+        self.write_saved_artifacts(results)
+        self.write_loaded_config_hashes(results)
+        report_save_results(self.sandbox, results, write_to_output=write_to_output)
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_save_tasks(self, snapshot_name, config_type, ignore_models=None, write_to_output=True,
+                       record_config_hashes=False):
+        """
+        Create the snapshot directory and prepare the saving of the devices configuration, without running it
+        :param str snapshot_name:  The name of the snapshot
+        :param str config_type:  StartUp or Running
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param bool write_to_output: Optional. should messages be sent to the command output.
+        :param bool record_config_hashes: Optional. Keep the hash of the saved config as the hash of the config
+                                          last loaded on each device, see write_loaded_config_hashes.
+                                          Costs a download of each saved config file
+        :return: A (function, args) task for each device, see run_save_restore_tasks
+        :rtype: list[(function, tuple)]
         """
 
         env_dir = ""
@@ -360,34 +600,62 @@ class NetworkingSaveRestore(object):
 
         root_resources = self.sandbox.get_root_networking_resources()
         """:type : list[ResourceBase]"""
-        pool = ThreadPool(len(root_resources))
         lock = Lock()
-        async_results = [pool.apply_async(self._run_asynch_save,
-                                          (resource, env_dir, config_type, lock, ignore_models))
-                         for resource in root_resources]
+        self._saved_artifacts = []
+        self._loaded_config_hashes = []
+        return [(self._run_asynch_save, (resource, env_dir, config_type, lock, ignore_models, record_config_hashes))
+                for resource in root_resources]
 
-        pool.close()
-        pool.join()
-        for async_result in async_results:
-            res = async_result.get()
-            """:type : rsc_run_result_struct"""
-            if not res.run_result:
-                err = "Failed to save configuration on device " + res.resource_name
-                self.sandbox.report_error(err, write_to_output_window=write_to_output, raise_error=False)
-                self.sandbox.report_error(res.message, raise_error=False, send_email=True)
+    # ----------------------------------
+    # ----------------------------------
+    def get_save_plan(self, snapshot_name, ignore_models=None):
+        """
+        Decide where the configuration of each of the Blueprint's devices will be saved, without touching the devices
+        or the storage
+        :param str snapshot_name:  The name of the snapshot
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :rtype: list[device_save_plan]
+        """
+        snapshot_dir = self.config_files_root + '/Snapshots/' + snapshot_name.strip()
+        root_resources = self.sandbox.get_root_networking_resources()
+        """:type : list[ResourceBase]"""
+        app_names = [app.Name for app in self.sandbox.get_Apps_resources()] if len(root_resources) > 0 else []
+        plans = []
+        for resource in root_resources:
+            skip_reason = self._get_skip_reason(resource, ignore_models=ignore_models, app_names=app_names)
+            target_path = ''
+            if skip_reason == '':
+                if resource.has_command('orchestration_save'):
+                    target_path = snapshot_dir + '/' + (resource.name + '_' + resource.model +
+                                                        '_artifact.txt').replace(' ', '-')
+                else:
+                    target_path = snapshot_dir + '/' + resource.name + '_' + resource.model + '.cfg'
+            plans.append(device_save_plan(resource, skip_reason, target_path))
+        return plans
 
-            elif res.message != '':
-                self.sandbox.report_info(res.resource_name + "\n" + res.message)
+    # ----------------------------------
+    # ----------------------------------
+    def write_saved_artifacts(self, results):
+        """
+        Write the artifact info of the devices that were saved by the save tasks to the storage, in one batch
+        :param list[rsc_run_result_struct] results:  The results of the save tasks
+        """
+        write_saved_artifacts(self.storage_mgr, self._saved_artifacts, results)
+        self._saved_artifacts = []
 
     # ----------------------------------
     # ----------------------------------
-    def _run_asynch_save(self, resource, snapshot_dir, config_type, lock, ignore_models=None):
+    def _run_asynch_save(self, resource, snapshot_dir, config_type, lock, ignore_models=None,
+                         record_config_hash=False):
         message = ""
         save_result = rsc_run_result_struct(resource.name)
 
         with lock:
             save_config_for_device = self._is_load_config_to_device(resource, ignore_models=ignore_models)
         if save_config_for_device:
+            # the device runs the saved config, its hash is kept as the hash of the last loaded config.
+            # An orchestration save saves more than the config file, what it saves has no hash
+            config_hash = None
             try:
                 message += '\nSaving configuration for device: ' + resource.name
                 if resource.has_command('orchestration_save'):
@@ -396,9 +664,10 @@ class NetworkingSaveRestore(object):
                     if saved_artifact_info != "":
                         dest_name = resource.name + '_' + resource.model + '_artifact.txt'
                         dest_name = dest_name.replace(' ', '-')
+                        # written with the artifacts of the other devices, see write_saved_artifacts
                         with lock:
-                            self.storage_mgr.save_artifact_info(saved_artifact_info, config_path, dest_name,
-                                                                write_to_output=True)
+                            self._saved_artifacts.append((resource.name, config_path + '/' + dest_name,
+                                                          saved_artifact_info))
                 else:
                     file_name = resource.save_network_config(self.sandbox.id, snapshot_dir, config_type)
                     # rename file on the storage server
@@ -406,6 +675,8 @@ class NetworkingSaveRestore(object):
                     to_name = resource.name + '_' + resource.model + '.cfg'
                     with lock:
                         self.storage_mgr.rename_file(file_path, to_name)
+                    if record_config_hash:
+                        config_hash = self._get_config_hash(snapshot_dir + '/' + to_name)
 
             except QualiError as qe:
                 save_result.run_result = False
@@ -416,6 +687,10 @@ class NetworkingSaveRestore(object):
                 err = "\nFailed to save configuration for device " + resource.name + \
                       ". Unexpected error: " + str(ex)
                 message += err
+            if record_config_hash:
+                # written with the hashes of the other devices, see write_loaded_config_hashes
+                with self._loaded_config_hashes_lock:
+                    self._loaded_config_hashes.append((resource.name, config_hash))
 
         save_result.message = message
         return save_result
@@ -436,23 +711,36 @@ class NetworkingSaveRestore(object):
     # in order to load configuration on it
     # ----------------------------------
     def _is_load_config_to_device(self, resource, ignore_models=None):
+        return self._get_skip_reason(resource, ignore_models=ignore_models) == ''
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_skip_reason(self, resource, ignore_models=None, app_names=None):
+        """
+        Get why configuration should not be loaded to the given device
+        :param ResourceBase resource:
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param list[str] app_names: Optional. The names of the apps in the sandbox, if they were already read
+        :return: The reason, empty if configuration should be loaded to the device
+        :rtype: str
+        """
         # check if the device is marked for not loading config during
         if resource.attribute_exist("Disable Load Config"):
             disable_load_config = resource.get_attribute("Disable Load Config")
             if disable_load_config == "True":
-                return False
+                return 'Disable Load Config is set'
 
         if ignore_models:
             for ignore_model in ignore_models:
                 if resource.model.lower() == ignore_model.lower():
-                    return False
+                    return 'model ' + resource.model + ' is ignored'
 
-        apps = self.sandbox.get_Apps_resources()
-        for app in apps:
-            if app.Name == resource.name:
-                return False
+        if app_names is None:
+            app_names = [app.Name for app in self.sandbox.get_Apps_resources()]
+        if resource.name in app_names:
+            return 'it is an app'
 
-        return True
+        return ''
 
     # ----------------------------------
     # Are there devices in the reservation that need to be restored
@@ -1,5 +1,9 @@
 
+import json
+from collections import namedtuple
 from sandbox_scripts.QualiEnvironmentUtils.StorageManager import StorageManager
+from sandbox_scripts.QualiEnvironmentUtils.RetryPolicy import RetryPolicy
+from multiprocessing.pool import ThreadPool
 
 
 class BaseSaveRestore(object):
@@ -45,24 +49,37 @@ class BaseSaveRestore(object):
     # in order to load configuration on it
     # ----------------------------------
     def _is_load_config_to_device(self, resource, ignore_models=None):
+        return self._get_skip_reason(resource, ignore_models=ignore_models) == ''
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_skip_reason(self, resource, ignore_models=None, app_names=None):
+        """
+        Get why configuration should not be loaded to the given device
+        :param ResourceBase resource:
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param list[str] app_names: Optional. The names of the apps in the sandbox, if they were already read
+        :return: The reason, empty if configuration should be loaded to the device
+        :rtype: str
+        """
         # check if the device is marked for not loading config during
 
         if resource.attribute_exist("Disable Load Config"):
             disable_load_config = resource.get_attribute("Disable Load Config")
             if disable_load_config:
-                return False
+                return 'Disable Load Config is set'
 
         if ignore_models:
             for ignore_model in ignore_models:
                 if resource.model.lower() == ignore_model.lower():
-                    return False
+                    return 'model ' + resource.model + ' is ignored'
 
-        apps = self.sandbox.get_Apps_resources()
-        for app in apps:
-            if app.Name == resource.name:
-                return False
+        if app_names is None:
+            app_names = [app.Name for app in self.sandbox.get_Apps_resources()]
+        if resource.name in app_names:
+            return 'it is an app'
 
-        return True
+        return ''
 
 
 class image_struct:
@@ -71,3 +88,218 @@ class image_struct:
         self.version = version
 
 
+# The load of a device, decided before any device is touched, see NetworkingSaveRestore.get_load_plan
+# config_path is empty when the config file will be created from the first existing of template_paths,
+# skip_reason is empty when the configuration will be loaded on the device,
+# config_size is None until the config file was downloaded, see prewarm_load_plans
+# and current_version is None until the firmware version of the device was read
+device_load_plan = namedtuple('device_load_plan', ['resource', 'skip_reason', 'config_path', 'template_paths',
+                                                   'check_firmware', 'image_key', 'image', 'config_size',
+                                                   'current_version'])
+
+# How to health check the devices, see get_health_check_settings
+# retry_policy is None for the default policy of the resources
+health_check_settings = namedtuple('health_check_settings', ['attempts', 'retry_policy', 'poll_live_status'])
+
+# The save of a device, decided before any device is touched, see NetworkingSaveRestore.get_save_plan
+device_save_plan = namedtuple('device_save_plan', ['resource', 'skip_reason', 'target_path'])
+
+
+# ----------------------------------
+# ----------------------------------
+def get_health_check_settings(config_set_pool=None):
+    """
+    Get how to health check the devices from the attributes of the config set pool: Health Check Attempts,
+    Health Check Initial Delay, Health Check Max Delay and Health Check Deadline (seconds, 0 for no deadline)
+    and Health Check Poll Live Status. The missing attributes keep their defaults
+    :param ResourceBase config_set_pool: Optional. The config set pool resource, None if there is none
+    :rtype: health_check_settings
+    """
+    def get_value(attribute_name):
+        if config_set_pool is not None and config_set_pool.attribute_exist(attribute_name):
+            value = config_set_pool.get_attribute(attribute_name)
+            if value is not None and str(value) != '':
+                return value
+        return None
+
+    attempts = get_value("Health Check Attempts")
+    if attempts is None:
+        attempts = 1
+    retry_policy = None
+    initial_delay = get_value("Health Check Initial Delay")
+    max_delay = get_value("Health Check Max Delay")
+    deadline = get_value("Health Check Deadline")
+    if initial_delay is not None or max_delay is not None or deadline is not None:
+        retry_policy = RetryPolicy()
+        if initial_delay is not None:
+            retry_policy.initial_delay = float(initial_delay)
+        if max_delay is not None:
+            retry_policy.max_delay = float(max_delay)
+        if deadline is not None and float(deadline) > 0:
+            retry_policy.deadline = float(deadline)
+    poll_live_status = str(get_value("Health Check Poll Live Status")).lower() == 'true'
+    return health_check_settings(attempts, retry_policy, poll_live_status)
+
+
+# ----------------------------------
+# Run save/restore tasks, each is a (function, args) tuple whose function returns a rsc_run_result_struct
+# (or None if there was nothing to do for the device)
+# ----------------------------------
+def run_save_restore_tasks(tasks, max_concurrency=None):
+    """
+    :param list[(function, tuple)] tasks:
+    :param int max_concurrency:  The max number of tasks that run in parallel. None to run all of them in parallel
+    :rtype: list[rsc_run_result_struct]
+    """
+    if len(tasks) == 0:
+        return []
+    pool_size = len(tasks)
+    if max_concurrency:
+        pool_size = min(pool_size, max_concurrency)
+    pool = ThreadPool(pool_size)
+    async_results = [pool.apply_async(func, args) for func, args in tasks]
+    pool.close()
+    pool.join()
+    results = []
+    for async_result in async_results:
+        res = async_result.get()
+        if res is not None:
+            results.append(res)
+    return results
+
+
+# ----------------------------------
+# ----------------------------------
+def report_load_results(sandbox, results, write_to_output=True):
+    """
+    Report the results of loading configuration on the devices, and mark the failed devices live status as Error
+    :param SandboxBase sandbox:
+    :param list[rsc_run_result_struct] results:
+    :param bool write_to_output: Optional. should messages be sent to the command output.
+    """
+    for res in results:
+        if not res.run_result:
+            err = "Failed to load configuration on device " + res.resource_name
+            sandbox.report_error(err, write_to_output_window=write_to_output, raise_error=False)
+            sandbox.report_error(res.message, raise_error=False)
+            sandbox.api_session.SetResourceLiveStatus(res.resource_name, 'Error')
+        elif res.message != '':
+            sandbox.report_info(res.resource_name + "\n" + res.message, write_to_output_window=True)
+
+
+# ----------------------------------
+# ----------------------------------
+def prewarm_load_plans(storage_mgr, plans):
+    """
+    Download the config files of the plans in one batch, so they are in the cache of the storage
+    when the devices are loaded, and get their sizes
+    :param StorageManager storage_mgr:
+    :param list[device_load_plan] plans:
+    :return: The plans, with the size of the config files that were found
+    :rtype: list[device_load_plan]
+    """
+    # all the templates of a device are tried, the first one that exists is used
+    paths = []
+    for plan in plans:
+        if plan.skip_reason == '':
+            paths += [plan.config_path] if plan.config_path != '' else list(plan.template_paths)
+    sizes = dict()
+    for result in storage_mgr.download_many(sorted(set(paths))):
+        if result.success:
+            sizes[result.path] = result.size
+    prewarmed_plans = []
+    for plan in plans:
+        paths = [plan.config_path] if plan.config_path != '' else list(plan.template_paths)
+        found = [sizes[path] for path in paths if path in sizes]
+        prewarmed_plans.append(plan._replace(config_size=found[0]) if len(found) > 0 else plan)
+    return prewarmed_plans
+
+
+# ----------------------------------
+# ----------------------------------
+def format_load_plan(plans):
+    """
+    A readable dry run of the load of the devices
+    :param list[device_load_plan] plans:
+    :rtype: str
+    """
+    lines = []
+    for plan in plans:
+        if plan.skip_reason != '':
+            lines.append(plan.resource.name + ": skipped, " + plan.skip_reason)
+            continue
+        if plan.config_path != '':
+            line = plan.resource.name + ": load " + plan.config_path
+        else:
+            line = plan.resource.name + ": load a config created from " + ' or '.join(plan.template_paths)
+        if plan.config_size is not None:
+            line += " (" + str(plan.config_size) + " bytes)"
+        if plan.image is not None:
+            line += ", firmware " + plan.image.version + " from " + plan.image.path
+            if plan.current_version is None:
+                line += " (current version unknown)"
+            elif plan.current_version.lower() == plan.image.version.lower():
+                line += " (current " + plan.current_version + ", already running)"
+            else:
+                line += " (current " + plan.current_version + ", will be loaded)"
+        elif plan.check_firmware:
+            line += ", NO firmware version specified"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# ----------------------------------
+# ----------------------------------
+def format_save_plan(plans):
+    """
+    A readable dry run of the save of the devices
+    :param list[device_save_plan] plans:
+    :rtype: str
+    """
+    lines = []
+    for plan in plans:
+        if plan.skip_reason != '':
+            lines.append(plan.resource.name + ": skipped, " + plan.skip_reason)
+        else:
+            lines.append(plan.resource.name + ": save to " + plan.target_path)
+    return '\n'.join(lines)
+
+
+# ----------------------------------
+# ----------------------------------
+def report_save_results(sandbox, results, write_to_output=True):
+    """
+    Report the results of saving configuration of the devices
+    :param SandboxBase sandbox:
+    :param list[rsc_run_result_struct] results:
+    :param bool write_to_output: Optional. should messages be sent to the command output.
+    """
+    for res in results:
+        if not res.run_result:
+            err = "Failed to save configuration on device " + res.resource_name
+            sandbox.report_error(err, write_to_output_window=write_to_output, raise_error=False)
+            sandbox.report_error(res.message, raise_error=False, send_email=True)
+        elif res.message != '':
+            sandbox.report_info(res.resource_name + "\n" + res.message)
+
+
+# ----------------------------------
+# ----------------------------------
+def write_saved_artifacts(storage_mgr, saved_artifacts, results):
+    """
+    Write the artifact info files of the saved devices to the storage in parallel,
+    and mark the devices whose artifact info could not be written as failed
+    :param StorageManager storage_mgr:
+    :param list[(str, str, object)] saved_artifacts:  (resource name, artifact info file path, artifact info)
+    :param list[rsc_run_result_struct] results:  The results of the save tasks
+    """
+    if len(saved_artifacts) == 0:
+        return
+    transfer_results = storage_mgr.upload_many([(file_path, json.dumps(saved_artifact_info))
+                                                for resource_name, file_path, saved_artifact_info in saved_artifacts])
+    results_by_name = dict((res.resource_name, res) for res in results)
+    for (resource_name, file_path, saved_artifact_info), transfer_result in zip(saved_artifacts, transfer_results):
+        if not transfer_result.success and resource_name in results_by_name:
+            res = results_by_name[resource_name]
+            res.run_result = False
+            res.message += "\nFailed to save the artifact info of " + resource_name + ". " + transfer_result.message
@@ -1,37 +1,138 @@
 from sandbox_scripts.helpers.Networking.vm_save_restore import *
 from sandbox_scripts.helpers.Networking.NetworkingSaveNRestore import *
 
+DEFAULT_MAX_CONCURRENT_DEVICES = 32
+
+
 class SaveRestoreManager(object):
     # ----------------------------------
     # ----------------------------------
-    def __init__(self, sandbox):
+    def __init__(self, sandbox, max_concurrent_devices=DEFAULT_MAX_CONCURRENT_DEVICES):
+        """
+        :param SandboxBase sandbox:  The sandbox save & restore will be done in
+        :param int max_concurrent_devices:  The max number of devices and VMs that are saved/restored in parallel
+        """
+        self.sandbox = sandbox
         self.networking_save_restore = NetworkingSaveRestore(sandbox)
         self.vm_save_restore = VMsSaveRestore(sandbox)
+        self.max_concurrent_devices = max_concurrent_devices
 
     # ----------------------------------
     # ----------------------------------
     def load_config(self, config_stage, config_type, restore_method="Override", config_set_name='', ignore_models=None,
-                    write_to_output=True, remove_temp_files = False, in_teardown_mode = False,use_Config_file_path_attr = False):
-        #TODO:parallel both vms and resources
-        self.networking_save_restore.load_config(config_stage=config_stage,
-                                                 config_type=config_type,
-                                                 restore_method=restore_method,
-                                                 config_set_name=config_set_name,
-                                                 ignore_models=ignore_models,
-                                                 write_to_output=write_to_output,
-                                                 remove_temp_files=remove_temp_files,
-                                                 use_Config_file_path_attr=use_Config_file_path_attr)
+                    write_to_output=True, remove_temp_files = False, in_teardown_mode = False,use_Config_file_path_attr = False,
+                    parallel=True, plan_only=False, skip_unchanged=False, load_networking=True, load_vms=True,
+                    record_config_hashes=False):
+        """
+        Load the configuration on the networking devices and restore the VMs
+        :param bool parallel: Optional. Restore the networking devices and the VMs at the same time, under a single
+                              concurrency budget (max_concurrent_devices). If False, the VMs are restored after
+                              the networking devices
+        :param bool plan_only: Optional. Only plan the load, without changing the devices and the VMs.
+                               The config files of the plan are downloaded to the cache of the storage, and the
+                               firmware version of the devices with a firmware image is read
+        :param bool skip_unchanged: Optional. Don't load the config on a networking device if it is the config that
+                                    was last loaded on it, see NetworkingSaveRestore.get_load_tasks
+        :param bool record_config_hashes: Optional. Keep the hash of the config loaded on each networking device,
+                                          for the loads with skip_unchanged. Implied by skip_unchanged
+        :param bool load_networking: Optional. Load the configuration on the networking devices
+        :param bool load_vms: Optional. Restore the VMs
+        :return: The plans of the devices and the VMs if plan_only, otherwise None
+        :rtype: list[device_load_plan]
+        """
+        if plan_only:
+            plans = []
+            if load_networking:
+                plans += self.networking_save_restore.get_load_plan(config_stage=config_stage,
+                                                                    config_set_name=config_set_name,
+                                                                    ignore_models=ignore_models,
+                                                                    read_firmware_versions=True)
+            if load_vms:
+                plans += self.vm_save_restore.get_load_plan(config_stage=config_stage,
+                                                            config_set_name=config_set_name,
+                                                            ignore_models=ignore_models,
+                                                            in_teardown_mode=in_teardown_mode)
+            plans = prewarm_load_plans(self.get_storage_manager(), plans)
+            self.sandbox.report_info("Load plan:\n" + format_load_plan(plans), write_to_output_window=write_to_output)
+            return plans
+
+        if parallel:
+            tasks = []
+            if load_networking:
+                tasks += self.networking_save_restore.get_load_tasks(
+                    config_stage=config_stage, config_type=config_type, restore_method=restore_method,
+                    config_set_name=config_set_name, ignore_models=ignore_models,
+                    use_Config_file_path_attr=use_Config_file_path_attr, skip_unchanged=skip_unchanged,
+                    record_config_hashes=record_config_hashes)
+            networking_tasks_count = len(tasks)
+            if load_vms:
+                tasks += self.vm_save_restore.get_load_tasks(config_stage=config_stage,
+                                                             config_set_name=config_set_name,
+                                                             ignore_models=ignore_models,
+                                                             in_teardown_mode=in_teardown_mode)
+            results = run_save_restore_tasks(tasks, max_concurrency=self.max_concurrent_devices)
+            self.networking_save_restore.write_loaded_config_hashes(results)
+            report_load_results(self.sandbox, results, write_to_output=write_to_output)
+            if remove_temp_files and networking_tasks_count > 0:
+                self.networking_save_restore._remove_temp_config_files()
+            return
 
-        self.vm_save_restore.load_config(config_stage=config_stage, config_set_name=config_set_name,
-                                         ignore_models=ignore_models,write_to_output=write_to_output,
-                                         in_teardown_mode=in_teardown_mode)
+        if load_networking:
+            self.networking_save_restore.load_config(config_stage=config_stage,
+                                                     config_type=config_type,
+                                                     restore_method=restore_method,
+                                                     config_set_name=config_set_name,
+                                                     ignore_models=ignore_models,
+                                                     write_to_output=write_to_output,
+                                                     remove_temp_files=remove_temp_files,
+                                                     use_Config_file_path_attr=use_Config_file_path_attr,
+                                                     skip_unchanged=skip_unchanged,
+                                                     record_config_hashes=record_config_hashes)
+
+        if load_vms:
+            self.vm_save_restore.load_config(config_stage=config_stage, config_set_name=config_set_name,
+                                             ignore_models=ignore_models,write_to_output=write_to_output,
+                                             in_teardown_mode=in_teardown_mode)
 
     # ----------------------------------
     # ----------------------------------
-    def save_config(self, snapshot_name, config_type, ignore_models=None, write_to_output=True):
-        #TODO:parallel both vms and resources
+    def save_config(self, snapshot_name, config_type, ignore_models=None, write_to_output=True, parallel=True,
+                    plan_only=False, record_config_hashes=False):
+        """
+        Save the configuration of the networking devices and the VMs
+        :param bool parallel: Optional. Save the networking devices and the VMs at the same time, under a single
+                              concurrency budget (max_concurrent_devices). If False, the VMs are saved after
+                              the networking devices
+        :param bool plan_only: Optional. Only plan the save, without touching the devices, the VMs and the storage
+        :param bool record_config_hashes: Optional. Keep the hash of the config saved from each networking device,
+                                          for the loads with skip_unchanged
+        :return: The plans of the devices and the VMs if plan_only, otherwise None
+        :rtype: list[device_save_plan]
+        """
+        if plan_only:
+            plans = self.networking_save_restore.get_save_plan(snapshot_name=snapshot_name,
+                                                               ignore_models=ignore_models)
+            plans += self.vm_save_restore.get_save_plan(snapshot_name=snapshot_name, ignore_models=ignore_models)
+            self.sandbox.report_info("Save plan:\n" + format_save_plan(plans), write_to_output_window=write_to_output)
+            return plans
+
+        if parallel:
+            tasks = self.networking_save_restore.get_save_tasks(snapshot_name=snapshot_name, config_type=config_type,
+                                                                ignore_models=ignore_models,
+                                                                write_to_output=write_to_output,
+                                                                record_config_hashes=record_config_hashes)
+            tasks += self.vm_save_restore.get_save_tasks(snapshot_name=snapshot_name, config_type=config_type,
+                                                         ignore_models=ignore_models, write_to_output=write_to_output)
+            results = run_save_restore_tasks(tasks, max_concurrency=self.max_concurrent_devices)
+            self.networking_save_restore.write_saved_artifacts(results)
+            self.networking_save_restore.write_loaded_config_hashes(results)
+            self.vm_save_restore.write_saved_artifacts(results)
+            report_save_results(self.sandbox, results, write_to_output=write_to_output)
+            return
+
         self.networking_save_restore.save_config(snapshot_name=snapshot_name,config_type=config_type,
-                                                 ignore_models=ignore_models,write_to_output=write_to_output)
+                                                 ignore_models=ignore_models,write_to_output=write_to_output,
+                                                 record_config_hashes=record_config_hashes)
 
         self.vm_save_restore.save_config(snapshot_name=snapshot_name , config_type=config_type,
                                          ignore_models=ignore_models, write_to_output=write_to_output)
@@ -0,0 +1,328 @@
+import unittest
+from mock import patch, Mock, call
+import hashlib
+from sandbox_scripts.helpers.Networking.NetworkingSaveNRestore import NetworkingSaveRestore
+from sandbox_scripts.helpers.Networking.base_save_restore import run_save_restore_tasks
+from sandbox_scripts.helpers.Networking.base_save_restore import format_load_plan
+from sandbox_scripts.helpers.Networking.base_save_restore import image_struct
+from sandbox_scripts.helpers.Networking.base_save_restore import get_health_check_settings
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import transfer_result_struct
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
+
+
+class NetworkingSaveRestoreTests(unittest.TestCase):
+
+    @patch('sandbox_scripts.helpers.Networking.NetworkingSaveNRestore.StorageManager')
+    def setUp(self, mock_storage_manager_class):
+        self.sandbox = Mock()
+        self.sandbox.id = '5487c6ce-d0b3-43e9-8ee7-e27af8406905'
+        self.sandbox.Blueprint_name = 'Large Office'
+        self.sandbox.get_Apps_resources.return_value = []
+        self.sandbox.get_config_set_pool_resource.return_value = None
+        self.storage_mgr = mock_storage_manager_class.return_value
+        self.storage_mgr.get_configs_root.return_value = 'ftp://1.2.3.4/Configs'
+        self.storage_mgr.open_reader.side_effect = IOError('no FirmwareData.csv')
+        self.networking_save_restore = NetworkingSaveRestore(self.sandbox)
+
+    def tearDown(self):
+        pass
+
+    def _create_resource(self, name):
+        resource = Mock()
+        resource.name = name
+        resource.alias = name
+        resource.model = 'Switch'
+        resource.attribute_exist.return_value = False
+        resource.health_check.return_value = ''
+        return resource
+
+    def test_config_files_are_created_in_parallel(self):
+        resources = [self._create_resource('sw' + str(i)) for i in range(4)]
+        self.sandbox.get_root_networking_resources.return_value = resources
+        self.storage_mgr.file_exist.return_value = False
+        self.storage_mgr.download_first.side_effect = lambda paths: (paths[0], 'hostname')
+        tracker = ConcurrencyTracker(duration=0.1)
+        self.storage_mgr.upload_bytes.side_effect = lambda path, data: tracker.run(path)
+
+        tasks = self.networking_save_restore.get_load_tasks(config_stage='Gold', config_type='Running')
+        results = run_save_restore_tasks(tasks)
+
+        self.assertTrue(all(res.run_result for res in results))
+        self.assertEqual(tracker.max_running, 4)
+        resources[0].load_network_config.assert_called_once_with(
+            self.sandbox.id, 'ftp://1.2.3.4/Configs/Gold/Large_Office/temp/6905_sw0_Switch.cfg', 'Running', 'Override')
+
+    @patch('sandbox_scripts.helpers.Networking.NetworkingSaveNRestore.ConfigPoolManager')
+    def test_pool_data_is_read_once(self, mock_config_pool_manager_class):
+        mock_config_pool_manager_class.return_value.pool_data = {'{configpool:vlan}': '10'}
+        config_set_pool = Mock()
+        config_set_pool.attribute_exist.return_value = False
+        self.sandbox.get_config_set_pool_resource.return_value = config_set_pool
+        self.sandbox.get_root_networking_resources.return_value = [self._create_resource('sw' + str(i))
+                                                                   for i in range(4)]
+        self.storage_mgr.file_exist.return_value = False
+        self.storage_mgr.download_first.side_effect = lambda paths: (paths[0], 'vlan {ConfigPool:VLAN}')
+        uploads = ConcurrencyTracker()
+        self.storage_mgr.upload_bytes.side_effect = lambda path, data: uploads.run((path, data))
+
+        results = run_save_restore_tasks(
+            self.networking_save_restore.get_load_tasks(config_stage='Gold', config_type='Running'))
+
+        self.assertTrue(all(res.run_result for res in results))
+        self.assertEqual(mock_config_pool_manager_class.call_count, 1)
+        self.assertEqual(len(uploads.calls), 4)
+        self.assertTrue(all(data == 'vlan 10' for path, data in uploads.calls))
+
+    @patch('sandbox_scripts.helpers.Networking.NetworkingSaveNRestore.ConfigPoolManager')
+    def test_health_check_is_retried_as_the_config_set_pool_says(self, mock_config_pool_manager_class):
+        mock_config_pool_manager_class.return_value.pool_data = {}
+        attributes = {'Health Check Attempts': '3', 'Health Check Initial Delay': '5',
+                      'Health Check Max Delay': '60', 'Health Check Deadline': '300',
+                      'Health Check Poll Live Status': 'True'}
+        config_set_pool = Mock()
+        config_set_pool.attribute_exist.side_effect = lambda name: name in attributes
+        config_set_pool.get_attribute.side_effect = lambda name: attributes[name]
+        self.sandbox.get_config_set_pool_resource.return_value = config_set_pool
+        resource = self._create_resource('sw0')
+        self.sandbox.get_root_networking_resources.return_value = [resource]
+        self.storage_mgr.file_exist.return_value = False
+        self.storage_mgr.download_first.side_effect = lambda paths: (paths[0], 'hostname')
+
+        results = run_save_restore_tasks(
+            self.networking_save_restore.get_load_tasks(config_stage='Gold', config_type='Running'))
+
+        self.assertTrue(results[0].run_result)
+        args, kwargs = resource.health_check.call_args_list[0]
+        self.assertEqual(args, (self.sandbox.id, '3'))
+        self.assertTrue(kwargs['poll_live_status'])
+        retry_policy = kwargs['retry_policy']
+        self.assertEqual((retry_policy.initial_delay, retry_policy.max_delay, retry_policy.deadline),
+                         (5, 60, 300))
+
+    def test_health_check_defaults_without_config_set_pool(self):
+        settings = get_health_check_settings(None)
+
+        self.assertEqual(settings, (1, None, False))
+
+    def test_load_plan(self):
+        disabled = self._create_resource('sw2')
+        disabled.attribute_exist.side_effect = lambda name: name == 'Disable Load Config'
+        disabled.get_attribute.return_value = 'True'
+        resources = [self._create_resource('sw0'), self._create_resource('sw1'), disabled]
+        self.sandbox.get_root_networking_resources.return_value = resources
+        self.storage_mgr.file_exist.side_effect = lambda path: path.endswith('/sw0_Switch.cfg')
+        self.networking_save_restore._get_images_path_dict = Mock(
+            return_value={'Switch': image_struct('tftp://1.2.3.4/images/sw.bin', '16.3')})
+
+        plans = self.networking_save_restore.get_load_plan(config_stage='Gold')
+
+        self.assertEqual(plans[0].config_path, 'ftp://1.2.3.4/Configs/Gold/Large_Office/sw0_Switch.cfg')
+        self.assertEqual(plans[0].image.version, '16.3')
+        self.assertEqual(plans[1].config_path, '')
+        self.assertEqual(plans[1].template_paths, ('ftp://1.2.3.4/Configs/Gold/Large_Office/sw1_Switch.tm',
+                                                   'ftp://1.2.3.4/Configs/Gold/Large_Office/Switch.tm'))
+        self.assertEqual(plans[2].skip_reason, 'Disable Load Config is set')
+        self.assertEqual(self.sandbox.get_Apps_resources.call_count, 1)
+        self.assertEqual(self.storage_mgr.file_exist.call_count, 2)
+        for resource in resources:
+            self.assertEqual(resource.method_calls, [call.attribute_exist('Disable Load Config')] +
+                             ([call.get_attribute('Disable Load Config')] if resource is disabled else []))
+        self.assertEqual(format_load_plan(plans).split('\n'), [
+            'sw0: load ftp://1.2.3.4/Configs/Gold/Large_Office/sw0_Switch.cfg, '
+            'firmware 16.3 from tftp://1.2.3.4/images/sw.bin (current version unknown)',
+            'sw1: load a config created from ftp://1.2.3.4/Configs/Gold/Large_Office/sw1_Switch.tm or '
+            'ftp://1.2.3.4/Configs/Gold/Large_Office/Switch.tm, firmware 16.3 from tftp://1.2.3.4/images/sw.bin '
+            '(current version unknown)',
+            'sw2: skipped, Disable Load Config is set'])
+
+    def test_load_plan_tells_if_the_firmware_will_change(self):
+        resources = [self._create_resource('sw0'), self._create_resource('sw1')]
+        resources[0].get_version.return_value = '16.3'
+        resources[1].get_version.return_value = '15.2'
+        self.sandbox.get_root_networking_resources.return_value = resources
+        self.storage_mgr.file_exist.return_value = True
+        self.networking_save_restore._get_images_path_dict = Mock(
+            return_value={'Switch': image_struct('tftp://1.2.3.4/images/sw.bin', '16.3')})
+
+        plans = self.networking_save_restore.get_load_plan(config_stage='Gold', read_firmware_versions=True)
+
+        self.assertEqual([plan.current_version for plan in plans], ['16.3', '15.2'])
+        self.assertEqual([line.split(' (current ')[1] for line in format_load_plan(plans).split('\n')],
+                         ['16.3, already running)', '15.2, will be loaded)'])
+        for resource in resources:
+            resource.load_firmware.assert_not_called()
+            resource.load_network_config.assert_not_called()
+
+    def test_skipped_devices_have_no_task(self):
+        resource = self._create_resource('sw0')
+        self.sandbox.get_root_networking_resources.return_value = [resource]
+        self.sandbox.get_Apps_resources.return_value = [Mock(Name='sw0')]
+        self.assertEqual(self.networking_save_restore.get_load_tasks(config_stage='Gold', config_type='Running'), [])
+        resource.health_check.assert_not_called()
+
+    def test_save_plan(self):
+        orchestration_device = self._create_resource('fw 1')
+        orchestration_device.has_command.side_effect = lambda name: name == 'orchestration_save'
+        device = self._create_resource('sw1')
+        device.has_command.return_value = False
+        router = self._create_resource('r1')
+        router.model = 'Router'
+        self.sandbox.get_root_networking_resources.return_value = [orchestration_device, device, router]
+
+        plans = self.networking_save_restore.get_save_plan(snapshot_name='snap ', ignore_models=['router'])
+
+        self.assertEqual(plans[0].target_path, 'ftp://1.2.3.4/Configs/Snapshots/snap/fw-1_Switch_artifact.txt')
+        self.assertEqual(plans[1].target_path, 'ftp://1.2.3.4/Configs/Snapshots/snap/sw1_Switch.cfg')
+        self.assertEqual(plans[2].skip_reason, 'model Router is ignored')
+        self.storage_mgr.create_dir.assert_not_called()
+        device.save_network_config.assert_not_called()
+
+    def test_unchanged_config_is_not_loaded_again(self):
+        resources = [self._create_resource('sw0'), self._create_resource('sw1')]
+        self.sandbox.get_root_networking_resources.return_value = resources
+        self.storage_mgr.file_exist.return_value = True
+        self.storage_mgr.download_bytes.side_effect = lambda path: 'hostname ' + path.split('/')[-1]
+
+        def download_many(paths, use_cache=True):
+            results = []
+            for path in paths:
+                result = transfer_result_struct(path)
+                result.data = hashlib.sha1('hostname sw0_Switch.cfg').hexdigest() + '\n'
+                result.success = path.endswith('/sw0.sha1')
+                results.append(result)
+            return results
+        self.storage_mgr.download_many.side_effect = download_many
+        self.storage_mgr.upload_many.return_value = []
+
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running', skip_unchanged=True)
+
+        resources[0].load_network_config.assert_not_called()
+        self.assertEqual(resources[0].health_check.call_count, 1)
+        self.assertEqual(resources[1].load_network_config.call_count, 1)
+        self.storage_mgr.download_many.assert_called_once_with(['ftp://1.2.3.4/Configs/LoadedConfigHashes/sw0.sha1',
+                                                                'ftp://1.2.3.4/Configs/LoadedConfigHashes/sw1.sha1'],
+                                                               use_cache=False)
+        self.storage_mgr.upload_many.assert_called_once_with([('ftp://1.2.3.4/Configs/LoadedConfigHashes/sw1.sha1',
+                                                               hashlib.sha1('hostname sw1_Switch.cfg').hexdigest())])
+
+    def test_failed_load_hash_is_deleted(self):
+        resource = self._create_resource('sw0')
+        resource.load_network_config.side_effect = Exception('timeout')
+        self.sandbox.get_root_networking_resources.return_value = [resource]
+        self.storage_mgr.file_exist.return_value = True
+        self.storage_mgr.download_bytes.return_value = 'hostname sw0'
+        self.storage_mgr.download_many.return_value = [transfer_result_struct('sw0.sha1')]
+        self.storage_mgr.download_many.return_value[0].success = False
+        self.storage_mgr.upload_many.return_value = []
+
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running', skip_unchanged=True)
+
+        self.assertEqual(resource.load_network_config.call_count, 1)
+        self.storage_mgr.upload_many.assert_called_once_with([])
+        self.storage_mgr.delete_many.assert_called_once_with(['ftp://1.2.3.4/Configs/LoadedConfigHashes/sw0.sha1'])
+
+    def _keep_files_in_memory(self):
+        files = dict()
+
+        def download_many(paths, use_cache=True):
+            results = []
+            for path in paths:
+                result = transfer_result_struct(path)
+                result.success = path in files
+                result.data = files.get(path)
+                results.append(result)
+            return results
+
+        def upload_many(uploaded_files):
+            files.update(uploaded_files)
+            return [transfer_result_struct(path) for path, data in uploaded_files]
+
+        def delete_many(paths):
+            for path in paths:
+                files.pop(path, None)
+            return [transfer_result_struct(path) for path in paths]
+        self.storage_mgr.download_many.side_effect = download_many
+        self.storage_mgr.upload_many.side_effect = upload_many
+        self.storage_mgr.delete_many.side_effect = delete_many
+        return files
+
+    def test_load_that_records_the_hash_is_not_skipped_after(self):
+        resource = self._create_resource('sw0')
+        self.sandbox.get_root_networking_resources.return_value = [resource]
+        self.storage_mgr.file_exist.return_value = True
+        self.storage_mgr.download_bytes.side_effect = lambda path: 'hostname ' + path
+        files = self._keep_files_in_memory()
+
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running', skip_unchanged=True)
+        self.networking_save_restore.load_config(config_stage='Base', config_type='Running',
+                                                 record_config_hashes=True)
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running', skip_unchanged=True)
+
+        self.assertEqual([args[1] for args, kwargs in resource.load_network_config.call_args_list],
+                         ['ftp://1.2.3.4/Configs/Gold/Large_Office/sw0_Switch.cfg',
+                          'ftp://1.2.3.4/Configs/Base/sw0_Switch.cfg',
+                          'ftp://1.2.3.4/Configs/Gold/Large_Office/sw0_Switch.cfg'])
+        self.assertEqual(files['ftp://1.2.3.4/Configs/LoadedConfigHashes/sw0.sha1'],
+                         hashlib.sha1('hostname ftp://1.2.3.4/Configs/Gold/Large_Office/sw0_Switch.cfg').hexdigest())
+
+    def test_saved_config_hash_is_kept(self):
+        device = self._create_resource('sw0')
+        device.has_command.return_value = False
+        device.save_network_config.return_value = 'sw0-running-1.cfg'
+        artifact_device = self._create_resource('fw 1')
+        artifact_device.has_command.side_effect = lambda name: name == 'orchestration_save'
+        artifact_device.orchestration_save.return_value = '{"saved_artifacts_info": {}}'
+        self.sandbox.get_root_networking_resources.return_value = [device, artifact_device]
+        self.storage_mgr.dir_exist.return_value = True
+        self.storage_mgr.download_bytes.side_effect = lambda path: 'hostname ' + path
+        files = self._keep_files_in_memory()
+        files['ftp://1.2.3.4/Configs/LoadedConfigHashes/fw_1.sha1'] = 'stale'
+
+        self.networking_save_restore.save_config(snapshot_name='snap', config_type='Running',
+                                                 record_config_hashes=True)
+
+        self.storage_mgr.rename_file.assert_called_once_with('ftp://1.2.3.4/Configs/Snapshots/snap/sw0-running-1.cfg',
+                                                             'sw0_Switch.cfg')
+        self.assertNotIn('ftp://1.2.3.4/Configs/LoadedConfigHashes/fw_1.sha1', files)
+        self.assertEqual(files['ftp://1.2.3.4/Configs/LoadedConfigHashes/sw0.sha1'],
+                         hashlib.sha1('hostname ftp://1.2.3.4/Configs/Snapshots/snap/sw0_Switch.cfg').hexdigest())
+
+    def test_hashes_are_not_kept_by_default(self):
+        resource = self._create_resource('sw0')
+        device = self._create_resource('sw1')
+        device.has_command.return_value = False
+        device.save_network_config.return_value = 'sw1-running-1.cfg'
+        self.sandbox.get_root_networking_resources.return_value = [resource]
+        self.storage_mgr.file_exist.return_value = True
+        self.storage_mgr.dir_exist.return_value = True
+
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running')
+        self.sandbox.get_root_networking_resources.return_value = [device]
+        self.networking_save_restore.save_config(snapshot_name='snap', config_type='Running')
+
+        self.assertEqual(resource.load_network_config.call_count, 1)
+        self.assertEqual(device.save_network_config.call_count, 1)
+        self.storage_mgr.download_bytes.assert_not_called()
+        self.storage_mgr.download_many.assert_not_called()
+        self.storage_mgr.upload_many.assert_not_called()
+        self.storage_mgr.delete_many.assert_not_called()
+
+    def test_hashes_dir_is_created_once(self):
+        resource = self._create_resource('sw0')
+        self.sandbox.get_root_networking_resources.return_value = [resource]
+        self.storage_mgr.file_exist.return_value = True
+        self.storage_mgr.download_bytes.return_value = 'hostname sw0'
+        self.storage_mgr.dir_exist.return_value = False
+        self._keep_files_in_memory()
+
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running',
+                                                 record_config_hashes=True)
+        self.networking_save_restore.load_config(config_stage='Gold', config_type='Running',
+                                                 record_config_hashes=True)
+
+        self.storage_mgr.create_dir.assert_called_once_with('ftp://1.2.3.4/Configs/LoadedConfigHashes',
+                                                            write_to_output=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+from mock import patch, Mock, call
+from sandbox_scripts.helpers.Networking.save_restore_mgr import SaveRestoreManager
+from sandbox_scripts.helpers.Networking.base_save_restore import write_saved_artifacts
+from sandbox_scripts.helpers.Networking.base_save_restore import device_load_plan, device_save_plan
+from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import rsc_run_result_struct, transfer_result_struct
+from sandbox_scripts.QualiEnvironmentUtils.tests.ConcurrencyTracker import ConcurrencyTracker
+import time
+
+
+class SaveRestoreManagerTests(unittest.TestCase):
+
+    @patch('sandbox_scripts.helpers.Networking.save_restore_mgr.VMsSaveRestore')
+    @patch('sandbox_scripts.helpers.Networking.save_restore_mgr.NetworkingSaveRestore')
+    def setUp(self, mock_networking, mock_vms):
+        self.sandbox = Mock()
+        self.save_restore_mgr = SaveRestoreManager(self.sandbox)
+        self.networking = self.save_restore_mgr.networking_save_restore
+        self.vms = self.save_restore_mgr.vm_save_restore
+        self.tracker = ConcurrencyTracker(duration=0.15)
+
+    def tearDown(self):
+        pass
+
+    def _create_task(self, name, run_result=True, message=''):
+        def run(resource_name):
+            self.tracker.run(resource_name)
+            result = rsc_run_result_struct(resource_name)
+            result.run_result = run_result
+            result.message = message
+            return result
+        return run, (name,)
+
+    def test_load_networking_and_vms_in_parallel(self):
+        self.networking.get_load_tasks.return_value = [self._create_task('r1'), self._create_task('r2')]
+        self.vms.get_load_tasks.return_value = [self._create_task('vm1'), self._create_task('vm2')]
+
+        start = time.time()
+        self.save_restore_mgr.load_config(config_stage='Gold', config_type='Running', remove_temp_files=True)
+
+        # run one after the other the four tasks take 0.6 seconds
+        self.assertLess(time.time() - start, 0.45)
+        self.assertEqual(self.tracker.max_running, 4)
+        self.networking.load_config.assert_not_called()
+        self.vms.load_config.assert_not_called()
+        self.networking._remove_temp_config_files.assert_called_once_with()
+
+    def test_load_under_a_single_concurrency_budget(self):
+        self.save_restore_mgr.max_concurrent_devices = 3
+        self.networking.get_load_tasks.return_value = [self._create_task('r' + str(i)) for i in range(4)]
+        self.vms.get_load_tasks.return_value = [self._create_task('vm' + str(i)) for i in range(4)]
+
+        self.save_restore_mgr.load_config(config_stage='Gold', config_type='Running')
+
+        self.assertEqual(self.tracker.max_running, 3)
+
+    def test_load_errors_are_reported_once_for_all_devices(self):
+        self.networking.get_load_tasks.return_value = [self._create_task('r1', False, 'r1 failed'),
+                                                       self._create_task('r2')]
+        # a VM restore task returns None when there is nothing to do (e.g. in teardown)
+        self.vms.get_load_tasks.return_value = [(lambda: None, ()),
+                                                self._create_task('vm1', False, 'vm1 failed')]
+
+        self.save_restore_mgr.load_config(config_stage='Gold', config_type='Running')
+
+        self.sandbox.report_error.assert_has_calls([
+            call('Failed to load configuration on device r1', write_to_output_window=True, raise_error=False),
+            call('r1 failed', raise_error=False),
+            call('Failed to load configuration on device vm1', write_to_output_window=True, raise_error=False),
+            call('vm1 failed', raise_error=False)])
+        self.sandbox.api_session.SetResourceLiveStatus.assert_has_calls([call('r1', 'Error'), call('vm1', 'Error')])
+
+    def test_load_sequential(self):
+        self.save_restore_mgr.load_config(config_stage='Base', config_type='Running', ignore_models=['m1'],
+                                          in_teardown_mode=True, parallel=False)
+
+        self.networking.get_load_tasks.assert_not_called()
+        self.networking.load_config.assert_called_once_with(config_stage='Base', config_type='Running',
+                                                            restore_method='Override', config_set_name='',
+                                                            ignore_models=['m1'], write_to_output=True,
+                                                            remove_temp_files=False,
+                                                            use_Config_file_path_attr=False,
+                                                            skip_unchanged=False, record_config_hashes=False)
+        self.vms.load_config.assert_called_once_with(config_stage='Base', config_set_name='', ignore_models=['m1'],
+                                                     write_to_output=True, in_teardown_mode=True)
+
+    def test_save_networking_and_vms_in_parallel(self):
+        self.networking.get_save_tasks.return_value = [self._create_task('r1')]
+        self.vms.get_save_tasks.return_value = [self._create_task('vm1', False, 'vm1 failed')]
+
+        self.save_restore_mgr.save_config(snapshot_name='snap', config_type='running')
+
+        self.assertEqual(self.tracker.max_running, 2)
+        self.sandbox.report_error.assert_has_calls([
+            call('Failed to save configuration on device vm1', write_to_output_window=True, raise_error=False),
+            call('vm1 failed', raise_error=False, send_email=True)])
+        self.networking.write_saved_artifacts.assert_called_once()
+        self.networking.write_loaded_config_hashes.assert_called_once_with(
+            self.networking.write_saved_artifacts.call_args[0][0])
+        self.vms.write_saved_artifacts.assert_called_once()
+
+    def test_saved_artifacts_are_uploaded_in_one_batch(self):
+        storage_mgr = Mock()
+        failed_transfer = transfer_result_struct('ftp://1.2.3.4/Snapshots/snap/vm1.json')
+        failed_transfer.success = False
+        failed_transfer.message = 'connection refused'
+        storage_mgr.upload_many.return_value = [transfer_result_struct('ftp://1.2.3.4/Snapshots/snap/r1.json'),
+                                                failed_transfer]
+        results = [rsc_run_result_struct('r1'), rsc_run_result_struct('vm1')]
+
+        write_saved_artifacts(storage_mgr,
+                              [('r1', 'ftp://1.2.3.4/Snapshots/snap/r1.json', {'resource_name': 'r1'}),
+                               ('vm1', 'ftp://1.2.3.4/Snapshots/snap/vm1.json', {'resource_name': 'vm1'})],
+                              results)
+
+        storage_mgr.upload_many.assert_called_once_with(
+            [('ftp://1.2.3.4/Snapshots/snap/r1.json', '{"resource_name": "r1"}'),
+             ('ftp://1.2.3.4/Snapshots/snap/vm1.json', '{"resource_name": "vm1"}')])
+        self.assertTrue(results[0].run_result)
+        self.assertFalse(results[1].run_result)
+        self.assertIn('connection refused', results[1].message)
+
+    def test_load_plan_only(self):
+        r1 = Mock()
+        r1.name = 'r1'
+        vm1 = Mock()
+        vm1.name = 'vm1'
+        self.networking.get_load_plan.return_value = [
+            device_load_plan(r1, '', '', ('ftp://1.2.3.4/Gold/r1_Switch.tm', 'ftp://1.2.3.4/Gold/Switch.tm'),
+                             False, '', None, None, None)]
+        self.vms.get_load_plan.return_value = [device_load_plan(vm1, 'in teardown mode', '', (), False, '', None,
+                                                                None, None)]
+        storage_mgr = self.vms.get_storage_manager.return_value
+        missing_template = transfer_result_struct('ftp://1.2.3.4/Gold/r1_Switch.tm')
+        missing_template.success = False
+        template = transfer_result_struct('ftp://1.2.3.4/Gold/Switch.tm')
+        template.size = 1200
+        storage_mgr.download_many.return_value = [missing_template, template]
+
+        plans = self.save_restore_mgr.load_config(config_stage='Gold', config_type='Running', in_teardown_mode=True,
+                                                  plan_only=True)
+
+        self.assertEqual([plan.config_size for plan in plans], [1200, None])
+        storage_mgr.download_many.assert_called_once_with(['ftp://1.2.3.4/Gold/Switch.tm',
+                                                           'ftp://1.2.3.4/Gold/r1_Switch.tm'])
+        self.vms.get_load_plan.assert_called_once_with(config_stage='Gold', config_set_name='', ignore_models=None,
+                                                       in_teardown_mode=True)
+        self.networking.get_load_plan.assert_called_once_with(config_stage='Gold', config_set_name='',
+                                                              ignore_models=None, read_firmware_versions=True)
+        self.networking.get_load_tasks.assert_not_called()
+        self.vms.get_load_tasks.assert_not_called()
+        self.sandbox.report_info.assert_called_once_with(
+            'Load plan:\nr1: load a config created from ftp://1.2.3.4/Gold/r1_Switch.tm or '
+            'ftp://1.2.3.4/Gold/Switch.tm (1200 bytes)\nvm1: skipped, in teardown mode', write_to_output_window=True)
+
+    def test_save_plan_only(self):
+        r1 = Mock()
+        r1.name = 'r1'
+        self.networking.get_save_plan.return_value = [device_save_plan(r1, '', 'ftp://1.2.3.4/Snapshots/snap/r1.cfg')]
+        self.vms.get_save_plan.return_value = []
+
+        plans = self.save_restore_mgr.save_config(snapshot_name='snap', config_type='running', plan_only=True)
+
+        self.assertEqual([plan.target_path for plan in plans], ['ftp://1.2.3.4/Snapshots/snap/r1.cfg'])
+        self.networking.get_save_tasks.assert_not_called()
+        self.vms.get_save_tasks.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
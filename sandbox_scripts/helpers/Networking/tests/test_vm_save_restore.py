@@ -0,0 +1,62 @@
+import unittest
+from mock import patch, Mock
+from sandbox_scripts.helpers.Networking.vm_save_restore import VMsSaveRestore
+from sandbox_scripts.helpers.Networking.base_save_restore import run_save_restore_tasks
+
+
+class VMsSaveRestoreTests(unittest.TestCase):
+
+    @patch('sandbox_scripts.helpers.Networking.base_save_restore.StorageManager')
+    def setUp(self, mock_storage_manager_class):
+        self.sandbox = Mock()
+        self.sandbox.id = '5487c6ce-d0b3-43e9-8ee7-e27af8406905'
+        self.sandbox.Blueprint_name = 'Large Office'
+        self.sandbox.get_Apps_resources.return_value = []
+        self.sandbox.get_config_set_pool_resource.return_value = None
+        self.storage_mgr = mock_storage_manager_class.return_value
+        self.storage_mgr.get_configs_root.return_value = 'ftp://1.2.3.4/Configs'
+        self.vm_save_restore = VMsSaveRestore(self.sandbox)
+
+    def tearDown(self):
+        pass
+
+    def _create_vm(self, name):
+        vm = Mock()
+        vm.name = name
+        vm.model = 'VM'
+        vm.attribute_exist.return_value = False
+        vm.has_command.return_value = True
+        vm.health_check.return_value = ''
+        return vm
+
+    def test_health_check_is_retried_as_the_config_set_pool_says(self):
+        attributes = {'Health Check Attempts': '4', 'Health Check Initial Delay': '10',
+                      'Health Check Poll Live Status': 'true'}
+        config_set_pool = Mock()
+        config_set_pool.attribute_exist.side_effect = lambda name: name in attributes
+        config_set_pool.get_attribute.side_effect = lambda name: attributes[name]
+        self.sandbox.get_config_set_pool_resource.return_value = config_set_pool
+        vm = self._create_vm('vm0')
+        self.sandbox.get_root_vm_resources.return_value = [vm]
+
+        results = run_save_restore_tasks(self.vm_save_restore.get_load_tasks(config_stage='Snapshots'))
+
+        self.assertTrue(results[0].run_result)
+        vm.orchestration_restore.assert_called_once()
+        args, kwargs = vm.health_check.call_args_list[0]
+        self.assertEqual(args, (self.sandbox.id, '4'))
+        self.assertTrue(kwargs['poll_live_status'])
+        self.assertEqual(kwargs['retry_policy'].initial_delay, 10)
+        self.assertEqual(kwargs['retry_policy'].deadline, None)
+
+    def test_health_check_runs_once_without_config_set_pool(self):
+        vm = self._create_vm('vm0')
+        self.sandbox.get_root_vm_resources.return_value = [vm]
+
+        run_save_restore_tasks(self.vm_save_restore.get_load_tasks(config_stage='Snapshots'))
+
+        vm.health_check.assert_any_call(self.sandbox.id, 1, retry_policy=None, poll_live_status=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
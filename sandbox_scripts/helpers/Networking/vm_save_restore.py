@@ -1,17 +1,15 @@
-import tempfile
-import os
 from sandbox_scripts.helpers.Networking.base_save_restore import *
 from sandbox_scripts.QualiEnvironmentUtils.ConfigPoolManager import ConfigPoolManager
 from sandbox_scripts.QualiEnvironmentUtils.ConfigFileManager import ConfigFileManager
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import QualiError
 from sandbox_scripts.QualiEnvironmentUtils.QualiUtils import rsc_run_result_struct
-from multiprocessing.pool import ThreadPool
 from threading import Lock
 
 
 class VMsSaveRestore(BaseSaveRestore):
     def __init__(self, sandbox):
         super(VMsSaveRestore,self).__init__(sandbox)
+        self._saved_artifacts = []
 
     # ----------------------------------
     # ----------------------------------
@@ -27,44 +25,94 @@ class VMsSaveRestore(BaseSaveRestore):
         :param bool in_teardown_mode: Optional. is in teardown mode.
         """
 
-        root_path = ''
-        if config_stage.lower() == 'gold' or config_stage.lower() == 'snapshots':
-            root_path = self.config_files_root + '/' + config_stage + '/' + self.sandbox.Blueprint_name.strip() + '/'
-        elif config_stage.lower() == 'base':
-            root_path = self.config_files_root + '/' + config_stage + '/'
-        if config_set_name != '':
-            root_path = root_path + config_set_name.strip() + '/'
+        tasks = self.get_load_tasks(config_stage=config_stage, config_set_name=config_set_name,
+                                    ignore_models=ignore_models, in_teardown_mode=in_teardown_mode)
+        if len(tasks) > 0:
+            results = run_save_restore_tasks(tasks)
+            report_load_results(self.sandbox, results, write_to_output=write_to_output)
 
-        root_path = root_path.replace(' ', '_')
+    # ----------------------------------
+    # ----------------------------------
+    def get_load_tasks(self, config_stage, config_set_name='', ignore_models=None, in_teardown_mode=False):
+        """
+        Prepare the restore of the Blueprint's VMs, without running it
+        :param str config_stage:  The stage of the config e.g Gold, Base
+        :param str config_set_name: Optional. The name of the config set selected by the user
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param bool in_teardown_mode: Optional. is in teardown mode.
+        :return: A (function, args) task for each VM, see run_save_restore_tasks
+        :rtype: list[(function, tuple)]
+        """
+        root_path = self._get_root_path(config_stage, config_set_name)
+        health_check = get_health_check_settings(self.sandbox.get_config_set_pool_resource())
 
         self.sandbox.report_info(
             "Loading image on the VMs. This action may take some time.",write_to_output_window=True)
         root_resources = self.sandbox.get_root_vm_resources()
         """:type : list[ResourceBase]"""
-        if len(root_resources) > 0:
-            pool = ThreadPool(len(root_resources))
-            async_results = [pool.apply_async(self._run_asynch_load,
-                                              (resource, root_path, ignore_models, in_teardown_mode))
-                             for resource in root_resources]
-
-            pool.close()
-            pool.join()
-            for async_result in async_results:
-                res = async_result.get()
-                """:type : rsc_run_result_struct"""
-                if not res.run_result:
-                    err = "Failed to load configuration on device " + res.resource_name
-                    self.sandbox.report_error(err, write_to_output_window=write_to_output, raise_error=False)
-                    self.sandbox.report_error(res.message, raise_error=False)
-                    self.sandbox.api_session.SetResourceLiveStatus(res.resource_name, 'Error')
-                elif res.message != '':
-                    self.sandbox.report_info(res.resource_name + "\n" + res.message)
-        else:
+        if len(root_resources) == 0:
             self.sandbox.report_info("No VM resources found to process")
+            return []
+
+        return [(self._run_asynch_load, (resource, root_path, ignore_models, in_teardown_mode, health_check))
+                for resource in root_resources]
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_load_plan(self, config_stage, config_set_name='', ignore_models=None, in_teardown_mode=False):
+        """
+        Decide what will be restored on each of the Blueprint's VMs, without touching the VMs
+        :param str config_stage:  The stage of the config e.g Gold, Base
+        :param str config_set_name: Optional. The name of the config set selected by the user
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param bool in_teardown_mode: Optional. is in teardown mode.
+        :rtype: list[device_load_plan]
+        """
+        root_path = self._get_root_path(config_stage, config_set_name)
+        root_resources = self.sandbox.get_root_vm_resources()
+        """:type : list[ResourceBase]"""
+        app_names = [app.Name for app in self.sandbox.get_Apps_resources()] if len(root_resources) > 0 else []
+        plans = []
+        for resource in root_resources:
+            skip_reason = 'in teardown mode' if in_teardown_mode else \
+                self._get_skip_reason(resource, ignore_models=ignore_models, app_names=app_names)
+            artifact_path = ''
+            if skip_reason == '':
+                if resource.has_command('orchestration_restore'):
+                    artifact_path = root_path + (resource.name + '_' + resource.model +
+                                                 '_artifact.txt').replace(' ', '-')
+                else:
+                    skip_reason = 'it has no orchestration_restore command'
+            plans.append(device_load_plan(resource, skip_reason, artifact_path, (), False, '', None, None, None))
+        return plans
+
+    # ----------------------------------
+    # ----------------------------------
+    def _get_root_path(self, config_stage, config_set_name=''):
+        """
+        Get the dir of the config files of a config stage
+        :param str config_stage:  The stage of the config e.g Gold, Base
+        :param str config_set_name: Optional. The name of the config set selected by the user
+        :rtype: str
+        """
+        root_path = ''
+        if config_stage.lower() == 'gold' or config_stage.lower() == 'snapshots':
+            root_path = self.config_files_root + '/' + config_stage + '/' + self.sandbox.Blueprint_name.strip() + '/'
+        elif config_stage.lower() == 'base':
+            root_path = self.config_files_root + '/' + config_stage + '/'
+        if config_set_name != '':
+            root_path = root_path + config_set_name.strip() + '/'
+        return root_path.replace(' ', '_')
 
     # ----------------------------------
     # ----------------------------------
-    def _run_asynch_load(self, resource, root_path, ignore_models, in_teardown_mode):
+    def _run_asynch_load(self, resource, root_path, ignore_models, in_teardown_mode, health_check=None):
+        """
+        Restore the snapshot of a VM
+        :param health_check_settings health_check:  Optional. How to health check the VM before the restore,
+                                                    see get_health_check_settings. None for a single attempt
+        :rtype: rsc_run_result_struct
+        """
 
         #if we are in teardown the vm is either going to be deleted or will be restored to default
         # snapshot in the setup - no need to do anything
@@ -79,7 +127,11 @@ class VMsSaveRestore(BaseSaveRestore):
         # Check if needs to load the config to the device
         load_config_to_device = self._is_load_config_to_device(resource, ignore_models=ignore_models)
         if load_config_to_device:
-            health_check_result = resource.health_check(self.sandbox.id)
+            if health_check is None:
+                health_check = health_check_settings(1, None, False)
+            health_check_result = resource.health_check(self.sandbox.id, health_check.attempts,
+                                                        retry_policy=health_check.retry_policy,
+                                                        poll_live_status=health_check.poll_live_status)
             if health_check_result == "":
                 try:
                     if resource.has_command('orchestration_restore'):
@@ -121,6 +173,24 @@ class VMsSaveRestore(BaseSaveRestore):
         :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
         :param bool write_to_output: Optional. should messages be sent to the command output.
         """
+        tasks = self.get_save_tasks(snapshot_name=snapshot_name, config_type=config_type,
+                                    ignore_models=ignore_models, write_to_output=write_to_output)
+        results = run_save_restore_tasks(tasks)
+        self.write_saved_artifacts(results)
+        report_save_results(self.sandbox, results, write_to_output=write_to_output)
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_save_tasks(self, snapshot_name, config_type, ignore_models=None, write_to_output=True):
+        """
+        Create the snapshot directory and prepare the saving of the VMs, without running it
+        :param str snapshot_name:  The name of the snapshot
+        :param str config_type:  StartUp or Running
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :param bool write_to_output: Optional. should messages be sent to the command output.
+        :return: A (function, args) task for each VM, see run_save_restore_tasks
+        :rtype: list[(function, tuple)]
+        """
 
         env_dir = ""
         try:
@@ -133,24 +203,46 @@ class VMsSaveRestore(BaseSaveRestore):
 
         root_resources = self.sandbox.get_root_vm_resources()
         """:type : list[ResourceBase]"""
-        pool = ThreadPool(len(root_resources))
         lock = Lock()
-        async_results = [pool.apply_async(self._run_asynch_save,
-                                          (resource, env_dir, config_type, lock, ignore_models))
-                         for resource in root_resources]
-
-        pool.close()
-        pool.join()
-        for async_result in async_results:
-            res = async_result.get()
-            """:type : rsc_run_result_struct"""
-            if not res.run_result:
-                err = "Failed to save configuration on device " + res.resource_name
-                self.sandbox.report_error(err, write_to_output_window=write_to_output, raise_error=False)
-                self.sandbox.report_error(res.message, raise_error=False)
-
-            elif res.message != '':
-                self.sandbox.report_info(res.resource_name + "\n" + res.message)
+        self._saved_artifacts = []
+        return [(self._run_asynch_save, (resource, env_dir, config_type, lock, ignore_models))
+                for resource in root_resources]
+
+    # ----------------------------------
+    # ----------------------------------
+    def get_save_plan(self, snapshot_name, ignore_models=None):
+        """
+        Decide where each of the Blueprint's VMs will be saved, without touching the VMs or the storage
+        :param str snapshot_name:  The name of the snapshot
+        :param list[str] ignore_models: Optional. Models that should be ignored and not load config on the device
+        :rtype: list[device_save_plan]
+        """
+        snapshot_dir = self.config_files_root + '/Snapshots/' + snapshot_name.strip()
+        root_resources = self.sandbox.get_root_vm_resources()
+        """:type : list[ResourceBase]"""
+        app_names = [app.Name for app in self.sandbox.get_Apps_resources()] if len(root_resources) > 0 else []
+        plans = []
+        for resource in root_resources:
+            skip_reason = self._get_skip_reason(resource, ignore_models=ignore_models, app_names=app_names)
+            target_path = ''
+            if skip_reason == '':
+                if resource.has_command('orchestration_save'):
+                    target_path = snapshot_dir + '/' + (resource.name + '_' + resource.model +
+                                                        '_artifact.txt').replace(' ', '-')
+                else:
+                    target_path = snapshot_dir + '/' + resource.name + '_' + resource.model + '.cfg'
+            plans.append(device_save_plan(resource, skip_reason, target_path))
+        return plans
+
+    # ----------------------------------
+    # ----------------------------------
+    def write_saved_artifacts(self, results):
+        """
+        Write the artifact info of the VMs that were saved by the save tasks to the storage, in one batch
+        :param list[rsc_run_result_struct] results:  The results of the save tasks
+        """
+        write_saved_artifacts(self.storage_mgr, self._saved_artifacts, results)
+        self._saved_artifacts = []
 
     # ----------------------------------
     # ----------------------------------
@@ -169,8 +261,10 @@ class VMsSaveRestore(BaseSaveRestore):
                     if saved_artifact_info != "":
                         dest_name = resource.name + '_' + resource.model +'_artifact.txt'
                         dest_name = dest_name.replace(' ','-')
+                        # written with the artifacts of the other VMs, see write_saved_artifacts
                         with lock:
-                            self.storage_mgr.save_artifact_info(saved_artifact_info, config_path, dest_name, write_to_output=False)
+                            self._saved_artifacts.append((resource.name, config_path + '/' + dest_name,
+                                                          saved_artifact_info))
                 else:
                     file_name = resource.save_network_config(self.sandbox.id, snapshot_dir, config_type)
                     #rename file on the storage server
@@ -250,26 +344,15 @@ class VMsSaveRestore(BaseSaveRestore):
             config_path = root_path + resource.alias + '_' + resource.model + '.cfg'
         config_path = config_path.replace(' ', '_')
         # Look for a template config file
-        tmp_template_config_file = tempfile.NamedTemporaryFile(delete=False)
         tftp_template_config_path = root_path + resource.alias + '_' + resource.model + '.tm'
         tftp_template_config_path = tftp_template_config_path.replace(' ', '_')
-        #try:
         #look for a concrete config file
-        try:
-            self.storage_mgr.download(config_path, tmp_template_config_file.name)
-            tmp_template_config_file.close()
-            os.unlink(tmp_template_config_file.name)
-        #if no concrete file, look for a template file
-        except:
-            try:
-                self.storage_mgr.download(tftp_template_config_path, tmp_template_config_file.name)
-            except:
-                #look for a generic config file for the model
-                tftp_template_config_path = root_path + resource.model + '.tm'
-                tftp_template_config_path = tftp_template_config_path.replace(' ', '_')
-                self.storage_mgr.download(tftp_template_config_path, tmp_template_config_file.name)
-            with open(tmp_template_config_file.name, 'r') as content_file:
-                tmp_template_config_file_data = content_file.read()
+        if not self.storage_mgr.file_exist(config_path):
+            # if no concrete file, look for a template file, or a generic template file for the model
+            generic_template_config_path = root_path + resource.model + '.tm'
+            generic_template_config_path = generic_template_config_path.replace(' ', '_')
+            tftp_template_config_path, tmp_template_config_file_data = self.storage_mgr.download_first(
+                [tftp_template_config_path, generic_template_config_path])
 
             concrete_config_data = ''
             try:
@@ -283,21 +366,12 @@ class VMsSaveRestore(BaseSaveRestore):
                                           log_message=qe.message,
                                           write_to_output_window=True)
 
-            tmp_concrete_config_file = tempfile.NamedTemporaryFile(delete=False)
-            tf = file(tmp_concrete_config_file.name, 'wb+')
-            tf.write(concrete_config_data)
-            tf.flush()
-            tf.close()
-            tmp_template_config_file.close()
-            os.unlink(tmp_template_config_file.name)
             short_Reservation_id = self.sandbox.id[len(self.sandbox.id)-4:len(self.sandbox.id)]
             concrete_file_path = root_path + 'temp/' + short_Reservation_id + '_' + resource.alias + \
                                  '_' + resource.model + '.cfg'
             concrete_file_path = concrete_file_path.replace(' ', '_')
             # TODO - clean the temp dir on the tftp server
-            self.storage_mgr.upload(concrete_file_path, tmp_concrete_config_file.name)
-            tmp_concrete_config_file.close()
-            os.unlink(tmp_concrete_config_file.name)
+            self.storage_mgr.upload_bytes(concrete_file_path, concrete_config_data)
             # Set the path to the new concrete file
             config_path = concrete_file_path
 
@@ -1,3 +1,8 @@
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_PREFETCH_POOL_SIZE = 16
+
+
 def get_vm_custom_param(resource_info, param_name):
     """
     :param ResourceInfo resource_info:
@@ -82,3 +87,34 @@ def get_resource_details_from_cache_or_server(api, resource_name, resource_detai
     else:
         resource_details = api.GetResourceDetails(resource_name)
     return resource_details
+
+
+def prefetch_root_resource_details(api, resources, resource_details_cache, pool_size=DEFAULT_PREFETCH_POOL_SIZE):
+    """
+    Get the details of the root resources of the given resources. Sub-resources (e.g. ports) are skipped,
+    details that are already in the cache are reused, and the rest are fetched from the server in parallel
+    and added to the cache
+    :param CloudShellAPISession api:
+    :param list[ReservedResourceInfo] resources:
+    :param dict(str:ResourceInfo) resource_details_cache:
+    :param int pool_size:  The max number of GetResourceDetails calls that run in parallel
+    :return: The details of the root resources, in the order of the given resources
+    :rtype: list[ResourceInfo]
+    """
+    root_names = []
+    for resource in resources:
+        root_name = resource.Name.split('/')[0]
+        if root_name not in root_names:
+            root_names.append(root_name)
+
+    missing = [resource_name for resource_name in root_names if resource_name not in resource_details_cache]
+    if len(missing) > 0:
+        pool = ThreadPool(min(len(missing), pool_size))
+        async_results = [(resource_name, pool.apply_async(api.GetResourceDetails, (resource_name,)))
+                         for resource_name in missing]
+        pool.close()
+        pool.join()
+        for resource_name, async_result in async_results:
+            resource_details_cache[resource_name] = async_result.get()
+
+    return [resource_details_cache[resource_name] for resource_name in root_names]